@@ -1,13 +1,13 @@
 import json
 import datetime
 import os
-import statistics
-import csv
-from decimal import Decimal
 import epsilons
 import learning
 import snake
 import random
+import time
+import parallel
+import stats
 
 
 ACTIONS = [-1, 0, 1]
@@ -15,36 +15,6 @@ ACTIONS = [-1, 0, 1]
 class AbortException(Exception):
     pass
 
-def export_results(headers, data, filename):
-    with open(filename, 'a', newline='') as file:
-        writer = csv.writer(file, delimiter=';')
-        if file.tell() == 0:
-            writer.writerow(headers)
-        writer.writerow(data)
-    return True
-
-def export_world_results(cycle, results, filename):
-    data = [
-        cycle,
-        statistics.mean(results.steps),
-        statistics.mean(results.scores),
-        results.wins,
-        results.loses,
-        results.starves
-    ]
-    return export_results(['cycle', 'steps', 'score', 'wins', 'loses', 'starves'], data, filename)
-
-def export_cycle_results(cycle, results, filename):
-    data = [
-        cycle,
-        statistics.mean((statistics.mean(r.steps) for r in results)),
-        statistics.mean((statistics.mean(r.scores) for r in results)),
-        statistics.mean((r.wins for r in results)),
-        statistics.mean((r.loses for r in results)),
-        statistics.mean((r.starves for r in results))
-    ]
-    return export_results(['cycle', 'steps', 'score', 'wins', 'loses', 'starves'], data, filename)
-
 def generate_memory_filename():
     """Return a random memory filename."""
     with open('data/names.txt', 'r') as file:
@@ -55,16 +25,35 @@ def generate_memory_filename():
     return ''.join([x.capitalize() for x in names[:4]])
 
 
-def load_memory(memory_table, filename):
+def load_memory(memory_table, filename, lazy=False):
+    """Load a memory file into the table, returning False if there is no such file."""
+    if not os.path.exists(filename):
+        return False
+
+    reported = -1
+    def progress(done, total):
+        nonlocal reported
+        percent = done * 100 // max(total, 1)
+        if percent != reported:
+            reported = percent
+            print(f'\rLoading {filename}: {percent}%', end='', flush=True)
+
     try:
-        if memory_table.load(filename):
-            print(f'File {filename} loaded with success!')
-            return True
-    except Exception:
-        pass
-    return False
+        memory_table.load(filename, progress, lazy)
+    except (OSError, ValueError) as e:
+        print(f'\nCould not load the memory file {filename}: {e}')
+        raise SystemExit(1) from e
+    if reported >= 0:
+        print()
+    print(f'File {filename} loaded with success!')
+    return True
+
+def _setup_config(arguments, private=False):
+    """Return the cycles, epsilon, environment and worlds of the arguments and configuration.
 
-def _setup_config(arguments):
+    A private setup, used by the workers, replaces the configured adapters
+    by dict ones so that it never opens the store of the master table.
+    """
     config = {}
     if arguments.config:
         filename = f'data/configurations/{arguments.config}'
@@ -78,20 +67,32 @@ def _setup_config(arguments):
     if 'name' in config:
         print(f">> {config['name']}")
 
+    numeric = arguments.numeric
     if 'memory_table' in config:
         print('Importing memory table configuration data...')
+        numeric = config['memory_table'].get('numeric', numeric)
+        number = learning.numeric.create(numeric)
         if 'adapters' in config['memory_table']:
             adapters = []
             for adapter in config['memory_table']['adapters']:
-                adapters.append(learning.memory.create_adapter(adapter['name'], adapter['args']))
+                if private:
+                    adapters.append(learning.memory.create_adapter('dict', number=number))
+                else:
+                    adapters.append(learning.memory.create_adapter(adapter['name'], adapter['args'], number))
+        elif config['memory_table']['name'] == 'array':
+            adapters = []
         else:
-            adapters = [learning.memory.create_adapter('dict')]
+            adapters = [learning.memory.create_adapter('dict', number=number)]
 
         args = adapters + config['memory_table']['args']
-        memory_table = learning.memory.create_memory_table(config['memory_table']['name'], ACTIONS, args)
+        memory_table = learning.memory.create_memory_table(config['memory_table']['name'], ACTIONS, args, number)
     else:
-        adapter = learning.memory.DictMemoryStorageAdapter()
-        memory_table = learning.memory.SingleMemoryTable(ACTIONS, adapter)
+        number = learning.numeric.create(numeric)
+        adapter = learning.memory.DictMemoryStorageAdapter(number)
+        memory_table = learning.memory.SingleMemoryTable(ACTIONS, adapter, number)
+    print(f'Using {numeric} numeric backend...')
+    memory_table.temperature = arguments.temperature
+    memory_table.greedy = arguments.selection == 'greedy'
 
     if arguments.command == 'train':
         learn = arguments.learn
@@ -158,9 +159,30 @@ def _setup_config(arguments):
         except ValueError:
             epsilon = getattr(epsilons, arguments.epsilon, epsilons.default)
 
-    agent = learning.Agent(Decimal(learn), Decimal(discount), memory_table)
+    agent_config = config.get('agent', {})
+    replay = None
+    if arguments.command == 'train' and 'replay' in agent_config:
+        print('Importing replay configuration data...')
+        replay = learning.replay.ReplayBuffer(**agent_config['replay'])
+
+    learner = 'q'
+    if arguments.command == 'train' and 'learner' in agent_config:
+        learner = agent_config['learner']
+        print(f'Using {learner} learner...')
+    agent = learning.traces.create(
+        learner, number(learn), number(discount), memory_table, replay,
+        agent_config.get('trace_decay', 0.5), agent_config.get('threshold', 0.01))
     world = snake.environment.World('data/worlds', arguments.view_size)
-    environment = snake.Environment(agent, world, arguments.speed, reward_model)
+    if arguments.games > 1:
+        print(f'Stepping {arguments.games} games together without visualization...')
+        environment = snake.BatchEnvironment(agent, world, arguments.games, reward_model)
+    elif arguments.kernel:
+        from snake import kernel
+        compiled = 'compiled' if kernel.COMPILED else 'not compiled, Numba is not installed'
+        print(f'Running headless episodes in the episode kernel ({compiled})...')
+        environment = kernel.KernelEnvironment(agent, world, arguments.speed, reward_model)
+    else:
+        environment = snake.Environment(agent, world, arguments.speed, reward_model)
 
     return (cycles, epsilon, environment, worlds)
 
@@ -170,13 +192,26 @@ def handle(arguments):
     cycles_max, epsilon, environment, worlds = _setup_config(arguments)
 
     memory_filename = f'data/memories/{arguments.memory}'
+    memories = environment.agent.memories
+    location = memories.adapter.location if memories.external else None
+    cycles_done = None
+    if location:
+        # The store keeps the weights whatever the memory name, which only names the checkpoints and statistics
+        print(f'Weights are kept at "{location}", shared by every memory name!')
     if arguments.memory:
-        if load_memory(environment.agent.memories, memory_filename):
+        if arguments.resume:
+            cycles_done = learning.checkpoint.read_progress(f'{memory_filename}.checkpoint')
+        lazy = arguments.command == 'run'
+        if cycles_done is not None and load_memory(memories, f'{memory_filename}.checkpoint'):
+            print(f'Memory "{arguments.memory}" resumed from the checkpoint of cycle {cycles_done}!')
+        elif not memories.external and load_memory(memories, memory_filename, lazy):
+            cycles_done = None
             print(f'Memory "{arguments.memory}" imported with success!')
     else:
         arguments.memory = generate_memory_filename()
         memory_filename = f'data/memories/{arguments.memory}'
-        print(f'Generating file "{arguments.memory}" as memory!')
+        if not memories.external:
+            print(f'Generating file "{arguments.memory}" as memory!')
 
     if not arguments.no_stats:
         if arguments.stats_dir:
@@ -187,35 +222,85 @@ def handle(arguments):
 
         if not os.path.exists(stats_directory):
             os.makedirs(stats_directory)
+        sink = stats.StatisticsSink(stats_directory)
     else:
         print("Statistics output are disabled!")
 
-    cycles_left = cycles_max
+    trainer = None
+    if arguments.workers > 1:
+        print(f'Starting {arguments.workers} workers...')
+        trainer = parallel.Trainer(arguments, environment.agent.memories, arguments.workers, arguments.sync_episodes)
+
+    checkpointer = learning.checkpoint.Checkpointer(
+        environment.agent.memories, f'{memory_filename}.checkpoint', arguments.memory_format == 'binary',
+        arguments.checkpoint_cycles, arguments.checkpoint_minutes, cycles_done or 0)
+    if checkpointer.enabled and arguments.command == 'train':
+        print(f'Checkpoints will be saved at: {checkpointer.filename}')
+
+    profiler = None
+    profile_outputs = []
+    if arguments.profile or arguments.metrics_port:
+        profiler = learning.profiler.Profiler()
+        profiler.attach(environment.agent)
+        environment.profiler = profiler
+        if arguments.profile:
+            profile_outputs.append(stats.ProfileLog(arguments.profile))
+            print(f'Profile will be saved at: {arguments.profile}')
+        if arguments.metrics_port:
+            profile_outputs.append(stats.MetricsServer(arguments.metrics_port))
+            print(f'Metrics are served at: http://127.0.0.1:{arguments.metrics_port}/')
+
+    cycles_left = cycles_max - (cycles_done or 0)
     try:
         while cycles_left > 0 or cycles_max <= 0:
 
             cycles_current = cycles_max - cycles_left
+            cycle_start = time.perf_counter()
             worlds_results = []
             print(f'[Cycle {cycles_current + 1} of {cycles_max}]')
             try:
                 for world in worlds:
                     print(f'Executing world "{world["name"]}" for {world["episodes"]} episodes...')
-                    environment.world.load(world['name'])
-                    results = environment.execute(arguments.command == 'train', world['episodes'], epsilon, [cycles_current, cycles_max, environment], arguments.view_enable)                   
+                    if trainer:
+                        results = trainer.execute(world['name'], arguments.command == 'train', world['episodes'], epsilon, [cycles_current, cycles_max])
+                    else:
+                        environment.world.load(world['name'])
+                        results = environment.execute(arguments.command == 'train', world['episodes'], epsilon, [cycles_current, cycles_max, environment], arguments.view_enable)
                     if results.abort:
                         raise AbortException
 
                     if not arguments.no_stats:
-                        export_world_results(cycles_current, results, f'{stats_directory}/{world["name"]}.csv')
+                        sink.world(cycles_current, world['name'], results)
                     worlds_results.append(results)
             except AbortException:
                 break
             if not arguments.no_stats:
-                export_cycle_results(cycles_current, worlds_results, f'{stats_directory}/results.csv')
+                sink.cycle(cycles_current, worlds_results)
+            if profiler:
+                report = profiler.report(
+                    time.perf_counter() - cycle_start,
+                    sum(int(r.steps.sum()) for r in worlds_results),
+                    sum(r.episodes for r in worlds_results),
+                    environment.agent.memories.size())
+                report['cycle'] = cycles_current
+                for output in profile_outputs:
+                    output.write(report)
             cycles_left -= 1
+            if arguments.command == 'train' and checkpointer.enabled and checkpointer.due(cycles_current + 1):
+                checkpointer.save(cycles_current + 1)
     except KeyboardInterrupt:
         pass
+    finally:
+        if trainer:
+            trainer.close()
+        if not arguments.no_stats:
+            sink.close()
+        for output in profile_outputs:
+            output.close()
+        checkpointer.wait()
+        if checkpointer.error:
+            print(f'Checkpoint failed: {checkpointer.error}')
 
     if arguments.command == 'train':
-        print(f'Saving at "{memory_filename}"...' )
-        environment.agent.save(memory_filename)
+        print(f'Saving at "{location or memory_filename}"...' )
+        environment.agent.save(memory_filename, arguments.memory_format == 'binary')
@@ -0,0 +1 @@
+"""Benchmarks for the simulator and learner hot paths."""
@@ -0,0 +1,48 @@
+"""Benchmark of the batch environment against the scalar training loop.
+
+Run from the repository root:
+
+    python -m benchmarks.batch
+"""
+import random
+import time
+import learning
+import snake
+from snake.batch import BatchEnvironment
+
+ACTIONS = [-1, 0, 1]
+WORLD = 'default'
+EPISODES = 2048
+GAMES = [1, 16, 64, 256]
+
+
+def create(name, batch=None):
+    table = learning.memory.ArrayMemoryTable(ACTIONS)
+    agent = learning.Agent(0.75, 0.9, table)
+    world = snake.World('data/worlds')
+    world.load(name)
+    if batch:
+        return BatchEnvironment(agent, world, batch, seed=0)
+    return snake.Environment(agent, world)
+
+
+def measure(name, batch=None, episodes=EPISODES):
+    """Return the training steps per second of a world."""
+    random.seed(0)
+    environment = create(name, batch)
+    start = time.perf_counter()
+    results = environment.execute(True, episodes, 0.05, (), False)
+    return sum(results.steps) / (time.perf_counter() - start)
+
+
+def main():
+    scalar = measure(WORLD, episodes=EPISODES // 4)
+    print(f'{"games":<10} {"steps/s":>10} {"speedup":>8}')
+    print(f'{"scalar":<10} {scalar:>10.0f} {1:>8.1f}')
+    for games in GAMES:
+        rate = measure(WORLD, games)
+        print(f'{games:<10} {rate:>10.0f} {rate / scalar:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
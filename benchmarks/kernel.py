@@ -0,0 +1,43 @@
+"""Benchmark of the episode kernel against the Python step loop.
+
+The kernel is compiled when Numba is installed, and its compilation is
+left out of the measure. Run from the repository root:
+
+    python -m benchmarks.kernel
+"""
+import glob
+import os
+import random
+import time
+import learning
+import snake
+from snake.kernel import COMPILED, KernelEnvironment
+
+ACTIONS = [-1, 0, 1]
+EPISODES = 1000
+
+
+def measure(environment_class, name, episodes=EPISODES):
+    """Return the training steps per second of a world."""
+    random.seed(0)
+    world = snake.World('data/worlds')
+    environment = environment_class(learning.Agent(0.75, 0.9, learning.memory.ArrayMemoryTable(ACTIONS)), world)
+    world.load(name)
+    environment.execute(True, 1, 0.05, (), False)
+    start = time.perf_counter()
+    results = environment.execute(True, episodes, 0.05, (), False)
+    return int(results.steps.sum()) / (time.perf_counter() - start)
+
+
+def main():
+    print(f'Kernel {"compiled with Numba" if COMPILED else "running as plain Python, Numba is not installed"}')
+    print(f'{"world":<12} {"python":>10} {"kernel":>10} {"speedup":>8}')
+    for filename in sorted(glob.glob('data/worlds/*.json')):
+        name = os.path.splitext(os.path.basename(filename))[0]
+        python = measure(snake.Environment, name)
+        kernel = measure(KernelEnvironment, name)
+        print(f'{name:<12} {python:>10.0f} {kernel:>10.0f} {kernel / python:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Benchmark of the memory table updates for each numeric backend and table,
+and of the per-update latency of the double table refresh.
+
+Run from the repository root:
+
+    python -m benchmarks.memory
+"""
+import random
+import statistics
+import time
+import learning
+
+ACTIONS = [-1, 0, 1]
+UPDATES = 20000
+STATES = 500
+DELAY = 5000
+
+
+def generate_states(count):
+    """Return a list of observation-like states."""
+    return [
+        tuple((random.choice((1, 2, 4)), random.randint(0, 3)) for _ in range(3)) +
+        ((random.randrange(-180, 181, 45), random.randint(0, 3)), )
+        for _ in range(count)
+    ]
+
+
+def create_table(name, number):
+    """Return a memory table by name."""
+    if name == 'array':
+        return learning.memory.ArrayMemoryTable(ACTIONS, number=number)
+    return learning.memory.SingleMemoryTable(
+        ACTIONS, learning.memory.DictMemoryStorageAdapter(number), number)
+
+
+def measure(numeric, name='single', updates=UPDATES):
+    """Return the memory table updates per second for a numeric backend."""
+    random.seed(0)
+    number = learning.numeric.create(numeric)
+    table = create_table(name, number)
+    states = generate_states(STATES)
+    transitions = [
+        (random.choice(states), random.choice(ACTIONS), random.choice((-10.0, 0.0, 5.0)), random.choice(states))
+        for _ in range(updates)
+    ]
+    learn, discount = number(0.75), number(0.9)
+
+    start = time.perf_counter()
+    for state, action, reward, next_state in transitions:
+        table.update(state, action, reward, next_state, learn, discount)
+    return updates / (time.perf_counter() - start)
+
+
+def measure_latency(incremental, updates=UPDATES, states=STATES * 20):
+    """Return the 50th, 99th and 99.9th percentiles and the maximum update latency of a double table in microseconds."""
+    random.seed(0)
+    table = learning.memory.DoubleMemoryTable(
+        ACTIONS, learning.memory.DictMemoryStorageAdapter(), learning.memory.DictMemoryStorageAdapter(),
+        DELAY, incremental)
+    states = generate_states(states)
+    transitions = [
+        (random.choice(states), random.choice(ACTIONS), random.choice((-10.0, 0.0, 5.0)), random.choice(states))
+        for _ in range(updates)
+    ]
+
+    latencies = []
+    for state, action, reward, next_state in transitions:
+        start = time.perf_counter()
+        table.update(state, action, reward, next_state, 0.75, 0.9)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    percentiles = statistics.quantiles(latencies, n=1000)
+    return percentiles[499], percentiles[989], percentiles[998], max(latencies)
+
+
+def main():
+    print(f'{"table":<10} {"backend":<10} {"updates/s":>10}')
+    for name, numeric in (('single', 'decimal'), ('single', 'float'), ('array', 'float')):
+        print(f'{name:<10} {numeric:<10} {measure(numeric, name):>10.0f}')
+
+    print()
+    print(f'{"double":<12} {"p50 us":>8} {"p99 us":>8} {"p99.9 us":>9} {"max us":>8}')
+    for name, incremental in (('refresh', False), ('incremental', True)):
+        p50, p99, p999, highest = measure_latency(incremental)
+        print(f'{name:<12} {p50:>8.1f} {p99:>8.1f} {p999:>9.1f} {highest:>8.0f}')
+
+
+if __name__ == '__main__':
+    main()
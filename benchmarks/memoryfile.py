@@ -0,0 +1,53 @@
+"""Benchmark of saving and loading large memories in the JSON and binary formats.
+
+Run from the repository root, optionally with the number of states:
+
+    python -m benchmarks.memoryfile 1000000
+"""
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import learning
+
+ACTIONS = [-1, 0, 1]
+STATES = 1000000
+
+
+def create_table(count):
+    """Return an array memory table with count distinct states and random weights."""
+    table = learning.memory.ArrayMemoryTable(ACTIONS, capacity=count)
+    for index in range(count):
+        table.initialize_state(((index % 1000, index // 1000), (1, 2), (4, 3), (45, 1)))
+    table.values[:] = np.random.default_rng(0).normal(size=table.values.shape)
+    return table
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else STATES
+    table = create_table(count)
+    state = table.states.state(count // 2)
+    print(f'{count} states, {count * len(ACTIONS)} entries')
+    print(f'{"format":<8} {"save s":>8} {"size MB":>8} {"load s":>8} {"lookup s":>9}')
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, binary in (('json', False), ('binary', True)):
+            filename = os.path.join(directory, name)
+            save = timed(table.save, filename, binary)
+            size = os.path.getsize(filename) / 2 ** 20
+
+            loaded = learning.memory.ArrayMemoryTable(ACTIONS)
+            load = timed(loaded.load, filename)
+            lookup = timed(loaded.best, state)
+            print(f'{name:<8} {save:>8.2f} {size:>8.1f} {load:>8.2f} {lookup:>9.6f}')
+
+
+if __name__ == '__main__':
+    main()
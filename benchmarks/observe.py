@@ -0,0 +1,68 @@
+"""Microbenchmark of turning the snake and observing the environment.
+
+Compares the integer headings and precomputed apple features with the
+previous vector rotations and trigonometry. Run from the repository root:
+
+    python -m benchmarks.observe
+"""
+import math
+import random
+import time
+import learning
+import snake
+from snake.math import Vector
+
+STEPS = 50000
+
+
+def legacy_observe(environment, direction):
+    """Return the observation computed with vector rotations and trigonometry."""
+    world = environment.world
+    position = world.snake.position
+    state = []
+    rays = direction.inverted()
+    for _ in range(3):
+        rays.rotate(math.radians(90))
+        value, length = world.look(position, world.DIRECTIONS.index((rays.x, rays.y)))
+        state.append((value, environment._distance(length)))
+
+    delta_vector = position.inverted() + world.apple.position
+    delta = math.degrees(Vector.difference(direction.angle, delta_vector.angle))
+    state.append((round(delta / 45) * 45, environment._distance(position.distance(world.apple.position))))
+    return tuple(state)
+
+
+def measure(steps=STEPS):
+    """Return the microseconds per step of the legacy and the table based turn and observation."""
+    random.seed(0)
+    table = learning.memory.ArrayMemoryTable([-1, 0, 1])
+    world = snake.World('data/worlds')
+    environment = snake.Environment(learning.Agent(0, 0, table), world)
+    world.load('default')
+    actions = [random.choice((-1, 0, 1)) for _ in range(steps)]
+
+    direction = world.snake.direction
+    start = time.perf_counter()
+    for action in actions:
+        direction.rotate(math.radians(90 * action))
+        legacy_observe(environment, direction)
+    legacy = (time.perf_counter() - start) / steps * 1e6
+
+    start = time.perf_counter()
+    for action in actions:
+        world.snake.turn(action)
+        environment.observe()
+    current = (time.perf_counter() - start) / steps * 1e6
+
+    assert legacy_observe(environment, world.snake.direction) == environment.observe()
+    return legacy, current
+
+
+def main():
+    legacy, current = measure()
+    print(f'{"legacy":<10} {legacy:>8.2f} us/step')
+    print(f'{"tables":<10} {current:>8.2f} us/step')
+
+
+if __name__ == '__main__':
+    main()
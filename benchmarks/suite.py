@@ -0,0 +1,274 @@
+"""Seeded benchmark suite of the simulator and learner hot paths with JSON output.
+
+Every case is run a few times from the same seed and its best rate is
+kept. Run from the repository root, optionally saving the results and
+comparing them with a previous run:
+
+    python -m benchmarks.suite --output results.json --compare previous.json
+"""
+import argparse
+import datetime
+import glob
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import simplejson as json
+import learning
+import snake
+from snake.math import Vector
+
+ACTIONS = [-1, 0, 1]
+SEED = 0
+REPEAT = 3
+WORLD = 'rooms'
+
+
+def best_rate(function, operations, repeat=REPEAT):
+    """Return the best operations per second of a function run from the same seed."""
+    rates = []
+    for _ in range(repeat):
+        random.seed(SEED)
+        np.random.seed(SEED)
+        prepared = function()
+        start = time.perf_counter()
+        prepared()
+        rates.append(operations / (time.perf_counter() - start))
+    return max(rates)
+
+
+def load_world(name=WORLD, moves=6):
+    """Return a loaded world with the snake moved out of its start."""
+    random.seed(SEED)
+    world = snake.World('data/worlds')
+    world.load(name)
+    for _ in range(moves):
+        world.snake.move()
+    return world
+
+
+def create_table(name, directory=None):
+    """Return a memory table by the name of its type, adapter and numeric backend.
+
+    Tables stored in files keep them in a new directory inside directory,
+    so every table starts empty and the caller removes them all at once.
+    """
+    if name == 'array':
+        return learning.memory.ArrayMemoryTable(ACTIONS)
+    if name == 'double':
+        return learning.memory.DoubleMemoryTable(
+            ACTIONS, learning.memory.DictMemoryStorageAdapter(), learning.memory.DictMemoryStorageAdapter(), 5000)
+    if name == 'redis-hash':
+        import fakeredis
+        adapter = learning.memory.RedisHashMemoryStorageAdapter(client=fakeredis.FakeRedis())
+        return learning.memory.SingleMemoryTable(ACTIONS, adapter)
+    if name.startswith('bounded/'):
+        # Half of the generated states fit
+        adapter = learning.memory.BoundedMemoryStorageAdapter(250, name.partition('/')[2])
+        return learning.memory.SingleMemoryTable(ACTIONS, adapter)
+    if name == 'sqlite':
+        # Half of the generated states are cached
+        filename = os.path.join(tempfile.mkdtemp(dir=directory), 'memory.sqlite')
+        return learning.memory.SingleMemoryTable(ACTIONS, learning.memory.SQLiteMemoryStorageAdapter(filename, 250))
+    number = learning.numeric.create(name.partition('/')[2] or 'float')
+    return learning.memory.SingleMemoryTable(ACTIONS, learning.memory.DictMemoryStorageAdapter(number), number)
+
+
+def generate_transitions(count, states=500):
+    """Return observation-like transitions drawn from a fixed set of states."""
+    states = [
+        tuple((random.choice((1, 2, 4)), random.randint(0, 3)) for _ in range(3)) +
+        ((random.randrange(-180, 181, 45), random.randint(0, 3)), )
+        for _ in range(states)
+    ]
+    return [
+        (random.choice(states), random.choice(ACTIONS), random.choice((-10.0, 0.0, 5.0)), random.choice(states))
+        for _ in range(count)
+    ]
+
+
+def case_check(count):
+    def prepare():
+        world = load_world()
+        positions = [Vector(random.randrange(world.size), random.randrange(world.size)) for _ in range(count)]
+        return lambda: [world.check(position) for position in positions]
+    return prepare
+
+
+def case_raycast(count):
+    def prepare():
+        world = load_world()
+        mask = (world.snake.VALUE, world.apple.VALUE, world.WALL_VALUE)
+        rays = [
+            (Vector(random.randrange(world.size), random.randrange(world.size)), Vector(random.choice(world.DIRECTIONS)))
+            for _ in range(count)
+        ]
+        return lambda: [world.raycast(position, direction, mask) for position, direction in rays]
+    return prepare
+
+
+def case_look(count):
+    def prepare():
+        world = load_world()
+        rays = [
+            (Vector(random.randrange(world.size), random.randrange(world.size)), random.randrange(4))
+            for _ in range(count)
+        ]
+        return lambda: [world.look(position, heading) for position, heading in rays]
+    return prepare
+
+
+def case_observe(count):
+    def prepare():
+        world = load_world()
+        environment = snake.Environment(learning.Agent(0.75, 0.9, create_table('array')), world)
+        return lambda: [environment.observe() for _ in range(count)]
+    return prepare
+
+
+def case_move(count):
+    def prepare():
+        world = load_world(moves=0)
+        moving = world.snake
+        turns = [random.choice(ACTIONS) for _ in range(count)]
+
+        def run():
+            for turn in turns:
+                moving.turn(turn)
+                moving.move()
+                if moving.is_colliding():
+                    world.reset()
+        return run
+    return prepare
+
+
+def case_update(name, count, directory=None):
+    def prepare():
+        table = create_table(name, directory)
+        transitions = generate_transitions(count)
+        return lambda: [table.update(s, a, r, n, 0.75, 0.9) for s, a, r, n in transitions]
+    return prepare
+
+
+def case_choose(name, count, directory=None):
+    def prepare():
+        table = create_table(name, directory)
+        transitions = generate_transitions(count)
+        for state, action, reward, next_state in transitions:
+            table.update(state, action, reward, next_state, 0.75, 0.9)
+        return lambda: [table.choose(state) for state, _, _, _ in transitions]
+    return prepare
+
+
+def case_refresh(count):
+    def prepare():
+        table = create_table('double')
+        hidden = table._hidden_memory_table
+        for index in range(count):
+            hidden.initialize_state(((index, 0), (0, 0), (0, 0), (0, 0)))
+        return table._refresh
+    return prepare
+
+
+def execute_rate(name, episodes, repeat=REPEAT):
+    """Return the best headless training steps per second of a world."""
+    rates = []
+    for _ in range(repeat):
+        random.seed(SEED)
+        world = snake.World('data/worlds')
+        environment = snake.Environment(learning.Agent(0.75, 0.9, create_table('array')), world)
+        world.load(name)
+        start = time.perf_counter()
+        results = environment.execute(True, episodes, 0.05, (), False)
+        rates.append(int(results.steps.sum()) / (time.perf_counter() - start))
+    return max(rates)
+
+
+def tables():
+    names = ['single/float', 'single/decimal', 'double', 'array', 'bounded/lru', 'bounded/visits', 'sqlite']
+    try:
+        import fakeredis
+        names.append('redis-hash')
+    except ImportError:
+        pass
+    return names
+
+
+def run(scale=1.0):
+    """Return the rates of every case, scaled down for quick runs."""
+    def amount(value):
+        return max(int(value * scale), 1)
+
+    results = {
+        'world.check': best_rate(case_check(amount(50000)), amount(50000)),
+        'world.raycast': best_rate(case_raycast(amount(20000)), amount(20000)),
+        'world.look': best_rate(case_look(amount(50000)), amount(50000)),
+        'environment.observe': best_rate(case_observe(amount(20000)), amount(20000)),
+        'snake.move': best_rate(case_move(amount(50000)), amount(50000)),
+        'double.refresh': best_rate(case_refresh(amount(20000)), amount(20000) * len(ACTIONS)),
+    }
+    for name in tables():
+        updates = amount(10000 if name == 'redis-hash' else 20000)
+        with tempfile.TemporaryDirectory() as directory:
+            results[f'{name}.update'] = best_rate(case_update(name, updates, directory), updates)
+            results[f'{name}.choose'] = best_rate(case_choose(name, updates, directory), updates)
+    for filename in sorted(glob.glob('data/worlds/*.json')):
+        name = os.path.splitext(os.path.basename(filename))[0]
+        results[f'execute.{name}'] = execute_rate(name, amount(100))
+    return results
+
+
+def commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(results, previous=None):
+    """Print the rates and their ratio to a previous run."""
+    print(f'{"case":<28} {"rate/s":>12} {"ratio":>7}')
+    for name, rate in results.items():
+        ratio = ''
+        if previous and name in previous:
+            ratio = f'{rate / previous[name]:>7.2f}'
+        print(f'{name:<28} {rate:>12.0f} {ratio}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark suite of the simulator and learner')
+    parser.add_argument('--output', help='JSON file the results are written to')
+    parser.add_argument('--compare', help='JSON file of a previous run to compare with')
+    parser.add_argument('--quick', action='store_true', help='Run a tenth of every case')
+    arguments = parser.parse_args()
+
+    results = run(0.1 if arguments.quick else 1.0)
+    previous = None
+    if arguments.compare:
+        with open(arguments.compare, 'r') as file:
+            previous = json.load(file)['results']
+    report(results, previous)
+
+    if arguments.output:
+        data = {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'seed': SEED,
+            'quick': arguments.quick,
+            'unit': 'operations per second, steps per second for execute',
+            'results': results,
+        }
+        with open(arguments.output, 'w') as file:
+            json.dump(data, file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""Benchmark of the episodes the learners need to reach a mean score.
+
+Training runs in chunks of episodes and stops at the first chunk whose
+mean score reaches the threshold of the world. Run from the repository
+root:
+
+    python -m benchmarks.traces
+"""
+import random
+import time
+import learning
+import snake
+
+ACTIONS = [-1, 0, 1]
+LEARNERS = ['q', 'q-lambda', 'sarsa-lambda']
+THRESHOLDS = {'default': 3.0, 'rooms': 0.5}
+CHUNK = 50
+MAX_EPISODES = 2000
+EPSILON = 0.05
+SEEDS = [0, 1, 2, 3, 4]
+
+
+def episodes_to_threshold(learner, name, seed):
+    """Return the episodes trained until a chunk reaches the threshold and the seconds it took."""
+    random.seed(seed)
+    agent = learning.traces.create(learner, 0.75, 0.9, learning.memory.ArrayMemoryTable(ACTIONS))
+    world = snake.World('data/worlds')
+    environment = snake.Environment(agent, world)
+    world.load(name)
+    start = time.perf_counter()
+    for episodes in range(CHUNK, MAX_EPISODES + 1, CHUNK):
+        results = environment.execute(True, CHUNK, EPSILON, (), False)
+        if results.scores.mean() >= THRESHOLDS[name]:
+            break
+    return episodes, time.perf_counter() - start
+
+
+def main():
+    print(f'{"world":<10} {"learner":<14} {"episodes":>9} {"seconds":>8}')
+    for name in THRESHOLDS:
+        for learner in LEARNERS:
+            runs = [episodes_to_threshold(learner, name, seed) for seed in SEEDS]
+            episodes = sum(run[0] for run in runs) / len(runs)
+            seconds = sum(run[1] for run in runs) / len(runs)
+            print(f'{name:<10} {learner:<14} {episodes:>9.0f} {seconds:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""Benchmark of the world queries, ray casts and apple spawns against the snake length,
+and of switching between worlds.
+
+Run from the repository root:
+
+    python -m benchmarks.world
+"""
+import collections
+import random
+import time
+from decimal import Decimal
+import learning
+import snake
+from snake.math import Vector
+
+WORLDS = ['coliseum', 'rooms']
+LENGTHS = [3, 10, 25, 50, 75]
+FILLS = [0.10, 0.50, 0.95]
+CYCLE_WORLDS = ['close', 'default', 'coliseum', 'cross', 'dot']
+STEPS = 2000
+
+
+def stretch(world, length):
+    """Lay the snake over the first empty cells of the world in a serpentine order."""
+    cells = []
+    for x in range(world.size):
+        columns = range(world.size) if x % 2 == 0 else reversed(range(world.size))
+        for y in columns:
+            if world.check(Vector(x, y)) == world.EMPTY_VALUE:
+                cells.append(Vector(x, y))
+
+    body = cells[:length]
+    for index in world.snake._body:
+        world.vacate_cell(index, world.snake.VALUE)
+    world.snake._body = collections.deque(world.index(part) for part in body)
+    world.snake._position = Vector(body[0])
+    world.snake._grow = 0
+    for part in body:
+        world.occupy(part, world.snake.VALUE)
+    world.apple.random()
+    return len(body)
+
+
+def measure(name, length, steps=STEPS):
+    """Return the observed steps per second for a world and snake length."""
+    random.seed(0)
+    table = learning.memory.SingleMemoryTable([-1, 0, 1], learning.memory.DictMemoryStorageAdapter())
+    agent = learning.Agent(Decimal(0), Decimal(0), table)
+    world = snake.World('data/worlds')
+    environment = snake.Environment(agent, world)
+    world.load(name)
+    length = stretch(world, length)
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        environment.observe()
+        world.snake.is_colliding()
+        world.check(world.apple.position)
+    elapsed = time.perf_counter() - start
+    return length, steps / elapsed
+
+
+def measure_raycast(name, length, repeat=20):
+    """Return the rays per second of World.raycast and of the precomputed World.look."""
+    world = snake.World('data/worlds')
+    world.load(name)
+    stretch(world, length)
+    mask = (world.apple.VALUE, world.snake.VALUE, world.WALL_VALUE)
+    rays = [
+        (Vector(x, y), heading)
+        for x in range(world.size) for y in range(world.size) for heading in range(4)
+        if world.check(Vector(x, y)) == world.EMPTY_VALUE
+    ]
+
+    def raycast(position, heading):
+        value, hit = world.raycast(position, Vector(world.DIRECTIONS[heading]), mask)
+        return value, position.distance(hit)
+
+    rates = []
+    for cast in (raycast, world.look):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for position, direction in rays:
+                cast(position, direction)
+        rates.append(len(rays) * repeat / (time.perf_counter() - start))
+    return rates
+
+
+def rejection(world):
+    """Return a random empty position drawn the way the apple used to, for comparison."""
+    position = Vector(0, 0)
+    while world.check(position) != world.EMPTY_VALUE:
+        position = Vector(random.randint(0, world.size), random.randint(0, world.size))
+    return position
+
+
+def measure_spawn(name, fill, repeat=2000):
+    """Return the snake length and the spawns per second of rejection sampling and World.random_cell."""
+    random.seed(0)
+    world = snake.World('data/worlds')
+    world.load(name)
+    empty = world._cells.count(world.EMPTY_VALUE)
+    length = stretch(world, int(empty * fill))
+
+    rates = []
+    for spawn in (rejection, snake.World.random_cell):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            spawn(world)
+        rates.append(repeat / (time.perf_counter() - start))
+    return length, rates
+
+
+def measure_switch(cached, cycles=100):
+    """Return the world switches per second of cycles over the sample configuration worlds."""
+    table = learning.memory.ArrayMemoryTable([-1, 0, 1])
+    world = snake.World('data/worlds')
+    environment = snake.Environment(learning.Agent(0, 0, table), world)
+    start = time.perf_counter()
+    for _ in range(cycles):
+        for name in CYCLE_WORLDS:
+            if not cached:
+                snake.World._parsed_worlds.clear()
+            world.load(name)
+            environment.initialize(False)
+            environment.observe()
+    return cycles * len(CYCLE_WORLDS) / (time.perf_counter() - start)
+
+
+def main():
+    print(f'{"world":<10} {"length":>6} {"steps/s":>10}')
+    for name in WORLDS:
+        for length in LENGTHS:
+            length, rate = measure(name, length)
+            print(f'{name:<10} {length:>6} {rate:>10.0f}')
+
+    print()
+    print(f'{"world":<10} {"length":>6} {"raycast/s":>10} {"look/s":>10}')
+    for name in WORLDS:
+        for length in (3, 50):
+            raycast, look = measure_raycast(name, length)
+            print(f'{name:<10} {length:>6} {raycast:>10.0f} {look:>10.0f}')
+
+    print()
+    print(f'{"world":<10} {"fill":>6} {"length":>6} {"sample/s":>10} {"free/s":>10}')
+    for name in WORLDS:
+        for fill in FILLS:
+            length, (sample, free) = measure_spawn(name, fill)
+            print(f'{name:<10} {fill:>6.0%} {length:>6} {sample:>10.0f} {free:>10.0f}')
+
+    print()
+    print(f'{"worlds":<10} {"uncached/s":>10} {"cached/s":>10}')
+    print(f'{len(CYCLE_WORLDS):<10} {measure_switch(False):>10.0f} {measure_switch(True):>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
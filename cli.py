@@ -7,6 +7,8 @@ WORLD = 'default'
 VIEW_SIZE = 16
 VIEW_ENABLE = True
 EPSILON = None
+TEMPERATURE = 1.0
+SELECTION = 'softmax'
 
 # Training defaults
 CYCLES = None
@@ -14,10 +16,33 @@ EPISODES = 100
 LEARN = 0.75
 DISCOUNT = 0.9
 REWARD = 'default'
+NUMERIC = 'float'
+GAMES = 1
+WORKERS = 1
+SYNC_EPISODES = 10
+MEMORY_FORMAT = 'json'
+CHECKPOINT_CYCLES = 0
+CHECKPOINT_MINUTES = 0
+
+
+def temperature(value):
+    """Return a softmax temperature, which divides the weights and so must be positive."""
+    number = float(value)
+    if not number > 0:
+        raise argparse.ArgumentTypeError(
+            f'temperature must be positive, got {value}; use --selection greedy to always pick the best action')
+    return number
+
 
 parser = argparse.ArgumentParser(description='Q-learning Snake Game', add_help=False)
 
 parser.add_argument('--memory', type=str, help='Memory filename')
+parser.add_argument(
+    '--memory-format',
+    default=MEMORY_FORMAT,
+    choices=['json', 'binary'],
+    help='Format the memory is saved in, both are detected when loading',
+)
 parser.add_argument(
     '--speed', default=SPEED, type=int, help='Environment speed for visualization'
 )
@@ -39,6 +64,16 @@ parser.add_argument(
     default=EPSILON,
     help='aka. "ignore-the-policy" probability or a name function for it',
 )
+parser.add_argument(
+    '--temperature', default=TEMPERATURE, type=temperature,
+    help='Positive temperature of the softmax over the action weights'
+)
+parser.add_argument(
+    '--selection',
+    default=SELECTION,
+    choices=['softmax', 'greedy'],
+    help='How the agent follows the policy, "greedy" always picks the best known action',
+)
 parser.add_argument('--cycles', default=CYCLES, type=int, help='Number of sessions')
 parser.add_argument('--config', default=None, help='Configuration file for complex stuff')
 
@@ -55,6 +90,52 @@ parser.add_argument(
     '--discount', default=DISCOUNT, type=float, help='Agent discount factor'
 )
 parser.add_argument('--reward', default=REWARD, help='Reward model name')
+parser.add_argument(
+    '--numeric',
+    default=NUMERIC,
+    choices=['float', 'decimal'],
+    help='Numeric backend of the memory table, "decimal" for exact arithmetic',
+)
+parser.add_argument(
+    '--games',
+    default=GAMES,
+    type=int,
+    help='Number of games stepped together, requires the array memory table',
+)
+parser.add_argument(
+    '--kernel',
+    action='store_true',
+    help='Runs headless episodes in the episode kernel, compiled when Numba is installed',
+)
+parser.add_argument(
+    '--workers',
+    default=WORKERS,
+    type=int,
+    help='Number of processes training together, requires visualization disabled',
+)
+parser.add_argument(
+    '--sync-episodes',
+    default=SYNC_EPISODES,
+    type=int,
+    help='Episodes each worker plays between memory table synchronizations',
+)
+parser.add_argument(
+    '--checkpoint-cycles',
+    default=CHECKPOINT_CYCLES,
+    type=int,
+    help='Cycles between memory checkpoints written in the background, 0 disables them',
+)
+parser.add_argument(
+    '--checkpoint-minutes',
+    default=CHECKPOINT_MINUTES,
+    type=float,
+    help='Minutes between memory checkpoints written in the background, 0 disables them',
+)
+parser.add_argument('--resume', action='store_true', help='Resumes training from the memory checkpoint')
+parser.add_argument('--profile', default=None, help='File the per-cycle profile of the step loop is appended to')
+parser.add_argument(
+    '--metrics-port', default=None, type=int, help='Local port serving the latest per-cycle profile as JSON'
+)
 parser.add_argument('--stats-dir', default=None, help='Directory for statistics output')
 parser.add_argument('--no-stats', action='store_true', help='Disables statistics output')
 
@@ -1,3 +1,4 @@
-from .agent import Agent, Action
+from .agent import Agent
 from .environment import Action, Environment
-from .memory import SingleMemoryTable, DoubleMemoryTable
+from .memory import SingleMemoryTable, DoubleMemoryTable, ArrayMemoryTable
+from . import checkpoint, memoryfile, numeric, profiler, replay, selection, traces
@@ -1,29 +1,43 @@
-import copy
 import random
-import math
-import ast
-from decimal import Decimal
-import simplejson as json
 
-from .environment import Action
+from .memory import ArrayMemoryTable
 
 
 class Agent:
     """Class to choose actions to execute in the environment."""
 
-    def __init__(self, learning_rate, discount_factor, memory_table):
+    def __init__(self, learning_rate, discount_factor, memory_table, replay=None):
+        if replay is not None and not isinstance(memory_table, ArrayMemoryTable):
+            raise ValueError('Experience replay requires an array memory table')
         self._learning_rate = learning_rate
         self._discount_factor = discount_factor
         self._memories = memory_table
+        self._replay = replay
 
     @property
     def memories(self):
         return self._memories
 
-    def remember(self, state, action, reward, new_state):
-        """Update agent memory table."""
-        self.memories.update(state, action, reward, new_state,
-                             self._learning_rate, self._discount_factor)
+    @property
+    def replay(self):
+        """Return the replay buffer or None if replay is disabled."""
+        return self._replay
+
+    def remember(self, state, action, reward, new_state, done=False):
+        """Update agent memory table, keeping the transition for replay if enabled."""
+        memories = self.memories
+        memories.update(state, action, reward, new_state,
+                        self._learning_rate, self._discount_factor)
+        if self._replay is not None:
+            next_row = memories.index(new_state)
+            if next_row is None:
+                next_row = memories.initialize_state(new_state)
+            self._replay.add(memories.index(state), memories.column(action), float(reward), next_row, done)
+            self._replay.step(memories, self._learning_rate, self._discount_factor)
+
+    def reset(self):
+        """Forget what the agent keeps about the current episode."""
+        pass
 
     def act(self, state, epsilon):
         """Act returning the best action for a certain state based on the Q Table."""
@@ -45,6 +59,6 @@ class Agent:
         """Load agent data from a file."""
         self.memories.load(filename)
 
-    def save(self, filename):
-        """Save agent data from a file."""
-        self.memories.save(filename)
+    def save(self, filename, binary=False):
+        """Save agent data from a file, in the binary memory format if binary."""
+        self.memories.save(filename, binary)
@@ -0,0 +1,124 @@
+"""Module for the periodic checkpoints of a memory table during training."""
+import functools
+import os
+import threading
+import time
+import simplejson as json
+
+
+class Checkpointer:
+    """Write snapshots of a memory table to a file on a background thread.
+
+    The checkpointer keeps its own copy of the weights, taken whole at the
+    first checkpoint. Later ones only copy the weights of the states changed
+    since the previous one between cycles, and the thread applies them to
+    the copy and serializes it. The checkpoint and its progress are written
+    under a staging name and then moved over the previous ones, so a run
+    resumes from a checkpoint with the cycle it was taken at. A resumed run
+    passes the cycle it resumed from, so the next checkpoint is counted from
+    there.
+    """
+
+    def __init__(self, memory_table, filename, binary=False, cycles=0, minutes=0, cycle=0):
+        self._memory_table = memory_table
+        self._filename = filename
+        self._binary = binary
+        self._cycles = cycles
+        self._seconds = minutes * 60
+        self._last_cycle = cycle
+        self._last_time = time.monotonic()
+        self._weights = None
+        self._thread = None
+        self.error = None
+
+    @property
+    def filename(self):
+        return self._filename
+
+    @property
+    def enabled(self):
+        return self._cycles > 0 or self._seconds > 0
+
+    def due(self, cycle):
+        """Return if a checkpoint should be written after a number of finished cycles."""
+        if self._cycles > 0 and cycle - self._last_cycle >= self._cycles:
+            return True
+        return self._seconds > 0 and time.monotonic() - self._last_time >= self._seconds
+
+    def save(self, cycle):
+        """Snapshot the table and write it in the background, unless the last write is still running.
+
+        Tables kept in an external store that can copy itself, like SQLite,
+        are copied by the store instead, in its own format.
+        """
+        if self.busy():
+            return False
+        self._last_cycle, self._last_time = cycle, time.monotonic()
+        write = self._memory_table.backup()
+        if write is None:
+            changed = self._memory_table.changed_weights()
+            if changed is None or self._weights is None:
+                self._weights, changed = self._memory_table.snapshot(), {}
+            write = functools.partial(self._write_weights, changed)
+        self._thread = threading.Thread(target=self._write, args=(write, cycle), daemon=True)
+        self._thread.start()
+        return True
+
+    def _write(self, write, cycle):
+        try:
+            _settle(self._filename)
+            staging = staging_filename(self._filename)
+            write(staging)
+            write_progress(staging, cycle)
+            os.replace(staging, self._filename)
+            os.replace(progress_filename(staging), progress_filename(self._filename))
+        except Exception as e:
+            self.error = e
+
+    def _write_weights(self, changed, filename):
+        for key, weight in changed.items():
+            if weight is None:
+                self._weights.pop(key, None)
+            else:
+                self._weights[key] = weight
+        self._memory_table.write(self._weights, filename, self._binary)
+
+    def busy(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def wait(self):
+        """Wait until the checkpoint being written is complete."""
+        if self._thread is not None:
+            self._thread.join()
+
+
+def progress_filename(filename):
+    return f'{filename}.json'
+
+
+def staging_filename(filename):
+    return f'{filename}.next'
+
+
+def _settle(filename):
+    """Finish moving a staged checkpoint whose progress was left behind by a crash between the two moves."""
+    staging = staging_filename(filename)
+    if os.path.exists(progress_filename(staging)) and not os.path.exists(staging):
+        os.replace(progress_filename(staging), progress_filename(filename))
+
+
+def write_progress(filename, cycle):
+    """Write the number of cycles finished when the checkpoint file was written."""
+    temporary = f'{progress_filename(filename)}.tmp'
+    with open(temporary, 'w') as file:
+        json.dump({'cycle': cycle}, file)
+    os.replace(temporary, progress_filename(filename))
+
+
+def read_progress(filename):
+    """Return the number of cycles finished by a checkpoint or None if there is no checkpoint."""
+    _settle(filename)
+    if not os.path.exists(filename) or not os.path.exists(progress_filename(filename)):
+        return None
+    with open(progress_filename(filename), 'r') as file:
+        return json.load(file)['cycle']
@@ -1,18 +1,36 @@
 import abc
+import ast
 import copy
 import random
 import math
-import redis
-import simplejson as json
-from decimal import Decimal
+import os
+import sqlite3
+import numpy as np
 import itertools
+from . import memoryfile, selection
+import time
+import collections
+import heapq
 
-def create_adapter(name, args=[]):
+def create_adapter(name, args=[], number=float):
     if name == 'redis':
-        return RedisMemoryStorageAdapter(*args)
-    return DictMemoryStorageAdapter()
+        return RedisMemoryStorageAdapter(*args, number=number)
+    if name == 'redis-hash':
+        return RedisHashMemoryStorageAdapter(*args, number=number)
+    if name == 'bounded':
+        return BoundedMemoryStorageAdapter(*args, number=number)
+    if name == 'sqlite':
+        return SQLiteMemoryStorageAdapter(*args, number=number)
+    return DictMemoryStorageAdapter(number=number)
 
 class BaseMemoryStorageAdapter(abc.ABC):
+
+    # Whether the weights live in a store of their own, that load and persist do not read or write
+    external = False
+
+    # Where an external store keeps the weights, when known
+    location = None
+
     def get(self, key):
         """Return a key value."""
         pass
@@ -29,14 +47,32 @@ class BaseMemoryStorageAdapter(abc.ABC):
         """Persist data into a file."""
         pass
 
-    def load(self, filename):
-        """Load data from a file."""
+    def load(self, filename, progress=None):
+        """Load data from a file, reporting the bytes read and the file size to progress."""
         pass
 
     def keys(self):
         """Return all keys in the storage."""
         pass
 
+    def count(self):
+        """Return the number of keys in the storage."""
+        keys = self.keys()
+        return len(keys) if hasattr(keys, '__len__') else sum(1 for _ in keys)
+
+    def items(self):
+        """Yield every key and its value."""
+        for key in self.keys():
+            yield key, self.get(key)
+
+    def backup(self):
+        """Return a function copying an external store as it is now to a file, or None if it cannot."""
+        return None
+
+    def is_backup(self, filename):
+        """Return if a file is a copy written by the function of backup, which load restores."""
+        return False
+
     def clear(self):
         """Remove all data from the storage."""
         pass
@@ -54,51 +90,115 @@ class BaseMemoryStorageAdapter(abc.ABC):
             return self.get(key)
         return None
 
+    def weights(self, state, actions):
+        """Return the weights of the actions in a state, None for the unknown ones."""
+        return [self.weight(state, action) for action in actions]
+
+    def prefetch(self, states, actions):
+        """Hint that the weights of the actions in these states are about to be read."""
+        pass
+
 
 class DictMemoryStorageAdapter(BaseMemoryStorageAdapter):
-    def __init__(self):
+    """Adapter keeping the weights in a dict.
+
+    When attached to an opened memory file, the weights of a state are only
+    copied from the file the first time the state is accessed.
+    """
+
+    def __init__(self, number=float):
         self._data = {}
+        self._number = number
+
+        # Memory file read on demand and the states already read from it
+        self._source = None
+        self._fetched = set()
+
+    def _fetch(self, state):
+        """Copy the weights of a state from the attached file, once."""
+        if state not in self._fetched:
+            self._fetched.add(state)
+            for key, weight in self._source.state_items(state):
+                self._data.setdefault(key, self._number(weight))
+
+    def _fetch_all(self):
+        """Copy every weight left in the attached file and detach it."""
+        for key, weight in self._source.items():
+            if key.rpartition('_')[0] not in self._fetched:
+                self._data.setdefault(key, self._number(weight))
+        self._source.close()
+        self._source = None
+        self._fetched.clear()
+
+    def attach(self, source):
+        """Replace the data by the weights of an opened memory file, read state by state when first used."""
+        self.clear()
+        self._source = source
+        return True
 
     def get(self, key):
+        if self._source is not None:
+            self._fetch(key.rpartition('_')[0])
         return self._data[key]
 
     def set(self, key, value):
         self._data[key] = value
 
     def exists(self, key):
+        if self._source is not None:
+            self._fetch(key.rpartition('_')[0])
         return key in self._data
 
+    def weights(self, state, actions):
+        state = str(state)
+        if self._source is not None:
+            self._fetch(state)
+        return [self._data.get(f'{state}_{action}') for action in actions]
+
     def keys(self):
+        if self._source is not None:
+            self._fetch_all()
         return self._data.keys()
 
+    def items(self):
+        self.keys()
+        return self._data.items()
+
     def clear(self):
+        if self._source is not None:
+            self._source.close()
+            self._source = None
+            self._fetched.clear()
         self._data.clear()
 
     def remove(self, key):
+        if self._source is not None:
+            self._fetch(key.rpartition('_')[0])
         del self._data[key]
 
     def persist(self, filename):
-        with open(filename, 'w') as file:
-            json.dump({str(k): v for k, v in self._data.items()}, file)
-        return True
+        self.keys()
+        return memoryfile.write_json(filename, {str(k): v for k, v in self._data.items()})
 
-    def load(self, filename):
-        self._data.clear()
-        with open(filename, 'r') as file:
-            data = json.load(file)
-            for key, value in data.items():
-                self._data[key] = Decimal(value)
-                # self._data[key] = list(
-                #     map(lambda x: [x[0], Decimal(x[1])], value))
+    def load(self, filename, progress=None):
+        self.clear()
+        number = self._number
+        for key, weight in memoryfile.iter_json(filename, progress):
+            self._data[key] = number(weight)
         return True
 
 
 class RedisMemoryStorageAdapter(BaseMemoryStorageAdapter):
-    def __init__(self, hostname, db=0):
+
+    external = True
+
+    def __init__(self, hostname, db=0, number=float):
+        import redis
         self._redis = redis.Redis(hostname, db=db)
+        self._number = number
 
     def get(self, key):
-        return Decimal(self._redis.get(key).decode())
+        return self._number(self._redis.get(key).decode())
 
     def set(self, key, value):
         self._redis.set(key, value)
@@ -109,6 +209,9 @@ class RedisMemoryStorageAdapter(BaseMemoryStorageAdapter):
     def keys(self):
         return self._redis.keys()
 
+    def count(self):
+        return self._redis.dbsize()
+
     def clear(self):
         self._redis.flushdb()
 
@@ -118,68 +221,653 @@ class RedisMemoryStorageAdapter(BaseMemoryStorageAdapter):
     def persist(self, filename):
         return True
 
-    def load(self, filename):
+    def load(self, filename, progress=None):
+        return True
+
+
+class RedisHashMemoryStorageAdapter(BaseMemoryStorageAdapter):
+    """Redis adapter storing each state as one hash holding all action weights.
+
+    Rows are read with HMGET, several at a time through a pipeline, and kept
+    in a bounded local cache. Writes stay in the cache and are flushed in a
+    pipeline every interval seconds, when a changed row is evicted and on
+    persist. Keys live under a prefix so clear only deletes this table.
+    """
+
+    external = True
+
+    def __init__(self, hostname='localhost', db=0, prefix='memory', capacity=4096, interval=1.0,
+                 number=float, client=None):
+        if client is None:
+            import redis
+            client = redis.Redis(hostname, db=db)
+        self._redis = client
+        self._prefix = prefix
+        self._capacity = capacity
+        self._interval = interval
+        self._number = number
+
+        # Cached rows by state, mapping actions to weights or None when unknown
+        self._rows = collections.OrderedDict()
+        self._dirty = {}
+        self._flushed = time.monotonic()
+
+        # Key counting the stored weights, kept by the writes once it is known to exist
+        self._count_name = f'{prefix}#count'
+        self._counted = False
+
+        # Rows read from the cache and from Redis
+        self.hits = 0
+        self.misses = 0
+
+    def _name(self, state):
+        return f'{self._prefix}:{state}'
+
+    @staticmethod
+    def _split(key):
+        state, _, action = key.rpartition('_')
+        return state, action
+
+    def _decode(self, value):
+        return None if value is None else self._number(value.decode())
+
+    def _load(self, states, actions):
+        """Read the missing weights of the states in a single round trip."""
+        missing = []
+        for state in states:
+            row = self._rows.get(state)
+            fields = [action for action in actions if row is None or action not in row]
+            if fields:
+                missing.append((state, fields))
+        self.misses += len(missing)
+        self.hits += len(states) - len(missing)
+        if not missing:
+            return
+
+        pipeline = self._redis.pipeline(transaction=False)
+        for state, fields in missing:
+            pipeline.hmget(self._name(state), fields)
+        for (state, fields), values in zip(missing, pipeline.execute()):
+            row = self._rows.setdefault(state, {})
+            self._rows.move_to_end(state)
+            for action, value in zip(fields, values):
+                row[action] = self._decode(value)
+        self._evict(len(missing))
+
+    def _row(self, state, actions):
+        self._load([state], actions)
+        self._rows.move_to_end(state)
+        return self._rows[state]
+
+    def _evict(self, keep=0):
+        """Evict the least recently used rows over capacity, but never the keep most recent ones."""
+        while len(self._rows) > max(self._capacity, keep):
+            state = next(iter(self._rows))
+            if state in self._dirty:
+                self.flush()
+            del self._rows[state]
+
+    def _ensure_count(self):
+        """Create the weight counter from one scan of the table if it does not exist yet."""
+        if self._counted:
+            return
+        self._counted = True
+        if not self._redis.exists(self._count_name):
+            total = sum(self._redis.hlen(name) for name in self._redis.scan_iter(match=f'{self._prefix}:*'))
+            self._redis.set(self._count_name, total)
+
+    def flush(self):
+        """Write the changed weights to Redis."""
+        if self._dirty:
+            self._ensure_count()
+            pipeline = self._redis.pipeline(transaction=False)
+            for state, actions in self._dirty.items():
+                row = self._rows[state]
+                pipeline.hset(self._name(state), mapping={action: str(row[action]) for action in actions})
+            added = sum(pipeline.execute())
+            if added:
+                self._redis.incrby(self._count_name, added)
+            self._dirty.clear()
+        self._flushed = time.monotonic()
+
+    def get(self, key):
+        state, action = self._split(key)
+        value = self._row(state, [action])[action]
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def set(self, key, value):
+        state, action = self._split(key)
+        self._rows.setdefault(state, {})[action] = value
+        self._rows.move_to_end(state)
+        self._dirty.setdefault(state, set()).add(action)
+        self._evict()
+        if time.monotonic() - self._flushed >= self._interval:
+            self.flush()
+
+    def exists(self, key):
+        state, action = self._split(key)
+        return self._row(state, [action])[action] is not None
+
+    def weight(self, state, action, weight=None):
+        if weight is not None:
+            return self.set(f'{state}_{action}', weight)
+        return self._row(str(state), [str(action)])[str(action)]
+
+    def weights(self, state, actions):
+        actions = [str(action) for action in actions]
+        row = self._row(str(state), actions)
+        return [row[action] for action in actions]
+
+    def prefetch(self, states, actions):
+        self._load([str(state) for state in states], [str(action) for action in actions])
+
+    def keys(self):
+        self.flush()
+        start = len(self._prefix) + 1
+        for name in self._redis.scan_iter(match=f'{self._prefix}:*'):
+            state = name.decode()[start:]
+            for action in self._redis.hkeys(name):
+                yield f'{state}_{action.decode()}'
+
+    def count(self):
+        self.flush()
+        self._ensure_count()
+        return int(self._redis.get(self._count_name) or 0)
+
+    def clear(self):
+        self._rows.clear()
+        self._dirty.clear()
+        names = list(self._redis.scan_iter(match=f'{self._prefix}:*'))
+        for start in range(0, len(names), 1000):
+            self._redis.delete(*names[start:start + 1000])
+        # An empty table needs no counter, the first write creates it from zero
+        self._redis.delete(self._count_name)
+        self._counted = True
+
+    def remove(self, key):
+        state, action = self._split(key)
+        self._rows.pop(state, None)
+        self._dirty.pop(state, None)
+        self._ensure_count()
+        if self._redis.hdel(self._name(state), action):
+            self._redis.decr(self._count_name)
+
+    def persist(self, filename):
+        self.flush()
+        return True
+
+    def load(self, filename, progress=None):
+        return True
+
+
+class BoundedMemoryStorageAdapter(BaseMemoryStorageAdapter):
+    """Adapter keeping at most capacity states in memory, evicting them by a policy.
+
+    Policies are 'lru' for the least recently read state, 'visits' for the
+    least read state and 'variance' for the state whose action weights vary
+    the least. The last two evict a batch of states at once so the scan of
+    the rows is paid once per batch. New states start from the visits of
+    the most read state evicted last, so they are not the next ones
+    evicted. Evicted states are dropped unless a spill filename is given,
+    in which case they are moved to an on-disk shelf and read back when the
+    state is seen again. Saving streams the rows to the memory file, so it
+    does not read the spilled rows into memory together.
+    """
+
+    POLICIES = ('lru', 'visits', 'variance')
+
+    def __init__(self, capacity=100000, policy='lru', spill=None, number=float):
+        if policy not in self.POLICIES:
+            raise ValueError(f'Unknown eviction policy "{policy}", expected one of {self.POLICIES}')
+        self._capacity = capacity
+        self._policy = policy
+        self._batch = 1 if policy == 'lru' else max(1, capacity // 16)
+        self._number = number
+
+        # Resident rows by state, mapping actions to weights, and how many times each row was read
+        self._rows = collections.OrderedDict()
+        self._visits = {}
+        self._floor = 0
+        self._spill = None
+        if spill is not None:
+            import shelve
+            self._spill = shelve.open(spill, 'n')
+
+        # Rows read from memory and rows that were not resident
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def resident(self):
+        """Return the number of states kept in memory."""
+        return len(self._rows)
+
+    @property
+    def spilled(self):
+        """Return the number of states moved to the spill file."""
+        return 0 if self._spill is None else len(self._spill)
+
+    @property
+    def hit_rate(self):
+        reads = self.hits + self.misses
+        return self.hits / reads if reads else 0.0
+
+    @staticmethod
+    def _split(key):
+        state, _, action = key.rpartition('_')
+        return state, action
+
+    def _peek(self, state):
+        """Return the row of a state without reading it back from the spill file, or None if unknown."""
+        row = self._rows.get(state)
+        if row is None and self._spill is not None and state in self._spill:
+            row = self._spill[state][0]
+        return row
+
+    def _row(self, state):
+        """Return the row of a state, reading it back from the spill file, or None if unknown."""
+        row = self._rows.get(state)
+        if row is not None:
+            self.hits += 1
+            self._rows.move_to_end(state)
+            return row
+
+        self.misses += 1
+        if self._spill is None or state not in self._spill:
+            return None
+        row, visits = self._spill.pop(state)
+        self._insert(state, row, visits)
+        return row
+
+    def _insert(self, state, row, visits=None):
+        if len(self._rows) >= self._capacity:
+            self._evict()
+        self._rows[state] = row
+        self._visits[state] = self._floor if visits is None else visits
+
+    def _evict(self):
+        """Evict the next batch of states chosen by the policy."""
+        count = min(self._batch, len(self._rows))
+        if self._policy == 'lru':
+            states = list(itertools.islice(self._rows, count))
+        elif self._policy == 'visits':
+            states = heapq.nsmallest(count, self._visits, key=self._visits.__getitem__)
+        else:
+            states = heapq.nsmallest(
+                count, self._rows, key=lambda s: np.var([float(w) for w in self._rows[s].values()]))
+
+        for state in states:
+            row = self._rows.pop(state)
+            visits = self._visits.pop(state)
+            self._floor = max(self._floor, visits)
+            if self._spill is not None:
+                self._spill[state] = (row, visits)
+        self.evictions += len(states)
+
+    def visits(self, state):
+        """Return how many times the weights of a state were read."""
+        state = str(state)
+        if state in self._visits:
+            return self._visits[state]
+        if self._spill is not None and state in self._spill:
+            return self._spill[state][1]
+        return 0
+
+    def get(self, key):
+        state, action = self._split(key)
+        row = self._peek(state)
+        if row is None or action not in row:
+            raise KeyError(key)
+        return row[action]
+
+    def set(self, key, value):
+        state, action = self._split(key)
+        row = self._row(state)
+        if row is None:
+            self._insert(state, {action: value})
+        else:
+            row[action] = value
+
+    def exists(self, key):
+        state, action = self._split(key)
+        row = self._peek(state)
+        return row is not None and action in row
+
+    def weights(self, state, actions):
+        state = str(state)
+        row = self._row(state)
+        if row is None:
+            return [None] * len(actions)
+        self._visits[state] += 1
+        return [row.get(str(action)) for action in actions]
+
+    def _items(self):
+        """Return the resident and spilled rows by state."""
+        stored = [self._rows.items()]
+        if self._spill is not None:
+            stored.append((state, row) for state, (row, _) in self._spill.items())
+        return itertools.chain(*stored)
+
+    def keys(self):
+        return [f'{state}_{action}' for state, row in self._items() for action in row]
+
+    def clear(self):
+        self._rows.clear()
+        self._visits.clear()
+        self._floor = 0
+        if self._spill is not None:
+            self._spill.clear()
+
+    def remove(self, key):
+        state, action = self._split(key)
+        row = self._row(state)
+        if row is None:
+            raise KeyError(key)
+        del row[action]
+        if not row:
+            del self._rows[state]
+            del self._visits[state]
+
+    def persist(self, filename):
+        return memoryfile.write_json_items(
+            filename, ((f'{state}_{action}', weight) for state, row in self._items() for action, weight in row.items()))
+
+    def load(self, filename, progress=None):
+        self.clear()
+        for key, weight in memoryfile.iter_json(filename, progress):
+            self.set(key, self._number(weight))
+        return True
+
+    def close(self):
+        """Close the spill file."""
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+
+class SQLiteMemoryStorageAdapter(BaseMemoryStorageAdapter):
+    """Adapter storing the weights in a SQLite database in WAL mode, for tables larger than memory.
+
+    Each weight is a database row keyed by state and action. The rows of
+    the recently used states are kept in a bounded cache, read a state at a
+    time or all prefetched states in one query. Writes stay in the cache and
+    are written in one transaction once batch states changed, when a changed
+    state is evicted and on persist, so persisting only writes the changes
+    since the last transaction. The database is the memory, so the memory
+    filename given to persist and load is not used and every memory name
+    configured with the same database shares its weights.
+    """
+
+    external = True
+
+    def __init__(self, filename='data/memories/memory.sqlite', capacity=4096, batch=1024, number=float):
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(filename)
+        self._filename = filename
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS weights '
+                '(state TEXT, action TEXT, weight TEXT, PRIMARY KEY (state, action)) WITHOUT ROWID')
+        self._capacity = capacity
+        self._batch = batch
+        self._number = number
+
+        # Cached rows by state mapping actions to weights, and the changed actions by state
+        self._rows = collections.OrderedDict()
+        self._dirty = {}
+
+        # Rows read from the cache and from the database
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def resident(self):
+        """Return the number of cached states."""
+        return len(self._rows)
+
+    @property
+    def location(self):
+        return self._filename
+
+    @staticmethod
+    def _split(key):
+        state, _, action = key.rpartition('_')
+        return state, action
+
+    def _load(self, states):
+        """Read the rows of the states missing from the cache in a single query."""
+        missing = [state for state in dict.fromkeys(states) if state not in self._rows]
+        self.misses += len(missing)
+        self.hits += len(states) - len(missing)
+        if not missing:
+            return
+
+        for state in missing:
+            self._rows[state] = {}
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            query = f'SELECT state, action, weight FROM weights WHERE state IN ({", ".join("?" * len(chunk))})'
+            for state, action, weight in self._connection.execute(query, chunk):
+                self._rows[state][action] = self._number(weight)
+        self._evict(len(missing))
+
+    def _row(self, state):
+        self._load([state])
+        self._rows.move_to_end(state)
+        return self._rows[state]
+
+    def _evict(self, keep=0):
+        """Evict the least recently used rows over capacity, but never the keep most recent ones."""
+        while len(self._rows) > max(self._capacity, keep):
+            state = next(iter(self._rows))
+            if state in self._dirty:
+                self.flush()
+            del self._rows[state]
+
+    def flush(self):
+        """Write the changed weights to the database in one transaction."""
+        if self._dirty:
+            with self._connection:
+                self._connection.executemany(
+                    'INSERT OR REPLACE INTO weights VALUES (?, ?, ?)',
+                    [(state, action, str(self._rows[state][action]))
+                     for state, actions in self._dirty.items() for action in actions])
+            self._dirty.clear()
+
+    def get(self, key):
+        state, action = self._split(key)
+        value = self._row(state).get(action)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def set(self, key, value):
+        state, action = self._split(key)
+        self._row(state)[action] = value
+        self._dirty.setdefault(state, set()).add(action)
+        if len(self._dirty) >= self._batch:
+            self.flush()
+
+    def exists(self, key):
+        state, action = self._split(key)
+        return action in self._row(state)
+
+    def weight(self, state, action, weight=None):
+        if weight is not None:
+            return self.set(f'{state}_{action}', weight)
+        return self._row(str(state)).get(str(action))
+
+    def weights(self, state, actions):
+        row = self._row(str(state))
+        return [row.get(str(action)) for action in actions]
+
+    def prefetch(self, states, actions):
+        self._load([str(state) for state in states])
+
+    def keys(self):
+        self.flush()
+        return [f'{state}_{action}' for state, action in self._connection.execute('SELECT state, action FROM weights')]
+
+    def items(self):
+        """Yield every key and weight from one query, without reading them into the cache."""
+        self.flush()
+        number = self._number
+        for state, action, weight in self._connection.execute('SELECT state, action, weight FROM weights'):
+            yield f'{state}_{action}', number(weight)
+
+    def backup(self):
+        """Return a function copying the database as it is now to a file, which can run on another thread.
+
+        The changes are written first, and the copy reads the database in a
+        transaction begun here, so writes made while it runs are not copied.
+        """
+        self.flush()
+        source = sqlite3.connect(self._filename, check_same_thread=False)
+        source.execute('BEGIN')
+        source.execute('SELECT 1 FROM weights LIMIT 1').fetchall()
+
+        def copy(filename):
+            temporary = f'{filename}.tmp'
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            try:
+                target = sqlite3.connect(temporary)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+            finally:
+                source.close()
+            os.replace(temporary, filename)
+            return True
+        return copy
+
+    def is_backup(self, filename):
+        with open(filename, 'rb') as file:
+            return file.read(16) == b'SQLite format 3\0'
+
+    def count(self):
+        self.flush()
+        return self._connection.execute('SELECT COUNT(*) FROM weights').fetchone()[0]
+
+    def clear(self):
+        self._rows.clear()
+        self._dirty.clear()
+        with self._connection:
+            self._connection.execute('DELETE FROM weights')
+
+    def remove(self, key):
+        state, action = self._split(key)
+        self._rows.get(state, {}).pop(action, None)
+        self._dirty.get(state, set()).discard(action)
+        with self._connection:
+            self._connection.execute('DELETE FROM weights WHERE state = ? AND action = ?', (state, action))
+
+    def persist(self, filename):
+        self.flush()
+        self._connection.execute('PRAGMA wal_checkpoint(PASSIVE)')
+        return True
+
+    def load(self, filename, progress=None):
+        """Replace the database with a copy written by backup."""
+        self._rows.clear()
+        self._dirty.clear()
+        source = sqlite3.connect(filename)
+        try:
+            source.backup(self._connection)
+        finally:
+            source.close()
         return True
 
-def create_memory_table(name, actions, args):
+    def close(self):
+        """Write the changed weights and close the database."""
+        self.flush()
+        self._connection.close()
+
+
+def create_memory_table(name, actions, args, number=float):
     if name == 'double':
-        return DoubleMemoryTable(actions, *args)
-    return SingleMemoryTable(actions, *args)
+        return DoubleMemoryTable(actions, *args, number=number)
+    if name == 'array':
+        return ArrayMemoryTable(actions, *args, number=number)
+    return SingleMemoryTable(actions, *args, number=number)
 
 class BaseMemoryTable(abc.ABC):
-    def __init__(self, actions: list, adapter: BaseMemoryStorageAdapter):
+
+    # Softmax temperature of choose, or the best action if greedy
+    temperature = 1.0
+    greedy = False
+
+    def __init__(self, actions: list, adapter: BaseMemoryStorageAdapter, number=float):
         self._adapter = adapter
         self._actions = actions
+        self._number = number
+
+        # States changed since the last call of changed_weights, None until it is called and after a restore or load
+        self._changed = None
+
+    def _touch(self, state):
+        if self._changed is not None:
+            self._changed.add(state)
 
     @property
     def adapter(self):
         return self._adapter
 
+    @property
+    def external(self):
+        """Return if the weights live in an external store, that keeps them between runs."""
+        return self._adapter is not None and self._adapter.external
+
     def random(self):
         """Return a random action."""
         return random.choice(self._actions)
 
     def actions(self, state):
         """Return a list of weighted actions for a state."""
-        return [[a, self.adapter.weight(state, a)] for a in self._actions]
+        return [[a, w] for a, w in zip(self._actions, self.adapter.weights(state, self._actions))]
 
     def exists(self, state):
-        for action in self._actions:
-            if self.adapter.weight(state, action) is not None:
-                return True
-        return False
+        return any(weight is not None for weight in self.adapter.weights(state, self._actions))
 
     def choose(self, state):
-        """Return a action for a state using probabilities."""
-        if not self.exists(state):
+        """Return a action for a state sampled from the softmax of its weights, or the best if greedy."""
+        weights = self.adapter.weights(state, self._actions)
+        if None in weights:
             return self.random()
-
-        actions = self.actions(state)
-        weights = [float(a[1]) for a in actions]
-        sum_of_weights = sum([math.exp(w) for w in weights])
-        probabilities = [math.exp(a[1]) / sum_of_weights for a in actions]
-        return random.choices([a[0] for a in actions], weights=probabilities)[0]
+        return selection.choose(self._actions, weights, self.temperature, self.greedy)
 
     def best(self, state):
         """Return a weighted-action for a state with highest weight."""
         if self.exists(state):
             return max(self.actions(state), key=lambda x: x[1])
-        return [None, Decimal('1')]
+        return [None, self._number(1)]
 
     def initialize_state(self, state):
         """Create a list of weighted actions for a state."""
         actions = copy.deepcopy(self._actions)
         for action in actions:
-            self.adapter.weight(state, action, Decimal('1'))
+            self.adapter.weight(state, action, self._number(1))
+        self._touch(state)
 
     def update(self, state, action, reward, next_state, learning, discount):
         """Update table data."""
+        self._touch(state)
+        self.adapter.prefetch((state, next_state), self._actions)
         if not self.exists(state):
             self.initialize_state(state)
 
+        number = self._number
         weight = self.adapter.weight(state, action)
         weight = self._calculate_weight(
-            weight, learning, discount, reward, self.best(next_state)[1])
+            weight, number(learning), number(discount), number(reward), self.best(next_state)[1])
 
         self.adapter.weight(state, action, weight)
 
@@ -187,12 +875,103 @@ class BaseMemoryTable(abc.ABC):
         """Apply Q-learning update formula."""
         return (1 - learning) * weight + learning * (reward + discount * next_weight)
 
-    def save(self, filename):
-        """Persist/save table data in a file."""
-        return self.adapter.persist(filename)
+    def snapshot(self):
+        """Return a copy of the table weights."""
+        return dict(self.adapter.items())
+
+    def changed_weights(self):
+        """Return the weights of the states changed since the last call, None for the removed ones.
+
+        Returns None on the first call and after a restore or load, when
+        the changes are unknown and a snapshot is needed instead.
+        """
+        changed, self._changed = self._changed, set()
+        if changed is None:
+            return None
+        return {f'{state}_{action}': self._weight(state, action) for state in changed for action in self._actions}
+
+    def _weight(self, state, action):
+        return self.adapter.weight(state, action)
+
+    def backup(self):
+        """Return a function copying the external store of the table to a file, or None if it has none."""
+        return None if self._adapter is None else self._adapter.backup()
+
+    def restore(self, snapshot):
+        """Replace the table weights with a snapshot."""
+        self._changed = None
+        self.adapter.clear()
+        for key, weight in snapshot.items():
+            self.adapter.set(key, weight)
+
+    def changes(self, snapshot):
+        """Return the weight changes made since a snapshot."""
+        initial = self._number(1)
+        changes = {}
+        for key in self.adapter.keys():
+            delta = self.adapter.get(key) - snapshot.get(key, initial)
+            if delta or key not in snapshot:
+                changes[key] = delta
+        return changes
+
+    def merge(self, changes):
+        """Add weight changes to the table."""
+        initial = self._number(1)
+        for key, delta in changes.items():
+            self._touch(key.rpartition('_')[0])
+            weight = self.adapter.get(key) if self.adapter.exists(key) else initial
+            self.adapter.set(key, weight + self._number(delta))
+
+    def size(self):
+        """Return the number of weights in the table."""
+        return self.adapter.count()
+
+    def save(self, filename, binary=False):
+        """Persist/save table data in a file, in the binary memory format if binary."""
+        if not binary:
+            return self.adapter.persist(filename)
+        return self._write_binary(self.adapter.items(), filename)
+
+    def write(self, snapshot, filename, binary=False):
+        """Write a snapshot to a memory file, replacing the file only once it is complete."""
+        if not binary:
+            return memoryfile.write_json(filename, {str(key): weight for key, weight in snapshot.items()})
+        return self._write_binary(snapshot.items(), filename)
+
+    def _write_binary(self, items, filename):
+        """Write the keys and weights of a single table adapter to a binary memory file."""
+        rows = {}
+        for key, weight in items:
+            state, _, action = key.rpartition('_')
+            rows.setdefault(state, {})[action] = float(weight)
+        weights = [[row.get(str(action), 1.0) for action in self._actions] for row in rows.values()]
+        return memoryfile.write(filename, self._actions, list(rows), weights)
+
+    def load(self, filename, progress=None, lazy=False):
+        """Load table data saved by any table in either format.
+
+        If lazy and the adapter can attach a memory file, states are read
+        from the file only when first used. Adapters with an external store
+        have their store replaced by the weights of the file, or by the copy
+        of the store their backup wrote. progress is
+        called with the bytes read and the file size while a JSON memory is
+        read.
+        """
+        self._changed = None
+        if lazy and hasattr(self.adapter, 'attach'):
+            return self.adapter.attach(memoryfile.open_index(filename, progress))
+        if self.adapter.is_backup(filename):
+            return self.adapter.load(filename, progress)
+        binary = memoryfile.is_binary(filename)
+        if not binary and not self.adapter.external:
+            return self.adapter.load(filename, progress)
 
-    def load(self, filename):
-        return self.adapter.load(filename)
+        # Binary files, and any file into an external store, are copied weight by weight
+        self.adapter.clear()
+        items = memoryfile.MemoryFile(filename).items() if binary else memoryfile.iter_json(filename, progress)
+        for key, weight in items:
+            self.adapter.set(key, self._number(weight))
+        return True
 
 
 class SingleMemoryTable(BaseMemoryTable):
@@ -200,21 +979,113 @@ class SingleMemoryTable(BaseMemoryTable):
 
 
 class DoubleMemoryTable(BaseMemoryTable):
-    def __init__(self, actions: list, adapter: BaseMemoryStorageAdapter, hidden_adapter: BaseMemoryStorageAdapter, delay: int):
-        super().__init__(actions, adapter)
-        self._hidden_memory_table = SingleMemoryTable(actions, hidden_adapter)
+    """Memory table learning in a hidden adapter published to the active one every delay updates.
+
+    When incremental, publishing is spread over the next delay updates: the
+    states added to the hidden adapter are queued and each update moves a
+    share of them, so no single update pays for the whole copy. A queued
+    state about to be changed is published first, copy on write, so the
+    active adapter only ever receives the weights of a boundary. Until the
+    queue is empty, its states keep their weights of the previous boundary.
+    """
+
+    def __init__(self, actions: list, adapter: BaseMemoryStorageAdapter, hidden_adapter: BaseMemoryStorageAdapter, delay: int, incremental=False, number=float):
+        super().__init__(actions, adapter, number)
+        self._hidden_memory_table = SingleMemoryTable(actions, hidden_adapter, number)
         self._delay = 0
         self._max_delay = delay
+        self._incremental = incremental
+
+        # Keys of the states added to the hidden adapter and of the queued ones, and how many to publish per update
+        self._added = []
+        self._pending = collections.OrderedDict()
+        self._share = 1
 
     def _refresh(self):
         """Update active adapter with changes made in the hidden adapter."""
         for key in self._hidden_memory_table.adapter.keys():
             self.adapter.set(key, self._hidden_memory_table.adapter.get(key))
         self._hidden_memory_table.adapter.clear()
+        self._added.clear()
+        self._pending.clear()
+
+    def _queue(self):
+        """Queue the states added to the hidden adapter to be published over the next updates."""
+        while self._pending:
+            self._publish_state(self._pending.popitem(last=False)[0])
+        self._pending.update(dict.fromkeys(self._added))
+        self._added.clear()
+        self._share = max(1, math.ceil(len(self._pending) / self._max_delay))
+
+    def _publish(self):
+        """Move the next share of queued states from the hidden adapter to the active one."""
+        for _ in range(min(self._share, len(self._pending))):
+            self._publish_state(self._pending.popitem(last=False)[0])
+
+    def _publish_state(self, state, keep=False):
+        """Copy the hidden weights of a state to the active adapter, removing them from the hidden one unless keep."""
+        hidden = self._hidden_memory_table
+        if not hidden.exists(state):
+            return
+        for action, weight in hidden.actions(state):
+            self.adapter.weight(state, action, weight)
+            if not keep:
+                hidden.adapter.remove(f'{state}_{action}')
+
+    def _unqueue(self, state):
+        """Publish a queued state before its hidden weights change, queueing it again at the next boundary."""
+        key = str(state)
+        if key in self._pending:
+            del self._pending[key]
+            self._publish_state(key, keep=True)
+            self._added.append(key)
+
+    def snapshot(self):
+        """Return a copy of the weights, the unpublished hidden ones over the active ones, without publishing."""
+        snapshot = super().snapshot()
+        snapshot.update(self._hidden_memory_table.adapter.items())
+        return snapshot
+
+    def _weight(self, state, action):
+        weight = self._hidden_memory_table.adapter.weight(state, action)
+        return self.adapter.weight(state, action) if weight is None else weight
+
+    def backup(self):
+        # A copy of the active store would miss the unpublished hidden weights
+        return None
+
+    def restore(self, snapshot):
+        self._hidden_memory_table.adapter.clear()
+        self._added.clear()
+        self._pending.clear()
+        super().restore(snapshot)
+
+    def changes(self, snapshot):
+        initial = self._number(1)
+        changes = {}
+        for key, weight in self.snapshot().items():
+            delta = weight - snapshot.get(key, initial)
+            if delta or key not in snapshot:
+                changes[key] = delta
+        return changes
+
+    def merge(self, changes):
+        """Add weight changes to the hidden weights of a state if it has them, else to the active ones."""
+        initial = self._number(1)
+        hidden = self._hidden_memory_table.adapter
+        for key, delta in changes.items():
+            self._touch(key.rpartition('_')[0])
+            self._unqueue(key.rpartition('_')[0])
+            adapter = hidden if hidden.exists(key) else self.adapter
+            weight = adapter.get(key) if adapter.exists(key) else initial
+            adapter.set(key, weight + self._number(delta))
 
     def update(self, state, action, reward, next_state, learning, discount):
         """Update table data."""
 
+        self._touch(state)
+        self._touch(next_state)
+        self._unqueue(state)
         for s in (state, next_state):
             if not self._hidden_memory_table.exists(s):
                 if self.exists(s):
@@ -223,11 +1094,290 @@ class DoubleMemoryTable(BaseMemoryTable):
                             s, a[0], a[1])
                 else:
                     self._hidden_memory_table.initialize_state(s)
+                if self._incremental:
+                    self._added.append(str(s))
 
         self._hidden_memory_table.update(
             state, action, reward, next_state, learning, discount)
 
         self._delay += 1
+        if self._incremental:
+            self._publish()
         if self._delay >= self._max_delay:
             self._delay = 0
-            self._refresh()
+            if self._incremental:
+                self._queue()
+            else:
+                self._refresh()
+
+
+class StateIndex:
+    """Map states to dense integer indexes in the order they are first seen."""
+
+    def __init__(self):
+        self._indexes = {}
+        self._states = []
+
+    def __len__(self):
+        return len(self._states)
+
+    def __contains__(self, state):
+        return state in self._indexes
+
+    def get(self, state):
+        """Return the index of a state or None if it was never added."""
+        return self._indexes.get(state)
+
+    def add(self, state):
+        """Return the index of a state, adding it if needed."""
+        index = self._indexes.get(state)
+        if index is None:
+            index = self._indexes[state] = len(self._states)
+            self._states.append(state)
+        return index
+
+    def state(self, index):
+        """Return the state of an index."""
+        return self._states[index]
+
+    def clear(self):
+        self._indexes.clear()
+        self._states.clear()
+
+
+class FileStateIndex(StateIndex):
+    """State index of the keys of a binary memory file, parsing a key only once its state is used."""
+
+    def __init__(self, keys):
+        super().__init__()
+        self._keys = {key: index for index, key in enumerate(keys)}
+        self._states = list(keys)
+
+    def __contains__(self, state):
+        return self.get(state) is not None
+
+    def get(self, state):
+        index = self._indexes.get(state)
+        if index is None:
+            index = self._keys.get(str(state))
+            if index is not None:
+                self._indexes[state] = index
+        return index
+
+    def add(self, state):
+        index = self.get(state)
+        if index is None:
+            index = self._indexes[state] = len(self._states)
+            self._states.append(state)
+        return index
+
+    def state(self, index):
+        state = self._states[index]
+        if isinstance(state, str):
+            state = self._states[index] = ast.literal_eval(state)
+        return state
+
+    def clear(self):
+        super().clear()
+        self._keys.clear()
+
+
+class ArrayMemoryTable(BaseMemoryTable):
+    """Memory table storing the weights of every state in a dense array.
+
+    States are mapped to rows by a StateIndex and actions to columns, so a
+    lookup or an update is a single index operation in a (states, actions)
+    float array that grows as new states are seen.
+    """
+
+    def __init__(self, actions: list, capacity: int = 1024, number=float):
+        if number is not float:
+            raise ValueError('The array memory table only supports the float numeric backend')
+        super().__init__(actions, None, number)
+        self._columns = {action: column for column, action in enumerate(actions)}
+        self._states = StateIndex()
+        self._values = np.ones((max(capacity, 1), len(actions)))
+
+    @property
+    def values(self):
+        """Return the weights of the known states, one row per state."""
+        return self._values[:len(self._states)]
+
+    @property
+    def states(self):
+        return self._states
+
+    def size(self):
+        return len(self._states) * len(self._actions)
+
+    def index(self, state):
+        """Return the row of a state or None if the state is unknown."""
+        return self._states.get(state)
+
+    def column(self, action):
+        """Return the column of an action."""
+        return self._columns[action]
+
+    def actions(self, state):
+        index = self._states.get(state)
+        if index is None:
+            return [[a, None] for a in self._actions]
+        return [[a, w] for a, w in zip(self._actions, self._values[index].tolist())]
+
+    def exists(self, state):
+        return state in self._states
+
+    def choose(self, state):
+        index = self._states.get(state)
+        if index is None:
+            return self.random()
+
+        return selection.choose(self._actions, self._values[index].tolist(), self.temperature, self.greedy)
+
+    def best(self, state):
+        index = self._states.get(state)
+        if index is None:
+            return [None, 1.0]
+        weights = self._values[index].tolist()
+        column = weights.index(max(weights))
+        return [self._actions[column], weights[column]]
+
+    def reserve(self, count):
+        """Grow the weights array to hold count more states."""
+        needed = len(self._states) + count
+        if needed > len(self._values):
+            values = np.ones((needed, len(self._actions)))
+            values[:len(self._values)] = self._values
+            self._values = values
+
+    def initialize_state(self, state):
+        index = self._states.add(state)
+        if index >= len(self._values):
+            values = np.ones((len(self._values) * 2, len(self._actions)))
+            values[:len(self._values)] = self._values
+            self._values = values
+        self._values[index] = 1.0
+        return index
+
+    def update(self, state, action, reward, next_state, learning, discount):
+        index = self._states.get(state)
+        if index is None:
+            index = self.initialize_state(state)
+
+        next_index = self._states.get(next_state)
+        next_weight = 1.0 if next_index is None else max(self._values[next_index].tolist())
+
+        column = self._columns[action]
+        self._values[index, column] = self._calculate_weight(
+            self._values.item(index, column), float(learning), float(discount), float(reward), next_weight)
+
+    def update_rows(self, rows, columns, rewards, next_rows, learning, discount, dones=None):
+        """Apply the update to a batch of transitions between rows, returning their temporal difference errors.
+
+        Unknown next states have a negative row and weigh 1 like in update,
+        and ended transitions do not look ahead when dones is given. Next
+        weights are read before the batch, and a row and column repeated in
+        the batch is updated once per transition in batch order, like
+        consecutive calls to update.
+        """
+        values = self._values
+        learning = float(learning)
+        next_weights = np.where(next_rows >= 0, values[np.maximum(next_rows, 0)].max(axis=1), 1.0)
+        if dones is not None:
+            next_weights = np.where(dones, 0.0, next_weights)
+        targets = rewards + float(discount) * next_weights
+        weights = values[rows, columns]
+        errors = targets - weights
+        values[rows, columns] = weights + learning * errors
+
+        _, inverse, counts = np.unique(rows * values.shape[1] + columns, return_inverse=True, return_counts=True)
+        repeated = np.flatnonzero(counts[inverse] > 1)
+        if len(repeated):
+            values[rows[repeated], columns[repeated]] = weights[repeated]
+            for index in repeated.tolist():
+                row, column = rows[index], columns[index]
+                error = targets[index] - values[row, column]
+                values[row, column] += learning * error
+                errors[index] = error
+        return errors
+
+    def snapshot(self):
+        """Return a copy of the states and weights, states unused since a binary load kept as keys."""
+        return (list(self._states._states), self.values.copy())
+
+    def changed_weights(self):
+        # Copying the array takes less than tracking the changed rows would
+        return None
+
+    def restore(self, snapshot):
+        states, values = snapshot
+        self._states = StateIndex()
+        self._values = np.ones((max(len(states), 1), len(self._actions)))
+        for state in states:
+            self._states.add(ast.literal_eval(state) if isinstance(state, str) else state)
+        self._values[:len(states)] = values
+
+    def changes(self, snapshot):
+        """Return the weight changes made since a snapshot, keyed by state and action."""
+        count = len(snapshot[0])
+        values = self.values
+        changes = {}
+        for index, column in zip(*np.nonzero(values[:count] != snapshot[1])):
+            changes[(self._states.state(index), self._actions[column])] = \
+                values.item(index, column) - snapshot[1].item(index, column)
+        for index in range(count, len(values)):
+            for column, action in enumerate(self._actions):
+                changes[(self._states.state(index), action)] = values.item(index, column) - 1.0
+        return changes
+
+    def merge(self, changes):
+        for (state, action), delta in changes.items():
+            index = self._states.get(state)
+            if index is None:
+                index = self.initialize_state(state)
+            self._values[index, self._columns[action]] += delta
+
+    def save(self, filename, binary=False):
+        return self.write((self._states._states, self.values), filename, binary)
+
+    def write(self, snapshot, filename, binary=False):
+        states, values = snapshot
+        keys = [str(state) for state in states]
+        if binary:
+            return memoryfile.write(filename, self._actions, keys, values)
+
+        data = {}
+        for key, row in zip(keys, values.tolist()):
+            for action, weight in zip(self._actions, row):
+                data[f'{key}_{action}'] = weight
+        return memoryfile.write_json(filename, data)
+
+    def load(self, filename, progress=None, lazy=False):
+        """Load a memory saved by any single table adapter.
+
+        Binary memories are memory-mapped and their state keys are only
+        parsed when the state is used, so loading does not read the weights
+        and is always lazy. JSON memories are streamed into the array and
+        their state keys are parsed on use as well.
+        """
+        if memoryfile.is_binary(filename):
+            memory = memoryfile.MemoryFile(filename)
+            if memory.actions != list(self._actions):
+                raise ValueError(f'{filename} was saved with the actions {memory.actions}')
+            self._states = FileStateIndex(memory.keys)
+            self._values = memory.weights if len(memory) else np.ones((1, len(self._actions)))
+            return True
+
+        rows = {}
+        values = np.ones((1, len(self._actions)))
+        for key, weight in memoryfile.iter_json(filename, progress):
+            state, _, action = key.rpartition('_')
+            row = rows.get(state)
+            if row is None:
+                row = rows[state] = len(rows)
+                if row == len(values):
+                    values = np.concatenate((values, np.ones_like(values)))
+            values[row, self._columns[int(action)]] = float(weight)
+        self._states = FileStateIndex(list(rows))
+        self._values = values
+        return True
@@ -0,0 +1,278 @@
+"""Versioned binary memory file holding the state keys and a dense weight array.
+
+Layout, little endian:
+
+    header   magic, version, action count, state count, state bytes
+    actions  int64 per action
+    states   UTF-8 state keys separated by new lines, padded to 8 bytes
+    weights  float64 per state and action, row by row
+
+The weights are memory-mapped copy-on-write, so opening a file does not
+read them and changing them does not touch the file.
+
+Convert a JSON memory to binary and back from the repository root:
+
+    python -m learning.memoryfile data/memories/Name data/memories/Name.bin
+"""
+import array
+import mmap
+import os
+import re
+import struct
+import sys
+import numpy as np
+import simplejson as json
+
+MAGIC = b'QMEM'
+VERSION = 1
+HEADER = struct.Struct('<4sHHQQ')
+
+# Opening of a JSON memory, and one "key": number entry followed by its separator
+START = re.compile(rb'\s*\{\s*(\})?')
+ENTRY = re.compile(
+    rb'\s*"([^"\\]*(?:\\.[^"\\]*)*)"\s*:\s*(-?(?:\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|Infinity)|NaN)\s*([,}])')
+CHUNK = 1 << 20
+LONGEST_ENTRY = 1 << 16
+
+
+def is_binary(filename):
+    """Return if a file starts with the binary memory magic."""
+    with open(filename, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def write(filename, actions, states, weights):
+    """Write state keys and their (states, actions) weights to a binary memory file.
+
+    The file is written aside and renamed over the destination, so weights
+    mapped from the previous file stay readable while they are saved.
+    """
+    blob = '\n'.join(states).encode()
+    weights = np.ascontiguousarray(weights, dtype='<f8').reshape(-1, len(actions))
+    temporary = f'{filename}.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(actions), len(weights), len(blob)))
+        file.write(np.asarray(actions, dtype='<i8').tobytes())
+        file.write(blob)
+        file.write(b'\0' * (-(HEADER.size + len(blob)) % 8))
+        file.write(weights.tobytes())
+    os.replace(temporary, filename)
+    return True
+
+
+def write_json(filename, data):
+    """Write a JSON memory file aside and rename it over the destination."""
+    temporary = f'{filename}.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(data, file)
+    os.replace(temporary, filename)
+    return True
+
+
+def write_json_items(filename, items):
+    """Write the keys and weights of an iterable to a JSON memory file aside and rename it over the destination.
+
+    The entries are written as they are read, so the weights never need to
+    be held in memory together.
+    """
+    temporary = f'{filename}.tmp'
+    with open(temporary, 'w') as file:
+        file.write('{')
+        separator = ''
+        for key, weight in items:
+            file.write(f'{separator}{json.dumps(str(key))}: {json.dumps(weight)}')
+            separator = ', '
+        file.write('}')
+    os.replace(temporary, filename)
+    return True
+
+
+class MemoryFile:
+    """Binary memory file opened with the weights memory-mapped."""
+
+    def __init__(self, filename):
+        self._rows = None
+        with open(filename, 'rb') as file:
+            magic, version, actions, count, size = HEADER.unpack(file.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f'{filename} is not a binary memory file')
+            if version != VERSION:
+                raise ValueError(f'Unsupported binary memory version {version}')
+            self.actions = np.frombuffer(file.read(actions * 8), dtype='<i8').tolist()
+            blob = file.read(size)
+            self.keys = blob.decode().split('\n') if count else []
+
+            offset = HEADER.size + actions * 8 + size
+            offset += -offset % 8
+            if count:
+                self.weights = np.memmap(file, dtype='<f8', mode='c', offset=offset, shape=(count, actions))
+            else:
+                self.weights = np.ones((0, actions))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def items(self):
+        """Yield the single table adapter keys and weights."""
+        for key, row in zip(self.keys, self.weights.tolist()):
+            for action, weight in zip(self.actions, row):
+                yield f'{key}_{action}', weight
+
+    def state_items(self, state):
+        """Return the single table adapter keys and weights of a state."""
+        if self._rows is None:
+            self._rows = {key: index for index, key in enumerate(self.keys)}
+        index = self._rows.get(state)
+        if index is None:
+            return []
+        return [(f'{state}_{action}', weight) for action, weight in zip(self.actions, self.weights[index].tolist())]
+
+    def close(self):
+        pass
+
+
+def _key(text):
+    """Return a JSON string body as a key."""
+    key = text.decode()
+    return json.loads(f'"{key}"') if '\\' in key else key
+
+
+def _entries(filename, progress=None, chunk=CHUNK):
+    """Yield the offset, key and number text of the entries of a JSON memory file."""
+    total = os.path.getsize(filename)
+    with open(filename, 'rb') as file:
+        buffer = file.read(chunk)
+        if progress is not None:
+            progress(len(buffer), total)
+        start = START.match(buffer)
+        if start is None:
+            raise ValueError(f'{filename} is not a JSON memory file')
+        if start.group(1):
+            return
+
+        # File offset of the buffer and position of the next entry in it
+        offset, position = 0, start.end()
+        while True:
+            match = ENTRY.match(buffer, position)
+            if match is None:
+                data = file.read(chunk)
+                if not data or len(buffer) - position > max(chunk, LONGEST_ENTRY):
+                    raise ValueError(f'{filename} is not a valid JSON memory file, error at byte {offset + position}')
+                offset += position
+                buffer = buffer[position:] + data
+                position = 0
+                if progress is not None:
+                    progress(offset + len(buffer), total)
+                continue
+            yield offset + position, _key(match.group(1)), match.group(2).decode()
+            if match.group(3) == b'}':
+                return
+            position = match.end()
+
+
+def iter_json(filename, progress=None, chunk=CHUNK):
+    """Yield the keys and number texts of a JSON memory file, reading it chunk by chunk.
+
+    Only a chunk is held in memory, so callers convert each weight straight
+    into their own number type. progress is called with the bytes read and
+    the file size after each chunk. Malformed files raise a ValueError with
+    the byte offset of the error.
+    """
+    for _, key, weight in _entries(filename, progress, chunk):
+        yield key, weight
+
+
+class JSONIndex:
+    """Index of the entries of a JSON memory file by state, reading the weights of a state on demand.
+
+    Opening scans the file once, keeping only the hash of the state and the
+    offset of each entry in two arrays, and the file is then memory-mapped
+    so the entries of a state are parsed only when it is looked up.
+    """
+
+    def __init__(self, filename, progress=None):
+        self._filename = filename
+        hashes, offsets = array.array('q'), array.array('q')
+        for offset, key, _ in _entries(filename, progress):
+            hashes.append(hash(key.rpartition('_')[0]))
+            offsets.append(offset)
+        hashes = np.frombuffer(hashes, dtype=np.int64)
+        order = np.argsort(hashes, kind='stable')
+        self._hashes = hashes[order]
+        self._offsets = np.frombuffer(offsets, dtype=np.int64)[order]
+        self._map = None
+        if len(offsets):
+            with open(filename, 'rb') as file:
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def state_items(self, state):
+        """Return the keys and number texts of the entries of a state."""
+        value = hash(state)
+        start = np.searchsorted(self._hashes, value)
+        end = np.searchsorted(self._hashes, value, side='right')
+        items = []
+        for offset in self._offsets[start:end].tolist():
+            match = ENTRY.match(self._map, offset)
+            key = _key(match.group(1))
+            if key.rpartition('_')[0] == state:
+                items.append((key, match.group(2).decode()))
+        return items
+
+    def items(self):
+        """Yield the keys and number texts of every entry."""
+        return iter_json(self._filename)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+def open_index(filename, progress=None):
+    """Return a memory file in either format opened to look up the weights of a state on demand."""
+    if is_binary(filename):
+        return MemoryFile(filename)
+    return JSONIndex(filename, progress)
+
+
+def read_json(filename):
+    """Return the actions, state keys and weights of a JSON memory file."""
+    rows, actions = {}, []
+    for key, weight in iter_json(filename):
+        state, _, action = key.rpartition('_')
+        action = int(action)
+        if action not in actions:
+            actions.append(action)
+        rows.setdefault(state, {})[action] = float(weight)
+    actions.sort()
+    weights = np.ones((len(rows), len(actions)))
+    for index, row in enumerate(rows.values()):
+        for column, action in enumerate(actions):
+            weights[index, column] = row.get(action, 1.0)
+    return actions, list(rows), weights
+
+
+def convert(source, destination):
+    """Convert a memory file from JSON to binary or from binary to JSON."""
+    if is_binary(source):
+        memory = MemoryFile(source)
+        with open(destination, 'w') as file:
+            json.dump(dict(memory.items()), file)
+        return True
+    return write(destination, *read_json(source))
+
+
+def main():
+    if len(sys.argv) != 3:
+        print('Usage: python -m learning.memoryfile SOURCE DESTINATION')
+        return 1
+    convert(sys.argv[1], sys.argv[2])
+    print(f'Converted "{sys.argv[1]}" to "{sys.argv[2]}"')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,9 @@
+"""Module for the numeric backends used by the memory tables."""
+from decimal import Decimal
+
+
+def create(name='float'):
+    """Return the number type for a backend name."""
+    if name == 'decimal':
+        return Decimal
+    return float
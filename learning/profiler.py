@@ -0,0 +1,83 @@
+"""Module for the optional instrumentation of the training loop."""
+import collections
+
+
+class Profiler:
+    """Accumulate the time spent in each phase of the step loop and counters of operations.
+
+    Environments only time their phases when a profiler is set, so training
+    without one pays nothing but the choice of the step method.
+    """
+
+    def __init__(self):
+        self.times = collections.defaultdict(float)
+        self.counts = collections.Counter()
+        self._adapters = []
+        self._cache = {}
+
+    def add(self, phase, seconds):
+        """Add the time spent in a phase."""
+        self.times[phase] += seconds
+
+    def attach(self, agent):
+        """Count the calls made to the memory table of an agent and to its adapters."""
+        memory_table = agent._memories
+        if isinstance(memory_table, CountingProxy):
+            return
+        agent._memories = CountingProxy(memory_table, 'table', self)
+        for table in (memory_table, getattr(memory_table, '_hidden_memory_table', None)):
+            adapter = getattr(table, '_adapter', None)
+            if adapter is not None:
+                table._adapter = CountingProxy(adapter, 'adapter', self)
+                self._adapters.append(adapter)
+
+    def _cache_counts(self):
+        """Count the cache hits, misses and evictions of the cached adapters since the last report."""
+        for adapter in self._adapters:
+            for name in ('hits', 'misses', 'evictions'):
+                if hasattr(adapter, name):
+                    value = getattr(adapter, name)
+                    self.counts[f'adapter.{name}'] += value - self._cache.get((id(adapter), name), 0)
+                    self._cache[(id(adapter), name)] = value
+
+    def report(self, seconds, steps, episodes, size):
+        """Return the throughput, phase times and counters since the last report, and reset them."""
+        self._cache_counts()
+        report = {
+            'seconds': seconds,
+            'steps': steps,
+            'episodes': episodes,
+            'steps_per_second': steps / seconds if seconds else 0.0,
+            'episodes_per_second': episodes / seconds if seconds else 0.0,
+            'table_size': size,
+            'phases': dict(self.times),
+            'counts': dict(self.counts),
+        }
+        resident = [adapter.resident for adapter in self._adapters if hasattr(adapter, 'resident')]
+        if resident:
+            report['resident_states'] = sum(resident)
+        self.times.clear()
+        self.counts.clear()
+        return report
+
+
+class CountingProxy:
+    """Proxy of a memory table or adapter counting the calls made to each method."""
+
+    def __init__(self, target, prefix, profiler):
+        self._target = target
+        self._prefix = prefix
+        self._counts = profiler.counts
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if not callable(attribute):
+            return attribute
+
+        key = f'{self._prefix}.{name}'
+        counts = self._counts
+
+        def counted(*args, **kwargs):
+            counts[key] += 1
+            return attribute(*args, **kwargs)
+        return counted
@@ -0,0 +1,107 @@
+"""Module for the experience replay of transitions between memory table rows."""
+import numpy as np
+
+
+class ReplayBuffer:
+    """Fixed-capacity ring buffer of transitions replayed in minibatches against an array memory table.
+
+    Transitions are stored as the rows of their states in the table, the
+    column of the action, the reward and whether the episode ended. After
+    each online update, ratio replayed updates per transition are owed and
+    paid batch_size at a time, each minibatch applied in one vectorized
+    pass. When prioritized, transitions are sampled in proportion to their
+    last temporal difference error raised to alpha, new ones with the
+    highest priority seen so they are replayed at least once. Replayed
+    updates look ahead from every next state like the online update,
+    unless terminal, which stops them at the transitions that ended an
+    episode.
+    """
+
+    def __init__(self, capacity=100000, batch_size=32, ratio=1.0, prioritized=False, alpha=0.6, seed=None,
+                 terminal=False):
+        self._capacity = capacity
+        self._batch_size = batch_size
+        self._ratio = ratio
+        self._prioritized = prioritized
+        self._alpha = alpha
+        self._terminal = terminal
+        self._random = np.random.default_rng(seed)
+
+        self._rows = np.zeros(capacity, dtype=np.int64)
+        self._columns = np.zeros(capacity, dtype=np.int64)
+        self._rewards = np.zeros(capacity)
+        self._next_rows = np.zeros(capacity, dtype=np.int64)
+        self._dones = np.zeros(capacity, dtype=bool)
+        self._priorities = np.zeros(capacity)
+        self._max_priority = 1.0
+
+        # Next slot to write, transitions stored and replayed updates owed
+        self._position = 0
+        self._size = 0
+        self._credit = 0.0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def batch_size(self):
+        return self._batch_size
+
+    def add(self, row, column, reward, next_row, done):
+        """Add a transition, overwriting the oldest one when full."""
+        position = self._position
+        self._rows[position] = row
+        self._columns[position] = column
+        self._rewards[position] = reward
+        self._next_rows[position] = next_row
+        self._dones[position] = done
+        self._priorities[position] = self._max_priority
+        self._position = (position + 1) % self._capacity
+        self._size = min(self._size + 1, self._capacity)
+
+    def add_many(self, rows, columns, rewards, next_rows, dones):
+        """Add a batch of transitions."""
+        count = len(rows)
+        if count > self._capacity:
+            rows, columns, rewards, next_rows, dones = (
+                array[-self._capacity:] for array in (rows, columns, rewards, next_rows, dones))
+            count = self._capacity
+        slots = (self._position + np.arange(count)) % self._capacity
+        self._rows[slots] = rows
+        self._columns[slots] = columns
+        self._rewards[slots] = rewards
+        self._next_rows[slots] = next_rows
+        self._dones[slots] = dones
+        self._priorities[slots] = self._max_priority
+        self._position = (self._position + count) % self._capacity
+        self._size = min(self._size + count, self._capacity)
+
+    def sample(self, count):
+        """Return the slots of a minibatch of stored transitions."""
+        if not self._prioritized:
+            return self._random.integers(0, self._size, count)
+        priorities = self._priorities[:self._size] ** self._alpha
+        cumulative = priorities.cumsum()
+        slots = np.searchsorted(cumulative, self._random.random(count) * cumulative[-1], side='right')
+        return np.minimum(slots, self._size - 1)
+
+    def replay(self, memory_table, learning, discount, count=None):
+        """Apply the updates of a sampled minibatch to the table, returning the sampled slots."""
+        slots = self.sample(count or self._batch_size)
+        errors = memory_table.update_rows(
+            self._rows[slots], self._columns[slots], self._rewards[slots], self._next_rows[slots],
+            learning, discount, self._dones[slots] if self._terminal else None)
+        if self._prioritized:
+            priorities = np.abs(errors) + 1e-6
+            self._priorities[slots] = priorities
+            self._max_priority = max(self._max_priority, priorities.max())
+        return slots
+
+    def step(self, memory_table, learning, discount, transitions=1):
+        """Account for new online transitions and replay the minibatches owed."""
+        self._credit += self._ratio * transitions
+        if self._size < self._batch_size:
+            return
+        while self._credit >= self._batch_size:
+            self.replay(memory_table, learning, discount)
+            self._credit -= self._batch_size
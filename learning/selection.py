@@ -0,0 +1,34 @@
+"""Module for the selection of actions from their weights."""
+import bisect
+import math
+import random
+import numpy as np
+
+
+def choose(actions, weights, temperature=1.0, greedy=False):
+    """Return an action sampled from the softmax of the weights, or the best one if greedy.
+
+    The highest weight is subtracted before the exponentials, so large
+    weights cannot overflow, and a single random number is drawn.
+    """
+    highest = max(weights)
+    if greedy:
+        return actions[weights.index(highest)]
+
+    total = 0.0
+    cumulative = []
+    for weight in weights:
+        total += math.exp(float(weight - highest) / temperature)
+        cumulative.append(total)
+    return actions[bisect.bisect(cumulative, random.random() * total, 0, len(actions) - 1)]
+
+
+def choose_rows(weights, generator, temperature=1.0, greedy=False):
+    """Return the column chosen in each row of a (states, actions) weight array."""
+    if greedy:
+        return weights.argmax(axis=1)
+
+    weights = np.exp((weights - weights.max(axis=1, keepdims=True)) / temperature)
+    cumulative = weights.cumsum(axis=1)
+    threshold = generator.random(len(weights)) * cumulative[:, -1]
+    return np.minimum((threshold[:, None] >= cumulative).sum(axis=1), weights.shape[1] - 1)
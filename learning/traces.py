@@ -0,0 +1,117 @@
+"""Module for the eligibility trace learners."""
+import numpy as np
+from .agent import Agent
+from .memory import ArrayMemoryTable
+
+LEARNERS = ('q', 'q-lambda', 'sarsa-lambda')
+
+
+class TraceAgent(Agent):
+    """Agent learning with replacing eligibility traces, as Watkins's Q(λ) or SARSA(λ).
+
+    Traces are kept as small arrays of the rows and columns of the recently
+    visited state-action pairs of an array memory table. Every update adds
+    the temporal difference error to all of them in one vectorized pass,
+    decays them by discount * trace_decay and prunes the ones below
+    threshold, so a step costs O(active traces) rather than O(table).
+    Q(λ) cuts the traces after an exploratory action. SARSA(λ) waits for
+    the next action to back up a transition, so the traces are reset, and
+    a pending transition dropped, when the episode ends or the agent is
+    reset.
+    """
+
+    def __init__(self, learning_rate, discount_factor, memory_table, trace_decay=0.5, threshold=0.01,
+                 sarsa=False):
+        if not isinstance(memory_table, ArrayMemoryTable):
+            raise ValueError('Eligibility traces require an array memory table')
+        super().__init__(learning_rate, discount_factor, memory_table)
+        self._decay = float(discount_factor) * trace_decay
+        self._threshold = threshold
+        self._sarsa = sarsa
+
+        # Active traces and the last transition of SARSA waiting for its next action
+        self._rows = np.zeros(16, dtype=np.int64)
+        self._columns = np.zeros(16, dtype=np.int64)
+        self._traces = np.zeros(16)
+        self._count = 0
+        self._pending = None
+
+    @property
+    def active(self):
+        """Return the number of active traces."""
+        return self._count
+
+    def reset(self):
+        self._count = 0
+        self._pending = None
+
+    def _backup(self, row, column, error):
+        """Replace the trace of a pair, add the error to the traced weights and decay the traces."""
+        count = self._count
+        rows, columns, traces = self._rows[:count], self._columns[:count], self._traces[:count]
+        slot = np.flatnonzero((rows == row) & (columns == column))
+        if len(slot):
+            traces[slot[0]] = 1.0
+        else:
+            if count == len(self._traces):
+                self._rows = np.resize(self._rows, count * 2)
+                self._columns = np.resize(self._columns, count * 2)
+                self._traces = np.resize(self._traces, count * 2)
+            self._rows[count], self._columns[count], self._traces[count] = row, column, 1.0
+            count += 1
+            rows, columns, traces = self._rows[:count], self._columns[:count], self._traces[:count]
+
+        self.memories.values[rows, columns] += float(self._learning_rate) * error * traces
+        traces *= self._decay
+        keep = traces >= self._threshold
+        if keep.all():
+            self._count = count
+        else:
+            self._count = int(keep.sum())
+            self._rows[:self._count] = rows[keep]
+            self._columns[:self._count] = columns[keep]
+            self._traces[:self._count] = traces[keep]
+
+    def remember(self, state, action, reward, new_state, done=False):
+        memories = self.memories
+        row = memories.index(state)
+        if row is None:
+            row = memories.initialize_state(state)
+        column = memories.column(action)
+        values = memories.values
+        discount = float(self._discount_factor)
+        reward = float(reward)
+
+        if self._sarsa:
+            if self._pending is not None:
+                pending_row, pending_column, pending_reward = self._pending
+                self._backup(pending_row, pending_column,
+                             pending_reward + discount * values[row, column] - values[pending_row, pending_column])
+            self._pending = (row, column, reward)
+            if done:
+                self._backup(row, column, reward - memories.values[row, column])
+                self.reset()
+            return
+
+        if values[row, column] < values[row].max():
+            # Exploratory action, the return no longer follows the greedy policy
+            self._count = 0
+        if done:
+            next_weight = 0.0
+        else:
+            next_row = memories.index(new_state)
+            next_weight = 1.0 if next_row is None else values[next_row].max()
+        self._backup(row, column, reward + discount * next_weight - values[row, column])
+        if done:
+            self.reset()
+
+
+def create(learner, learning_rate, discount_factor, memory_table, replay=None, trace_decay=0.5, threshold=0.01):
+    """Return an agent using a learner by name."""
+    if learner not in LEARNERS:
+        raise ValueError(f'Unknown learner "{learner}", expected one of {LEARNERS}')
+    if learner == 'q':
+        return Agent(learning_rate, discount_factor, memory_table, replay)
+    if replay is not None:
+        raise ValueError('Experience replay is only supported by the one-step learner')
+    return TraceAgent(learning_rate, discount_factor, memory_table, trace_decay, threshold, learner == 'sarsa-lambda')
@@ -0,0 +1,129 @@
+"""Module for training with a pool of worker processes."""
+import contextlib
+import io
+import multiprocessing
+import signal
+import snake
+
+
+def _worker(connection, arguments):
+    """Serve training requests with a local environment until closed."""
+    # Ctrl-C reaches the whole process group, the master stops the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+        _, _, environment, _ = app._setup_config(arguments, private=True)
+    memories = environment.agent.memories
+    world = None
+
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+
+        command, args = request
+        if command == 'restore':
+            memories.restore(*args)
+            connection.send(True)
+        elif command == 'merge':
+            memories.merge(*args)
+            connection.send(True)
+        elif command == 'execute':
+            name, training, episodes, epsilon, cycle = args
+            if name != world:
+                environment.world.load(name)
+                world = name
+            snapshot = memories.snapshot()
+            results = environment.execute(training, episodes, epsilon, list(cycle) + [environment], False)
+            connection.send((memories.changes(snapshot), results))
+    connection.close()
+
+
+class Trainer:
+    """Split the episodes of a world between worker processes.
+
+    Every worker keeps a local copy of the memory table and plays a round
+    of episodes with it. The changes of a round are averaged into the
+    master table and sent back to the workers, so all tables are equal
+    at the start of each round. Worker copies always use dict adapters,
+    so a Redis or SQLite master table is only written by the master.
+    """
+
+    def __init__(self, arguments, memories, workers, episodes=10):
+        self._memories = memories
+        self._episodes = episodes
+        self._connections = []
+        self._processes = []
+
+        for _ in range(workers):
+            connection, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_worker, args=(child, arguments), daemon=True)
+            process.start()
+            self._connections.append(connection)
+            self._processes.append(process)
+
+        self._request('restore', lambda _: (memories.snapshot(), ))
+
+    @property
+    def workers(self):
+        return len(self._processes)
+
+    def _request(self, command, args, connections=None):
+        """Send a request to the workers and return their answers."""
+        connections = self._connections if connections is None else connections
+        for index, connection in enumerate(connections):
+            connection.send((command, args(index)))
+        return [connection.recv() for connection in connections]
+
+    def execute(self, name, training, episodes, epsilon, cycle):
+        """Play the episodes of a world in the workers, returning their results."""
+        results = snake.Results()
+        while episodes > 0:
+            rounds = []
+            while episodes > 0 and len(rounds) < self.workers:
+                rounds.append(min(self._episodes, episodes))
+                episodes -= rounds[-1]
+
+            connections = self._connections[:len(rounds)]
+            answers = self._request(
+                'execute', lambda index: (name, training, rounds[index], epsilon, cycle), connections)
+            for _, partial in answers:
+                results.extend(partial)
+
+            if training:
+                changes = [changes for changes, _ in answers]
+                average = self._average(changes)
+                self._memories.merge(average)
+                self._request('merge', lambda index: (self._correct(average, changes, index), ))
+        return results
+
+    @staticmethod
+    def _average(changes):
+        """Return the mean of the changes of each key between the workers changing it."""
+        totals = {}
+        counts = {}
+        for worker in changes:
+            for key, delta in worker.items():
+                totals[key] = totals[key] + delta if key in totals else delta
+                counts[key] = counts.get(key, 0) + 1
+        return {key: total / counts[key] for key, total in totals.items()}
+
+    @staticmethod
+    def _correct(average, changes, index):
+        """Return the changes taking a worker table to the master table."""
+        own = changes[index] if index < len(changes) else {}
+        return {key: delta - own[key] if key in own else delta for key, delta in average.items()}
+
+    def close(self, timeout=5):
+        """Stop the workers, terminating the ones still running after timeout seconds."""
+        for connection in self._connections:
+            try:
+                connection.send(None)
+            except (BrokenPipeError, EOFError):
+                pass
+            connection.close()
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join()
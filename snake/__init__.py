@@ -2,3 +2,12 @@ from .environment import Environment, Results
 from .world import World
 from .objects import Snake, Apple
 from .rewards import DefaultReward
+from .batch import BatchEnvironment
+
+
+def __getattr__(name):
+    # The episode kernel imports Numba, so it is only imported once it is used
+    if name == 'KernelEnvironment':
+        from .kernel import KernelEnvironment
+        return KernelEnvironment
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
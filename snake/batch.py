@@ -0,0 +1,328 @@
+"""Batch environment stepping many independent games of a world in lockstep."""
+import numpy as np
+import learning
+from snake.environment import Results
+from snake.objects import Apple, Snake
+from snake.rewards import DefaultReward, DistanceReward
+from snake.world import World
+
+# Directions indexed so that turning 90 degrees adds one to the index
+DIRECTIONS_X = np.array([1, 0, -1, 0])
+DIRECTIONS_Y = np.array([0, 1, 0, -1])
+
+# Observation features and their encoding
+RAY_VALUES = (World.UNKNOW_VALUE, World.WALL_VALUE, Snake.VALUE, Apple.VALUE)
+ANGLES = tuple(range(-180, 181, 45))
+DISTANCES = 4
+RAY_CODES = len(RAY_VALUES) * DISTANCES
+APPLE_CODES = len(ANGLES) * DISTANCES
+CODES = RAY_CODES ** 3 * APPLE_CODES
+
+# Ray value (offset by one) to its position in RAY_VALUES
+VALUE_CODES = np.zeros(max(RAY_VALUES) + 2, dtype=np.int64)
+VALUE_CODES[np.array(RAY_VALUES) + 1] = np.arange(len(RAY_VALUES))
+RAYS = np.arange(3)
+TURNS = np.array([-1, 0, 1])
+
+
+def encode_observation(state):
+    """Return the integer code of an observation."""
+    code = 0
+    for value, distance in state[:3]:
+        code = code * RAY_CODES + RAY_VALUES.index(value) * DISTANCES + distance
+    angle, distance = state[3]
+    return code * APPLE_CODES + ANGLES.index(angle) * DISTANCES + distance
+
+
+def decode_observation(code):
+    """Return the observation of an integer code."""
+    code, apple = divmod(int(code), APPLE_CODES)
+    rays = []
+    for _ in range(3):
+        code, ray = divmod(code, RAY_CODES)
+        rays.insert(0, (RAY_VALUES[ray // DISTANCES], ray % DISTANCES))
+    return tuple(rays) + ((ANGLES[apple // DISTANCES], apple % DISTANCES), )
+
+
+class BatchEnvironment(learning.environment.Environment):
+    """Run many games of the same world at once using NumPy arrays.
+
+    Every game keeps its own occupancy grid, snake body (a ring buffer of
+    cell indexes), apple and counters, and all of them are stepped by a
+    single call with batched ray casts, observations and memory updates.
+    Updates of a step are applied together, so when several games update
+    the same state and action in a step only the last one is kept.
+    """
+
+    def __init__(self, agent, world, games=256, reward=None, seed=None):
+        super().__init__(agent, reward)
+        if not isinstance(agent.memories, learning.memory.ArrayMemoryTable):
+            raise ValueError('The batch environment requires an array memory table')
+        if isinstance(agent, learning.traces.TraceAgent):
+            raise ValueError('The batch environment does not support eligibility traces')
+
+        self._world = world
+        self._games = games
+        self._random = np.random.default_rng(seed)
+        self._max_starving = 100
+
+        if self._reward_model is None:
+            self._reward_model = DefaultReward()
+
+        # Observation code to table row, -1 when unchecked and -2 when unknown
+        self._rows = np.full(CODES, -1)
+
+    @property
+    def world(self) -> World:
+        return self._world
+
+    @property
+    def games(self):
+        return self._games
+
+    def initialize(self):
+        """Build the arrays of every game from the loaded world."""
+        world = self.world
+        size = world.size
+        snake = world.snake
+
+        # The last cell of a grid is outside the world and every ray ends there
+        self._size = size
+        self._outside = size * size
+        self._cells = np.array(world._cells + [World.UNKNOW_VALUE], dtype=np.int8)
+        self._objective = world.empty_cells - 1 - snake._start_length
+        self._start_cell = snake._start_position.x * size + snake._start_position.y
+        self._start_direction = [(int(x), int(y)) for x, y in zip(DIRECTIONS_X, DIRECTIONS_Y)].index(
+            (snake._start_direction.x, snake._start_direction.y))
+        self._distance_reward = isinstance(self._reward_model, DistanceReward)
+        if not isinstance(self._reward_model, DefaultReward):
+            raise ValueError('The batch environment only supports the default and distance reward models')
+
+        games = self._games
+        capacity = size * size + 1
+        self._grid = np.tile(self._cells, (games, 1))
+        self._bodies = np.zeros((games, capacity), dtype=np.int64)
+        self._heads = np.zeros(games, dtype=np.int64)
+        self._lengths = np.zeros(games, dtype=np.int64)
+        self._grow = np.zeros(games, dtype=np.int64)
+        self._directions = np.zeros(games, dtype=np.int64)
+        self._apples = np.zeros(games, dtype=np.int64)
+        self._starving = np.zeros(games, dtype=np.int64)
+        self._scores = np.zeros(games, dtype=np.int64)
+        self._steps = np.zeros(games, dtype=np.int64)
+
+        self._ray_cells, self._ray_distances, self._apple_codes = world.derived('batch', self._build_tables)
+        self._rows.fill(-1)
+
+    def _build_tables(self):
+        """Return the cells crossed by the rays, their distance features and the apple features."""
+        size = self._size
+        cells = np.arange(size * size)
+        x, y = cells // size, cells % size
+
+        # Cells crossed by a ray from every cell in every direction
+        reach = np.arange(1, size + 1)
+        ray_x = x[:, None, None] + DIRECTIONS_X[None, :, None] * reach
+        ray_y = y[:, None, None] + DIRECTIONS_Y[None, :, None] * reach
+        inside = (ray_x >= 0) & (ray_x < size) & (ray_y >= 0) & (ray_y < size)
+        ray_cells = np.where(inside, ray_x * size + ray_y, self._outside)
+
+        # Apple angle and distance features for every direction, head and apple cell
+        delta_x = x[None, None, :] - x[None, :, None]
+        delta_y = y[None, None, :] - y[None, :, None]
+        delta = np.arctan2(delta_y, delta_x) - np.arctan2(DIRECTIONS_Y, DIRECTIONS_X)[:, None, None]
+        delta = np.where(delta > np.pi, delta - 2 * np.pi, np.where(delta < -np.pi, delta + 2 * np.pi, delta))
+        angles = np.round(np.degrees(delta) / 45).astype(np.int64) + 4
+        distances = np.minimum(np.floor(np.round(np.hypot(delta_x, delta_y)) / 2), 3).astype(np.int64)
+        return ray_cells, np.minimum(reach // 2, 3), angles * DISTANCES + distances
+
+    def reset(self, games=None):
+        """Reset the given games, or every game, to the initial state."""
+        if games is None:
+            games = np.arange(self._games)
+        if len(games) == 0:
+            return
+
+        self._grid[games] = self._cells
+        self._grid[games, self._start_cell] = Snake.VALUE
+        self._heads[games] = 0
+        self._bodies[games, 0] = self._start_cell
+        self._lengths[games] = 1
+        self._grow[games] = self.world.snake._start_length - 1
+        self._directions[games] = self._start_direction
+        self._starving[games] = 0
+        self._scores[games] = 0
+        self._steps[games] = 0
+        self._place_apples(games)
+
+    def _place_apples(self, games):
+        """Place the apple of the given games in a random empty cell."""
+        priorities = self._random.random((len(games), self._outside))
+        priorities[self._grid[games, :-1] != World.EMPTY_VALUE] = -1
+        cells = priorities.argmax(axis=1)
+        self._apples[games] = cells
+        self._grid[games, cells] = np.where(
+            self._grid[games, cells] == World.EMPTY_VALUE, Apple.VALUE, self._grid[games, cells])
+
+    def _positions(self, games):
+        cells = self._bodies[games, self._heads[games]]
+        return cells // self._size, cells % self._size
+
+    def observe(self, games):
+        """Return the observation codes of the given games."""
+        heads = self._bodies[games, self._heads[games]]
+        directions = self._directions[games]
+
+        # Left, front and right rays, in the same order as Environment.observe
+        rays = (directions[:, None] + TURNS) % 4
+        values = self._grid[games[:, None, None], self._ray_cells[heads[:, None], rays]]
+        hits = (values != World.EMPTY_VALUE).argmax(axis=2)
+        hit_values = values[np.arange(len(games))[:, None], RAYS, hits]
+        ray_codes = VALUE_CODES[hit_values + 1] * DISTANCES + self._ray_distances[hits]
+
+        codes = (ray_codes[:, 0] * RAY_CODES + ray_codes[:, 1]) * RAY_CODES + ray_codes[:, 2]
+        return codes * APPLE_CODES + self._apple_codes[directions, heads, self._apples[games]]
+
+    def _lookup(self, codes):
+        """Return the table rows of observation codes, negative when unknown."""
+        rows = self._rows[codes]
+        unchecked = codes[rows == -1]
+        if len(unchecked):
+            for code in np.unique(unchecked):
+                index = self.agent.memories.index(decode_observation(code))
+                self._rows[code] = -2 if index is None else index
+            rows = self._rows[codes]
+        return rows
+
+    def _intern(self, codes, rows):
+        """Return the table rows of observation codes, adding the unknown ones."""
+        unknown = rows < 0
+        if unknown.any():
+            for code in np.unique(codes[unknown]):
+                self._rows[code] = self.agent.memories.initialize_state(decode_observation(code))
+            rows = self._rows[codes]
+        return rows
+
+    def act(self, codes, epsilon):
+        """Return the action columns chosen for observation codes."""
+        memories = self.agent.memories
+        count = len(codes)
+        rows = self._lookup(codes)
+        columns = self._random.integers(0, len(memories._actions), count)
+
+        choose = (rows >= 0) & (self._random.random(count) >= epsilon)
+        if choose.any():
+            columns[choose] = learning.selection.choose_rows(
+                memories.values[rows[choose]], self._random, memories.temperature, memories.greedy)
+        return columns
+
+    def _move(self, games, turns):
+        """Move the snakes of the given games, returning which ones collided."""
+        size = self._size
+        capacity = self._bodies.shape[1]
+        grid = self._grid
+
+        self._directions[games] = (self._directions[games] + turns) % 4
+        directions = self._directions[games]
+        x, y = self._positions(games)
+        cells = (x + DIRECTIONS_X[directions]) * size + y + DIRECTIONS_Y[directions]
+
+        growing = self._grow[games] > 0
+        shrinking = games[~growing]
+        tails = self._bodies[shrinking, (self._heads[shrinking] + self._lengths[shrinking] - 1) % capacity]
+        grid[shrinking, tails] = np.where(
+            grid[shrinking, tails] == Snake.VALUE, self._cells[tails], grid[shrinking, tails])
+        self._grow[games] -= growing
+        self._lengths[games] += growing
+
+        collided = (self._cells[cells] == World.WALL_VALUE) | (grid[games, cells] == Snake.VALUE)
+        grid[games, cells] = Snake.VALUE
+        self._heads[games] = (self._heads[games] - 1) % capacity
+        self._bodies[games, self._heads[games]] = cells
+        return collided, cells
+
+    def _rewards(self, games, over, ate, starving):
+        """Return the rewards of the given games using the reward model."""
+        won = self._scores[games] >= self._objective
+        rewards = np.where(over, np.where(won & ~starving, 10.0, -10.0), np.where(ate, 5.0, 0.0))
+        if self._distance_reward:
+            x, y = self._positions(games)
+            apples = self._apples[games]
+            distances = np.hypot(apples // self._size - x, apples % self._size - y) / self._size
+            rewards = np.where(rewards == 0, -distances, rewards)
+        return rewards
+
+    def _update(self, codes, columns, rewards, next_codes, over):
+        """Apply the Q-learning update to a batch of transitions, keeping them for replay if enabled."""
+        agent = self.agent
+        memories = agent.memories
+        rows = self._intern(codes, self._lookup(codes))
+        next_rows = self._lookup(next_codes)
+        replay = agent.replay
+        if replay is not None:
+            # New states weigh 1 like unknown ones, so adding them does not change the update
+            next_rows = self._intern(next_codes, next_rows)
+
+        memories.update_rows(rows, columns, rewards, next_rows, agent.learning_rate, agent.discount_factor)
+        if replay is not None:
+            replay.add_many(rows, columns, rewards, next_rows, over)
+            replay.step(memories, agent.learning_rate, agent.discount_factor, len(rows))
+
+    def _get_epsilon_value(self, epsilon, args):
+        if callable(epsilon):
+            return epsilon(*args)
+        return float(epsilon)
+
+    def execute(self, training, episodes=100, epsilon=0, epsilon_args=(), output=False):
+        """Play a number of episodes spread over the games, returning their results."""
+        self.initialize()
+        self.reset()
+        results = Results(episodes)
+        epsilon = self._get_epsilon_value(epsilon, epsilon_args)
+        actions = np.array(self.agent.memories._actions)
+
+        started = min(self._games, episodes)
+        games = np.arange(started)
+        codes = self.observe(games)
+        while len(games):
+            columns = self.act(codes, epsilon)
+            self._steps[games] += 1
+
+            collided, cells = self._move(games, actions[columns])
+            starving = self._starving[games] >= self._max_starving
+            over = collided | starving
+            ate = cells == self._apples[games]
+
+            self._starving[games] = np.where(ate, 0, self._starving[games] + 1)
+            self._grow[games] += ate
+            self._scores[games] += ate
+            won = ate & (self._scores[games] >= self._objective)
+            over |= won
+            if ate.any():
+                self._place_apples(games[ate])
+
+            next_codes = self.observe(games)
+            if training:
+                rewards = self._rewards(games, over, ate, self._starving[games] >= self._max_starving)
+                self._update(codes, columns, rewards, next_codes, over)
+
+            if over.any():
+                finished = np.flatnonzero(over)
+                outcomes = np.where(won, Results.WIN, 0) | np.where(collided | starving, Results.LOSE, 0) | \
+                    np.where(starving, Results.STARVE, 0)
+                results.record_many(
+                    self._steps[games[finished]], self._scores[games[finished]], outcomes[finished], epsilon)
+
+                # Finished games start a new episode while there are episodes left
+                restart = finished[:max(episodes - started, 0)]
+                if len(restart):
+                    started += len(restart)
+                    self.reset(games[restart])
+                    next_codes[restart] = self.observe(games[restart])
+
+                keep = ~over
+                keep[restart] = True
+                games = games[keep]
+                next_codes = next_codes[keep]
+            codes = next_codes
+        return results
@@ -1,29 +1,96 @@
-import copy
 import math
-import statistics
-import pygame
+import time
+import numpy as np
 import learning
-from snake.objects import Apple, Snake
 from snake.math import Vector
 from snake.world import World
 from snake.rewards import DefaultReward
 
 
 class Results(learning.environment.Results):
-    def __init__(self):
+    """Per-episode steps, scores, outcomes and epsilons kept in numeric arrays.
+
+    The arrays are allocated for the expected number of episodes and only
+    grow, by doubling, if more episodes are recorded.
+    """
+
+    # Outcome flags, a starved episode is also lost
+    WIN = 1
+    LOSE = 2
+    STARVE = 4
+
+    def __init__(self, capacity=0):
         super().__init__()
         self.episodes = 0
-        self.steps = []
-        self.wins = 0
-        self.loses = 0
-        self.scores = []
-        self.starves = 0
+        self._steps = np.zeros(capacity, dtype=np.int64)
+        self._scores = np.zeros(capacity, dtype=np.int64)
+        self._outcomes = np.zeros(capacity, dtype=np.int8)
+        self._epsilons = np.zeros(capacity)
+
+    @property
+    def steps(self):
+        return self._steps[:self.episodes]
+
+    @property
+    def scores(self):
+        return self._scores[:self.episodes]
+
+    @property
+    def outcomes(self):
+        return self._outcomes[:self.episodes]
+
+    @property
+    def epsilons(self):
+        return self._epsilons[:self.episodes]
+
+    @property
+    def wins(self):
+        return int(np.count_nonzero(self.outcomes & self.WIN))
+
+    @property
+    def loses(self):
+        return int(np.count_nonzero(self.outcomes & self.LOSE))
+
+    @property
+    def starves(self):
+        return int(np.count_nonzero(self.outcomes & self.STARVE))
+
+    def _reserve(self, count):
+        """Grow the arrays to hold count more episodes."""
+        needed = self.episodes + count
+        if needed > len(self._steps):
+            capacity = max(needed, len(self._steps) * 2)
+            for name in ('_steps', '_scores', '_outcomes', '_epsilons'):
+                array = getattr(self, name)
+                grown = np.zeros(capacity, dtype=array.dtype)
+                grown[:self.episodes] = array[:self.episodes]
+                setattr(self, name, grown)
+
+    def record(self, steps, score, outcome, epsilon):
+        """Add an episode."""
+        self.record_many([steps], [score], [outcome], [epsilon])
+
+    def record_many(self, steps, scores, outcomes, epsilons):
+        """Add several episodes from sequences of the same length."""
+        count = len(steps)
+        self._reserve(count)
+        end = self.episodes + count
+        self._steps[self.episodes:end] = steps
+        self._scores[self.episodes:end] = scores
+        self._outcomes[self.episodes:end] = outcomes
+        self._epsilons[self.episodes:end] = epsilons
+        self.episodes = end
+
+    def extend(self, other):
+        """Add the episodes of other results to these results."""
+        self.record_many(other.steps, other.scores, other.outcomes, other.epsilons)
+        self.abort = self.abort or other.abort
 
     def __repr__(self):
         data = [
             f'\t=> Episodes: {self.episodes}',
-            f'\t=> Steps Average: {statistics.mean(self.steps):0.2f}',
-            f'\t=> Score Average: {statistics.mean(self.scores):0.2f}',
+            f'\t=> Steps Average: {self.steps.mean():0.2f}',
+            f'\t=> Score Average: {self.scores.mean():0.2f}',
             f'\t=> Wins: {self.wins}',
             f'\t=> Loses: {self.loses}'
         ]
@@ -42,11 +109,18 @@ class Environment(learning.environment.Environment):
         self._max_starving = 100
 
         self._is_over = False
+        self._outcome = 0
 
-        self._display = None
+        self._renderer = None
 
         self._speed = speed
-        self._clock = pygame.time.Clock()
+
+        # Optional learning.profiler.Profiler timing the phases of each step
+        self.profiler = None
+
+        # Apple features by heading and delta, built for the world size
+        self._bearings = None
+        self._bearings_span = 0
 
         if self._reward_model is None:
             self._reward_model = DefaultReward()
@@ -60,14 +134,13 @@ class Environment(learning.environment.Environment):
 
     def update(self, results, output):
         if output:
-            pygame.event.clear()
-            self._clock.tick(self._speed)
+            self._renderer.tick()
 
         self._is_over = self.world.snake.is_colliding() or self.is_starving()
         if self._is_over:
-            results.loses += 1
+            self._outcome |= Results.LOSE
             if self.is_starving():
-                results.starves += 1
+                self._outcome |= Results.STARVE
 
         if self.world.snake.position == self.world.apple.position:
             self._starving = 0
@@ -75,23 +148,23 @@ class Environment(learning.environment.Environment):
             self.score += 1
             if self.score >= self.objective:
                 self._is_over = True
-                results.wins += 1
+                self._outcome |= Results.WIN
             self.world.apple.random()
         else:
             self._starving += 1
 
     def draw(self):
-        self.world.draw()
-        self._display.blit(self.world.surface, (0, 0))
-        pygame.display.flip()
+        self._renderer.draw()
 
     def initialize(self, output):
         if output:
-            size = self.world.to_px(self.world.size)
-            self._display = pygame.display.set_mode((size, size))
+            if self._renderer is None:
+                # Pygame is only imported when the visualization is enabled
+                from snake.render import Renderer
+                self._renderer = Renderer(self.world, self._speed)
+            self._renderer.open()
 
-        self.objective = sum(row.count(self.world.EMPTY_VALUE)
-                             for row in self.world._structure) - 1 - self.world.snake._start_length
+        self.objective = self.world.empty_cells - 1 - self.world.snake._start_length
 
     def _get_epsilon_value(self, epsilon, args):
         if callable(epsilon):
@@ -100,14 +173,15 @@ class Environment(learning.environment.Environment):
 
     def execute(self, training, episodes=100, epsilon=0, epsilon_args=(), output=True):
         self.initialize(output)
-        results = Results()
+        results = Results(episodes)
+        step = self._profiled_step if self.profiler else self._step
         for episode in range(episodes):
             if results.abort:
                 break
 
             self.reset()
-            results.episodes = episode
             steps = 0
+            value = self._get_epsilon_value(epsilon, epsilon_args)
                       
             while not self.is_over():
                 steps += 1
@@ -115,49 +189,93 @@ class Environment(learning.environment.Environment):
                     self.draw()
 
                 if output:
-                    if pygame.key.get_pressed()[pygame.K_ESCAPE]:
+                    if self._renderer.aborted():
                         results.abort = True
                         break
                         
-                state = self.observe()
-                action = self.agent.act(state, self._get_epsilon_value(epsilon, epsilon_args))
-
-                self.world.snake.direction.rotate(
-                    math.radians(90 * action))
-                self.world.snake.move()
-                self.update(results, output)
-                new_state = self.observe()
-
-                if training:
-                    reward = self.reward(state, action, new_state)
-                    self.agent.remember(state, action, reward, new_state)
-            results.scores.append(self.score)
-            results.steps.append(steps)
+                step(results, training, epsilon, epsilon_args, output)
+            results.record(steps, self.score, self._outcome, value)
         return results
 
+    def _step(self, results, training, epsilon, epsilon_args, output):
+        """Observe, act, move and learn from a single step."""
+        state = self.observe()
+        action = self.agent.act(state, self._get_epsilon_value(epsilon, epsilon_args))
+
+        self.world.snake.turn(action)
+        self.world.snake.move()
+        self.update(results, output)
+        new_state = self.observe()
+
+        if training:
+            reward = self.reward(state, action, new_state)
+            self.agent.remember(state, action, reward, new_state, self.is_over())
+
+    def _profiled_step(self, results, training, epsilon, epsilon_args, output):
+        """Run a step adding the time of each phase to the profiler."""
+        profiler = self.profiler
+        clock = time.perf_counter
+        start = clock()
+        state = self.observe()
+        observed = clock()
+        action = self.agent.act(state, self._get_epsilon_value(epsilon, epsilon_args))
+        acted = clock()
+
+        self.world.snake.turn(action)
+        self.world.snake.move()
+        self.update(results, output)
+        moved = clock()
+        new_state = self.observe()
+        end = clock()
+        profiler.add('observe', observed - start + end - moved)
+        profiler.add('act', acted - observed)
+        profiler.add('simulate', moved - acted)
+
+        if training:
+            reward = self.reward(state, action, new_state)
+            rewarded = clock()
+            self.agent.remember(state, action, reward, new_state, self.is_over())
+            profiler.add('reward', rewarded - end)
+            profiler.add('remember', clock() - rewarded)
+
+    @staticmethod
+    def _distance(value):
+        return min(math.floor(round(value) / 2), 3)
+
+    def _bearing(self, heading, x, y):
+        """Return the apple angle and distance features of a delta from the snake heading."""
+        direction, delta = Vector(World.DIRECTIONS[heading]), Vector(x, y)
+        angle = math.degrees(Vector.difference(direction.angle, delta.angle))
+        return (round(angle / 45) * 45, self._distance(delta.distance(Vector(0, 0))))
+
+    def _build_bearings(self, size):
+        """Precompute the apple features of every heading and delta inside a world size."""
+        span = 2 * size - 1
+        self._bearings = [
+            [self._bearing(heading, x, y) for x in range(1 - size, size) for y in range(1 - size, size)]
+            for heading in range(4)
+        ]
+        self._bearings_span = span
+
     def observe(self):
-        def distance(x): return min(math.floor(round(x) / 2), 3)
+        snake = self.world.snake
+        position, heading = snake.position, snake.heading
 
+        # Left, front and right of the snake
         state = []
-        direction = self.world.snake.direction.inverted()
-        snake = self.world.snake.position
-        for _ in range(3):
-            direction.rotate(math.radians(90))
-            value, position = self.world.raycast(
-                snake, direction, (Apple.VALUE, Snake.VALUE, self.world.WALL_VALUE))
-
-            state.append(
-                (value, distance(snake.distance(position))))
-
-        delta_vector = self.world.snake.position.inverted() + \
-            self.world.apple.position
-        delta = math.degrees(Vector.difference(
-            self.world.snake.direction.angle, delta_vector.angle))
-
-        state.append((
-            round(delta / 45) * 45,
-            distance(snake.distance(self.world.apple.position))
-        ))
+        for turn in (3, 0, 1):
+            value, length = self.world.look(position, (heading + turn) % 4)
+            state.append((value, self._distance(length)))
+
+        size = self.world.size
+        if self._bearings_span != 2 * size - 1:
+            self._build_bearings(size)
+        x = self.world.apple.position.x - position.x
+        y = self.world.apple.position.y - position.y
+        if -size < x < size and -size < y < size:
+            state.append(self._bearings[heading][(x + size - 1) * self._bearings_span + y + size - 1])
+        else:
+            state.append(self._bearing(heading, x, y))
         return tuple(state)
 
     def is_over(self):
@@ -167,6 +285,8 @@ class Environment(learning.environment.Environment):
         if callable(self._reward_model):
             self._reward_model.reset()
         self.world.reset()
+        self.agent.reset()
         self._is_over = False
+        self._outcome = 0
         self.score = 0
         self._starving = 0
@@ -0,0 +1,447 @@
+"""Episode kernel running whole headless episodes on arrays, compiled with Numba when it is installed.
+
+The kernel follows the Python step loop exactly, down to the random
+numbers: compiled, it runs the Mersenne Twister of the random module on
+a copy of its state and writes the state back, and without Numba the
+same functions run as plain Python over lists calling the random module.
+"""
+import collections
+import math
+import random
+import numpy as np
+import learning
+from snake.batch import APPLE_CODES, CODES, DISTANCES, RAY_CODES, RAY_VALUES, ANGLES, decode_observation, \
+    encode_observation
+from snake.environment import Environment, Results
+from snake.math import DIRECTIONS, Vector
+from snake.objects import Apple, Snake
+from snake.rewards import DefaultReward, DistanceReward
+from snake.world import World
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+COMPILED = numba is not None
+
+DIRECTIONS_X = tuple(x for x, _ in DIRECTIONS)
+DIRECTIONS_Y = tuple(y for _, y in DIRECTIONS)
+
+# Ray value (offset by one) to its position in RAY_VALUES
+VALUE_CODES = tuple(RAY_VALUES.index(value - 1) if value - 1 in RAY_VALUES else 0
+                    for value in range(max(RAY_VALUES) + 2))
+
+EMPTY_VALUE = World.EMPTY_VALUE
+WALL_VALUE = World.WALL_VALUE
+UNKNOW_VALUE = World.UNKNOW_VALUE
+SNAKE_VALUE = Snake.VALUE
+APPLE_VALUE = Apple.VALUE
+
+WIN, LOSE, STARVE = Results.WIN, Results.LOSE, Results.STARVE
+
+# Slots of the game state array
+HEAD, LENGTH, HEADING, GROW, X, Y, APPLE, FREE, SCORE, STARVING, LAST_SCORE, STATES, NEW, OUTCOME, OVER, \
+    COLLIDING = range(16)
+
+
+def jit(function):
+    """Return a function compiled by Numba, or the function itself when Numba is not installed."""
+    if numba is None:
+        return function
+    return numba.njit(cache=True)(function)
+
+
+@jit
+def _generate(generator):
+    """Return the next 32 random bits of a Mersenne Twister state of 624 words followed by the position."""
+    position = generator[624]
+    if position >= 624:
+        for index in range(624):
+            y = (generator[index] & 0x80000000) | (generator[(index + 1) % 624] & 0x7fffffff)
+            generator[index] = generator[(index + 397) % 624] ^ (y >> 1) ^ (0x9908b0df if y & 1 else 0)
+        position = 0
+    y = generator[position]
+    generator[624] = position + 1
+    y ^= y >> 11
+    y ^= (y << 7) & 0x9d2c5680
+    y ^= (y << 15) & 0xefc60000
+    y ^= y >> 18
+    return y
+
+
+@jit
+def _twister_random(generator):
+    """Return a float in [0, 1) like random.random."""
+    high = _generate(generator) >> 5
+    low = _generate(generator) >> 6
+    return (high * 67108864.0 + low) * (1.0 / 9007199254740992.0)
+
+
+@jit
+def _twister_randbelow(generator, n):
+    """Return an integer in [0, n) like random.randrange."""
+    bits = 0
+    while n >> bits:
+        bits += 1
+    value = _generate(generator) >> (32 - bits)
+    while value >= n:
+        value = _generate(generator) >> (32 - bits)
+    return value
+
+
+if COMPILED:
+    _random = _twister_random
+    _randbelow = _twister_randbelow
+else:
+    def _random(generator):
+        return random.random()
+
+    def _randbelow(generator, n):
+        return random.randrange(n)
+
+
+@jit
+def _occupy(grid, free, slots, state, index, value):
+    """Mark a cell with an entity value like World.occupy_cell."""
+    if grid[index] == EMPTY_VALUE:
+        count = state[FREE] - 1
+        slot, last = slots[index], free[count]
+        state[FREE] = count
+        if last != index:
+            free[slot] = last
+            slots[last] = slot
+        slots[index] = -1
+    grid[index] = value
+
+
+@jit
+def _vacate(cells, grid, free, slots, state, index, value):
+    """Restore the structure value of a cell marked with an entity value like World.vacate_cell."""
+    if grid[index] == value:
+        grid[index] = cells[index]
+        if grid[index] == EMPTY_VALUE:
+            slots[index] = state[FREE]
+            free[state[FREE]] = index
+            state[FREE] += 1
+
+
+@jit
+def _place_apple(cells, grid, free, slots, state, generator):
+    """Move the apple to a random empty cell like Apple.random."""
+    if state[FREE] == 0:
+        return
+    index = free[_randbelow(generator, state[FREE])]
+    _vacate(cells, grid, free, slots, state, state[APPLE], APPLE_VALUE)
+    state[APPLE] = index
+    _occupy(grid, free, slots, state, index, APPLE_VALUE)
+
+
+@jit
+def _look(cells, grid, size, x, y, heading):
+    """Return the feature code of the first non empty value seen from a position like World.look."""
+    dx, dy = DIRECTIONS_X[heading], DIRECTIONS_Y[heading]
+    inside = 0 <= x < size and 0 <= y < size
+    distance = 0
+    value = UNKNOW_VALUE
+    while True:
+        x += dx
+        y += dy
+        distance += 1
+        if not (0 <= x < size and 0 <= y < size):
+            value = UNKNOW_VALUE
+            break
+        index = x * size + y
+        if inside and cells[index] != EMPTY_VALUE:
+            # Rays from inside stop at the structure, whatever is over it
+            value = cells[index]
+            break
+        if grid[index] != EMPTY_VALUE:
+            value = grid[index]
+            break
+    return VALUE_CODES[value + 1] * DISTANCES + min(distance // 2, 3)
+
+
+@jit
+def _observe(cells, grid, bearings, size, state):
+    """Return the observation code of the game like Environment.observe."""
+    x, y, heading = state[X], state[Y], state[HEADING]
+    code = 0
+    for turn in (3, 0, 1):
+        code = code * RAY_CODES + _look(cells, grid, size, x, y, (heading + turn) % 4)
+    span = 2 * size + 1
+    apple = state[APPLE]
+    delta = (apple // size - x + size) * span + apple % size - y + size
+    return code * APPLE_CODES + bearings[heading * span * span + delta]
+
+
+@jit
+def _choose(values, row, count, temperature, greedy, generator):
+    """Return the column sampled from the softmax of a row like learning.selection.choose."""
+    start = row * count
+    best = start
+    for index in range(start + 1, start + count):
+        if values[index] > values[best]:
+            best = index
+    if greedy:
+        return best - start
+
+    highest = values[best]
+    total = 0.0
+    for index in range(start, start + count):
+        total += math.exp((values[index] - highest) / temperature)
+    threshold = _random(generator) * total
+    cumulative = 0.0
+    for column in range(count - 1):
+        cumulative += math.exp((values[start + column] - highest) / temperature)
+        if threshold < cumulative:
+            return column
+    return count - 1
+
+
+@jit
+def _learn(values, rows, new_codes, state, count, code, column, reward, next_code, learning, discount):
+    """Apply the Q-learning update like ArrayMemoryTable.update, adding the state if it is new."""
+    row = rows[code]
+    if row < 0:
+        row = state[STATES]
+        state[STATES] += 1
+        for index in range(row * count, row * count + count):
+            values[index] = 1.0
+        rows[code] = row
+        new_codes[state[NEW]] = code
+        state[NEW] += 1
+
+    next_weight = 1.0
+    next_row = rows[next_code]
+    if next_row >= 0:
+        next_weight = values[next_row * count]
+        for index in range(next_row * count + 1, next_row * count + count):
+            if values[index] > next_weight:
+                next_weight = values[index]
+
+    index = row * count + column
+    values[index] = (1 - learning) * values[index] + learning * (reward + discount * next_weight)
+
+
+@jit
+def _run(episodes, training, epsilon, temperature, greedy, learning, discount, distance_reward,
+         size, objective, max_starving, start_cell, start_heading, start_grow, actions,
+         cells, grid, free, slots, body, bearings, values, rows, new_codes, state,
+         steps, scores, outcomes, generator):
+    """Play a number of episodes, learning from them if training, like Environment.execute."""
+    capacity = len(body)
+    count = len(actions)
+    for episode in range(episodes):
+        # Environment.reset
+        state[LAST_SCORE] = 0
+        for offset in range(state[LENGTH]):
+            _vacate(cells, grid, free, slots, state, body[(state[HEAD] + offset) % capacity], SNAKE_VALUE)
+        state[HEAD] = 0
+        state[LENGTH] = 1
+        body[0] = start_cell
+        state[X] = start_cell // size
+        state[Y] = start_cell % size
+        state[HEADING] = start_heading
+        state[GROW] = start_grow
+        state[COLLIDING] = 0
+        _occupy(grid, free, slots, state, start_cell, SNAKE_VALUE)
+        _place_apple(cells, grid, free, slots, state, generator)
+        state[OVER] = 0
+        state[OUTCOME] = 0
+        state[SCORE] = 0
+        state[STARVING] = 0
+
+        played = 0
+        while not state[OVER]:
+            played += 1
+            code = _observe(cells, grid, bearings, size, state)
+
+            # Agent.act
+            if _random(generator) < epsilon or rows[code] < 0:
+                column = _randbelow(generator, count)
+            else:
+                column = _choose(values, rows[code], count, temperature, greedy, generator)
+
+            # Snake.turn and Snake.move
+            heading = (state[HEADING] + actions[column]) % 4
+            x = state[X] + DIRECTIONS_X[heading]
+            y = state[Y] + DIRECTIONS_Y[heading]
+            state[HEADING] = heading
+            state[X] = x
+            state[Y] = y
+            if state[GROW]:
+                state[GROW] -= 1
+            else:
+                state[LENGTH] -= 1
+                _vacate(cells, grid, free, slots, state, body[(state[HEAD] + state[LENGTH]) % capacity],
+                        SNAKE_VALUE)
+            index = -1
+            state[COLLIDING] = 1
+            if 0 <= x < size and 0 <= y < size:
+                index = x * size + y
+                state[COLLIDING] = 1 if grid[index] == SNAKE_VALUE or grid[index] == WALL_VALUE else 0
+                state[HEAD] = (state[HEAD] - 1) % capacity
+                state[LENGTH] += 1
+                body[state[HEAD]] = index
+                _occupy(grid, free, slots, state, index, SNAKE_VALUE)
+
+            # Environment.update
+            starving = state[STARVING] >= max_starving
+            state[OVER] = 1 if state[COLLIDING] != 0 or starving else 0
+            if state[OVER]:
+                state[OUTCOME] |= LOSE
+                if starving:
+                    state[OUTCOME] |= STARVE
+            if index == state[APPLE]:
+                state[STARVING] = 0
+                state[GROW] += 1
+                state[SCORE] += 1
+                if state[SCORE] >= objective:
+                    state[OVER] = 1
+                    state[OUTCOME] |= WIN
+                _place_apple(cells, grid, free, slots, state, generator)
+            else:
+                state[STARVING] += 1
+
+            next_code = _observe(cells, grid, bearings, size, state)
+            if training:
+                # DefaultReward and DistanceReward
+                if state[OVER]:
+                    reward = -10.0 if state[STARVING] >= max_starving or state[SCORE] < objective else 10.0
+                elif state[SCORE] > state[LAST_SCORE]:
+                    state[LAST_SCORE] = state[SCORE]
+                    reward = 5.0
+                else:
+                    reward = 0.0
+                if distance_reward and reward == 0:
+                    delta_x = x - state[APPLE] // size
+                    delta_y = y - state[APPLE] % size
+                    reward = math.sqrt(delta_x ** 2 + delta_y ** 2) / size * -1
+                _learn(values, rows, new_codes, state, count, code, column, reward, next_code, learning, discount)
+
+        steps[episode] = played
+        scores[episode] = state[SCORE]
+        outcomes[episode] = state[OUTCOME]
+
+
+class KernelEnvironment(Environment):
+    """Environment playing headless episodes in the episode kernel.
+
+    Episodes run in the kernel when nothing needs the Python step loop:
+    a one-step agent without replay on an array memory table, the default
+    or distance reward models, no visualization and no profiler. Otherwise
+    they run in the Python step loop. The world, environment and table are
+    left as the Python step loop would leave them.
+    """
+
+    def __init__(self, agent, world, speed=60, reward=None):
+        super().__init__(agent, world, speed, reward)
+
+        # Observation code to table row, and how many table states were encoded into it
+        self._rows = np.full(CODES, -1, dtype=np.int64)
+        self._encoded = 0
+        self._encoded_states = None
+
+    def supported(self):
+        """Return if the episodes can run in the kernel."""
+        agent = self.agent
+        return (type(agent) is learning.Agent and agent.replay is None and self.profiler is None and
+                isinstance(agent.memories, learning.memory.ArrayMemoryTable) and
+                type(self._reward_model) in (DefaultReward, DistanceReward))
+
+    def _build_bearings_codes(self):
+        """Return the apple feature codes of every heading and delta from a head inside or next to the world."""
+        size = self.world.size
+        codes = []
+        for heading in range(4):
+            for x in range(-size, size + 1):
+                for y in range(-size, size + 1):
+                    angle, distance = self._bearing(heading, x, y)
+                    codes.append(ANGLES.index(angle) * DISTANCES + distance)
+        return np.array(codes, dtype=np.int64)
+
+    def _encode_states(self):
+        """Map the observation codes of the table states added since the last call to their rows."""
+        states = self.agent.memories.states
+        if states is not self._encoded_states or len(states) < self._encoded:
+            self._rows.fill(-1)
+            self._encoded = 0
+            self._encoded_states = states
+        for index in range(self._encoded, len(states)):
+            self._rows[encode_observation(states.state(index))] = index
+        self._encoded = len(states)
+
+    def execute(self, training, episodes=100, epsilon=0, epsilon_args=(), output=True):
+        if output or not self.supported():
+            return super().execute(training, episodes, epsilon, epsilon_args, output)
+
+        self.initialize(output)
+        world, snake, apple = self.world, self.world.snake, self.world.apple
+        memories = self.agent.memories
+        size = world.size
+        value = self._get_epsilon_value(epsilon, epsilon_args)
+
+        self._encode_states()
+        known = len(memories.states)
+        memories.reserve(max(CODES - known, 0))
+        flat = memories._values.reshape(-1)
+        capacity = size * size + 1
+        body = np.zeros(capacity, dtype=np.int64)
+        body[:len(snake._body)] = snake._body
+        free = np.zeros(size * size, dtype=np.int64)
+        free[:len(world._free)] = world._free
+        state = np.zeros(16, dtype=np.int64)
+        state[[LENGTH, APPLE, FREE, STATES]] = len(snake._body), world.index(apple.position), len(world._free), known
+        start = snake._start_position
+
+        arrays = [np.array(world._cells, dtype=np.int64), np.array(world._grid, dtype=np.int64), free,
+                  np.array(world._slots, dtype=np.int64), body, world.derived('kernel', self._build_bearings_codes),
+                  flat, self._rows, np.zeros(max(CODES - known, 0), dtype=np.int64), state,
+                  np.array(memories._actions, dtype=np.int64)]
+        if COMPILED:
+            generator = random.getstate()
+            twister = np.array(generator[1], dtype=np.int64)
+        else:
+            arrays = [array.tolist() for array in arrays]
+            twister = None
+        cells, grid, free, slots, body, bearings, values, rows, new_codes, state, actions = arrays
+        steps, scores, outcomes = (np.zeros(episodes, dtype=np.int64) for _ in range(3))
+
+        _run(episodes, bool(training), value, float(memories.temperature), bool(memories.greedy),
+             float(self.agent.learning_rate), float(self.agent.discount_factor),
+             isinstance(self._reward_model, DistanceReward), size, self.objective, self._max_starving,
+             world.index(start), DIRECTIONS.index((snake._start_direction.x, snake._start_direction.y)),
+             snake._start_length - 1, actions,
+             cells, grid, free, slots, body, bearings, values, rows, new_codes, state,
+             steps, scores, outcomes, twister)
+
+        if COMPILED:
+            random.setstate((generator[0], tuple(twister.tolist()), generator[2]))
+        else:
+            used = state[STATES] * len(memories._actions)
+            flat[:used] = values[:used]
+        for code in new_codes[:state[NEW]]:
+            self._rows[code] = memories.states.add(decode_observation(code))
+        self._encoded = len(memories.states)
+
+        # Leave the world, snake, apple and environment as the Python step loop would
+        state = [int(value) for value in state]
+        world._grid = [int(value) for value in grid]
+        world._free = [int(value) for value in free[:state[FREE]]]
+        world._slots = [int(value) for value in slots]
+        snake._body = collections.deque(int(body[(state[HEAD] + offset) % capacity]) for offset in range(state[LENGTH]))
+        snake._position = Vector(state[X], state[Y])
+        snake._heading = state[HEADING]
+        snake._grow = state[GROW]
+        snake._colliding = bool(state[COLLIDING])
+        apple._position = Vector(divmod(state[APPLE], size))
+        self.score = state[SCORE]
+        self._starving = state[STARVING]
+        self._is_over = bool(state[OVER])
+        self._outcome = state[OUTCOME]
+        self._reward_model._last_score = state[LAST_SCORE]
+
+        results = Results(episodes)
+        results.record_many(steps, scores, outcomes, np.full(episodes, value))
+        return results
@@ -1,5 +1,8 @@
 import math
 
+# Unit directions ordered so that a 90 degrees rotation adds one to the index
+DIRECTIONS = ((1, 0), (0, 1), (-1, 0), (0, -1))
+
 
 class Vector:
     def __init__(self, x=0, y=0):
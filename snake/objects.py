@@ -1,7 +1,5 @@
-import copy
-import random
-import pygame
-from snake.math import Vector
+import collections
+from snake.math import DIRECTIONS, Vector
 
 
 class Entity:
@@ -20,10 +18,6 @@ class Entity:
         """Return the position in the world."""
         return self._position
 
-    def draw(self, surface):
-        """Draw entity in the world."""
-        pass
-
     def reset(self):
         """Reset entity to initial state."""
         pass
@@ -32,23 +26,19 @@ class Entity:
 class Apple(Entity):
 
     VALUE = 4
-    COLOR = pygame.Color(231, 76, 60)
 
     def random(self):
-        position = copy.deepcopy(self.position)
-        while self.world.check(position) != self.world.EMPTY_VALUE:
-            position = Vector(random.randint(0, self.world.size),
-                              random.randint(0, self.world.size))
-        self._position = position
+        """Move the apple to a random empty cell, or leave it if the world is full."""
+        index = self.world.random_cell()
+        if index is None:
+            return
+        self.world.vacate(self._position, self.VALUE)
+        self._position = Vector(divmod(index, self.world.size))
+        self.world.occupy_cell(index, self.VALUE)
 
     def reset(self):
         return self.random()
 
-    def draw(self, surface):
-        rect = (self.world.to_px(self.position.x), self.world.to_px(
-            self.position.y), self.world.unit_size, self.world.unit_size)
-        pygame.draw.rect(surface, self.COLOR, rect)
-
 
 class Snake(Entity):
 
@@ -63,61 +53,68 @@ class Snake(Entity):
         self._start_direction = direction
         self._start_length = length
 
-        self._body = []
-        self._direction = None
+        # Grid indexes of the body parts, head first
+        self._body = collections.deque()
+        self._heading = 0
         self._grow = 0
+        self._colliding = False
 
         self.reset()
 
     @property
-    def position(self):
-        return self._body[0]
+    def body(self):
+        """Return the positions of the body parts, head first."""
+        return [Vector(divmod(index, self.world.size)) for index in self._body]
+
+    @property
+    def heading(self):
+        """Return the index of the direction in DIRECTIONS."""
+        return self._heading
 
     @property
     def direction(self):
-        return self._direction
+        """Return a copy of the direction vector."""
+        return Vector(DIRECTIONS[self._heading])
 
     @direction.setter
     def direction(self, value):
-        self._direction = value
+        self._heading = DIRECTIONS.index((value.x, value.y))
+
+    def turn(self, action):
+        """Turn the snake 90 degrees times the action."""
+        self._heading = (self._heading + action) % 4
 
     def move(self):
-        head = self._body[0]
+        dx, dy = DIRECTIONS[self._heading]
+        self._position = Vector(self._position.x + dx, self._position.y + dy)
         if self._grow:
-            self._body.insert(
-                0, Vector(head.x + self._direction.x, head.y + self._direction.y))
             self._grow -= 1
         else:
-            for index, part in reversed(list(enumerate(self._body))):
-                if index > 0:
-                    self._body[index].x, self._body[index].y = self._body[index -
-                                                                          1].x, self._body[index - 1].y
-            head.x += self._direction.x
-            head.y += self._direction.y
+            self.world.vacate_cell(self._body.pop(), self.VALUE)
+
+        index = self.world.index(self._position)
+        if index is None:
+            # Leaving the world is as bad as hitting a wall
+            self._colliding = True
+            return
+
+        self._colliding = self.world.check_cell(index) in (self.VALUE, self.world.WALL_VALUE)
+        self._body.appendleft(index)
+        self.world.occupy_cell(index, self.VALUE)
 
     def reset(self):
-        self._body = [Vector(self._start_position)]
-        self._direction = Vector(self._start_direction)
+        for index in self._body:
+            self.world.vacate_cell(index, self.VALUE)
+        self._position = Vector(self._start_position)
+        self._body = collections.deque([self.world.index(self._position)])
+        self.direction = self._start_direction
         self._grow = self._start_length - 1
-
-    def draw(self, surface):
-        for index, part in enumerate(self._body):
-            if index == 0:
-                color = pygame.Color(44, 62, 80)
-            else:
-                color = pygame.Color(236, 240, 241)
-            rect = (self.world.to_px(part.x), self.world.to_px(
-                part.y), self.world.unit_size, self.world.unit_size)
-            pygame.draw.rect(surface, color, rect)
+        self._colliding = False
+        self.world.occupy_cell(self._body[0], self.VALUE)
 
     def is_colliding(self):
         """Return if the snake is colliding with a wall or herself."""
-        if self.world.check(self.position, exclude=(self.VALUE, )) == self.world.WALL_VALUE:
-            return True
-        for part in self._body[1:]:
-            if part == self.position:
-                return True
-        return False
+        return self._colliding
 
     def __len__(self):
         return len(self._body)
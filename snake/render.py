@@ -0,0 +1,86 @@
+"""Pygame rendering of the world, only imported when visualization is enabled."""
+import pygame
+from snake.world import WorldNotLoadedError
+
+
+class Renderer:
+    """Draw a world and its entities in a pygame window."""
+
+    WALL_COLOR = pygame.Color(30, 30, 30)
+    EMPTY_COLOR = (pygame.Color(39, 174, 96), pygame.Color(46, 204, 113))
+    APPLE_COLOR = pygame.Color(231, 76, 60)
+    HEAD_COLOR = pygame.Color(44, 62, 80)
+    BODY_COLOR = pygame.Color(236, 240, 241)
+
+    def __init__(self, world, speed=60):
+        self._world = world
+        self._speed = speed
+        self._clock = pygame.time.Clock()
+
+        self._display = None
+        self._surface = None
+        self._structure_surface = None
+        self._structure = None
+
+    @property
+    def world(self):
+        return self._world
+
+    @property
+    def surface(self):
+        return self._surface
+
+    def open(self):
+        """Open the window and build the surfaces of the current world."""
+        if not self.world.loaded:
+            raise WorldNotLoadedError(
+                'The world must be loaded before creating surfaces of it!')
+
+        size = self.world.to_px(self.world.size)
+        self._display = pygame.display.set_mode((size, size))
+        self._surface = pygame.Surface((size, size))
+        # The structure surface is kept with the parsed world and reused when it is loaded again
+        self._structure_surface = self.world.derived(('surface', self.world.unit_size), self._build_structure)
+        self._structure = self.world._structure
+
+    def _build_structure(self):
+        world = self.world
+        size = world.to_px(world.size)
+        surface = pygame.Surface((size, size))
+        for x in range(world.size):
+            for y in range(world.size):
+                if world._structure[x][y] == world.WALL_VALUE:
+                    color = self.WALL_COLOR
+                else:
+                    color = self.EMPTY_COLOR[(x + y) % 2]
+                rect = (world.to_px(x), world.to_px(y),
+                        world.unit_size, world.unit_size)
+                pygame.draw.rect(surface, color, rect)
+        return surface
+
+    def _draw_cell(self, position, color):
+        rect = (self.world.to_px(position.x), self.world.to_px(
+            position.y), self.world.unit_size, self.world.unit_size)
+        pygame.draw.rect(self._surface, color, rect)
+
+    def draw(self):
+        """Draw the current world."""
+        if self._structure is not self.world._structure:
+            self.open()
+
+        self._surface.blit(self._structure_surface, (0, 0))
+        self._draw_cell(self.world.apple.position, self.APPLE_COLOR)
+        for index, part in enumerate(self.world.snake.body):
+            self._draw_cell(part, self.HEAD_COLOR if index == 0 else self.BODY_COLOR)
+
+        self._display.blit(self._surface, (0, 0))
+        pygame.display.flip()
+
+    def tick(self):
+        """Handle the window events and limit the simulation speed."""
+        pygame.event.clear()
+        self._clock.tick(self._speed)
+
+    def aborted(self):
+        """Return if the user asked to abort the execution."""
+        return pygame.key.get_pressed()[pygame.K_ESCAPE]
@@ -1,6 +1,4 @@
 import learning
-from decimal import Decimal
-from snake.objects import Snake, Apple
 
 
 def create(name='default'):
@@ -17,16 +15,16 @@ class DefaultReward(learning.environment.Reward):
 
         if environment.is_over():
             if environment.is_starving():
-                return Decimal('-10.0')
+                return -10.0
             if environment.score < environment.objective:
-                return Decimal('-10.0')
-            return Decimal('+10.0')
+                return -10.0
+            return 10.0
 
         if environment.score > self._last_score:
             self._last_score = environment.score
-            return Decimal('+5.0')
+            return 5.0
 
-        return Decimal('0.0')
+        return 0.0
 
     def reset(self):
         self._last_score = 0
@@ -35,6 +33,6 @@ class DefaultReward(learning.environment.Reward):
 class DistanceReward(DefaultReward):
     def __call__(self, environment, state, action, state_prime):
         reward = super().__call__(environment, state, action, state_prime)
-        if float(reward) == 0:
-            return Decimal(environment.world.snake.position.distance(environment.world.apple.position) / environment.world.size) * -1
+        if reward == 0:
+            return environment.world.snake.position.distance(environment.world.apple.position) / environment.world.size * -1
         return reward
@@ -1,7 +1,7 @@
-import copy
-import pygame
+import os
+import random
 import simplejson as json
-from snake.math import Vector
+from snake.math import DIRECTIONS, Vector
 from snake.objects import Snake, Apple
 
 
@@ -9,14 +9,32 @@ class WorldNotLoadedError(Exception):
     pass
 
 
+class ParsedWorld:
+    """Structure of a world file and the values derived from it, shared by every load of the file."""
+
+    def __init__(self, data, mtime):
+        self.mtime = mtime
+        self.size = data['size']
+        self.structure = data['data']
+        self.cells = [value for row in self.structure for value in row]
+        self.free = [index for index, value in enumerate(self.cells) if value == World.EMPTY_VALUE]
+        self.slots = [-1] * len(self.cells)
+        for slot, index in enumerate(self.free):
+            self.slots[index] = slot
+        self.snake = data.get('snake')
+        self.derived = {}
+
+
 class World:
 
     UNKNOW_VALUE = -1
     WALL_VALUE = 1
     EMPTY_VALUE = 0
 
-    WALL_COLOR = pygame.Color(30, 30, 30)
-    EMPTY_COLOR = (pygame.Color(39, 174, 96), pygame.Color(46, 204, 113))
+    DIRECTIONS = DIRECTIONS
+
+    # Parsed world files by filename, reloaded when the file is modified
+    _parsed_worlds = {}
 
     def __init__(self, directory=None, unit_size=16):
 
@@ -26,8 +44,14 @@ class World:
 
         self._directory = directory
         self._structure = []
-        self._structure_surface = None
-        self._surface = None
+        self._cells = []
+        self._grid = []
+        self._spans = None
+        self._parsed = None
+
+        # Empty grid indexes and the slot of each index in it (-1 if not empty)
+        self._free = []
+        self._slots = []
 
         self.name = ''
         self.size = 0
@@ -38,10 +62,6 @@ class World:
     def unit_size(self):
         return self._unit_size
 
-    @property
-    def surface(self):
-        return self._surface
-
     @property
     def snake(self):
         return self._snake
@@ -54,13 +74,25 @@ class World:
     def loaded(self):
         return self._structure and self.size > 0
 
+    @property
+    def empty_cells(self):
+        """Return the number of empty cells of the world structure."""
+        return len(self._parsed.free)
+
+    def derived(self, key, build):
+        """Return a value derived from the world structure, built once per parsed world file."""
+        derived = self._parsed.derived
+        if key not in derived:
+            derived[key] = build()
+        return derived[key]
+
     def snapshot(self):
         structure = ''
         for row in self._structure:
             for value in row:
                 structure += str(value)
 
-        snake = '|'.join([f'{p.x};{p.y}' for p in self.snake._body])
+        snake = '|'.join([f'{p.x};{p.y}' for p in self.snake.body])
 
         apple = f'{self.apple.position.x};{self.apple.position.y}'
 
@@ -71,73 +103,151 @@ class World:
             return map(self.to_px, value)
         return value * self.unit_size
 
+    def index(self, position):
+        """Return the grid index of a position or None if it is outside the world."""
+        if 0 <= position.x < self.size and 0 <= position.y < self.size:
+            return position.x * self.size + position.y
+        return None
+
+    def occupy(self, position, value):
+        """Mark a position of the occupancy grid with an entity value."""
+        index = self.index(position)
+        if index is not None:
+            self.occupy_cell(index, value)
+
+    def vacate(self, position, value):
+        """Restore the structure value of a position marked with an entity value."""
+        index = self.index(position)
+        if index is not None:
+            self.vacate_cell(index, value)
+
+    def occupy_cell(self, index, value):
+        """Mark a grid index with an entity value."""
+        if self._grid[index] == self.EMPTY_VALUE:
+            self._remove_free(index)
+        self._grid[index] = value
+
+    def vacate_cell(self, index, value):
+        """Restore the structure value of a grid index marked with an entity value."""
+        if self._grid[index] == value:
+            self._grid[index] = self._cells[index]
+            if self._grid[index] == self.EMPTY_VALUE:
+                self._add_free(index)
+
+    def _add_free(self, index):
+        self._slots[index] = len(self._free)
+        self._free.append(index)
+
+    def _remove_free(self, index):
+        """Swap the last free index into the slot of the removed one."""
+        slot, last = self._slots[index], self._free.pop()
+        if last != index:
+            self._free[slot] = last
+            self._slots[last] = slot
+        self._slots[index] = -1
+
+    def random_cell(self):
+        """Return a random empty grid index or None if there is none."""
+        if not self._free:
+            return None
+        return self._free[random.randrange(len(self._free))]
+
+    def check_cell(self, index):
+        """Return the occupancy value of a grid index."""
+        return self._grid[index]
+
     def check(self, position, exclude=None):
         """Return the value of the world position."""
-        if exclude is None:
-            exclude = tuple()
-
-        # Snake
-        if self.snake.VALUE not in exclude:
-            for part in self.snake._body:
-                if position == part:
-                    return self.snake.VALUE
-
-        if self.apple.VALUE not in exclude:
-            if position == self.apple.position:
-                return self.apple.VALUE
-
-        try:
-            return self._structure[position.x][position.y]
-        except IndexError:
+        index = self.index(position)
+        if index is None:
             return self.UNKNOW_VALUE
 
+        value = self._grid[index]
+        if exclude and value in exclude:
+            # The head may be over the apple until it is placed again
+            if value == Snake.VALUE and Apple.VALUE not in exclude and position == self.apple.position:
+                return Apple.VALUE
+            return self._cells[index]
+        return value
+
+    def _build_spans(self):
+        """Return the empty cells crossed and the structure hit from every cell and direction."""
+        size = self.size
+        spans = []
+        for index in range(size * size):
+            for dx, dy in self.DIRECTIONS:
+                x, y = divmod(index, size)
+                cells = []
+                while True:
+                    x, y = x + dx, y + dy
+                    if not (0 <= x < size and 0 <= y < size):
+                        value = self.UNKNOW_VALUE
+                        break
+                    if self._cells[x * size + y] != self.EMPTY_VALUE:
+                        value = self._cells[x * size + y]
+                        break
+                    cells.append(x * size + y)
+                spans.append((tuple(cells), value, len(cells) + 1))
+        return spans
+
+    def look(self, position, heading):
+        """Return the first non empty value seen from a position in a direction index and its distance.
+
+        The cells crossed until the structure is hit are precomputed, so
+        only the snake and the apple are checked along them.
+        """
+        index = self.index(position)
+        if index is None:
+            value, hit = self.raycast(
+                position, Vector(self.DIRECTIONS[heading]), (Snake.VALUE, Apple.VALUE, self.WALL_VALUE))
+            return (value, position.distance(hit))
+
+        if self._spans is None:
+            self._spans = self.derived('spans', self._build_spans)
+        cells, value, distance = self._spans[index * 4 + heading]
+        grid = self._grid
+        for offset, cell in enumerate(cells, 1):
+            if grid[cell] != self.EMPTY_VALUE:
+                return (grid[cell], offset)
+        return (value, distance)
+
     def raycast(self, position, direction, mask):
         """Raycast from the position in the given direction returning a entity in the mask."""
-        ray_position = copy.deepcopy(position) + direction
         mask = mask + (self.UNKNOW_VALUE, )
-
-        while self.check(ray_position) not in mask:
-            ray_position = ray_position + direction
-        return (self.check(ray_position), ray_position)
-
-    def _create_surfaces(self):
-        """Create the surfaces used by the world."""
-        if not self.loaded:
-            raise WorldNotLoadedError(
-                'The world must be loaded before creating surfaces of it!')
-
-        size = self.to_px(self.size)
-        self._surface = pygame.Surface((size, size))
-        self._structure_surface = pygame.Surface((size, size))
-
-    def _build_structure(self):
-        for x in range(self.size):
-            for y in range(self.size):
-                if self._structure[x][y] == self.WALL_VALUE:
-                    color = self.WALL_COLOR
-                else:
-                    color = self.EMPTY_COLOR[(x + y) % 2]
-                rect = (self.to_px(x), self.to_px(y),
-                        self.unit_size, self.unit_size)
-                pygame.draw.rect(self._structure_surface, color, rect)
-
-    def draw(self):
-        """Draw the current world."""
-        self._surface.blit(self._structure_surface, (0, 0))
-        self.apple.draw(self._surface)
-        self.snake.draw(self._surface)
+        grid, size = self._grid, self.size
+        x, y = position.x + direction.x, position.y + direction.y
+
+        while True:
+            if 0 <= x < size and 0 <= y < size:
+                value = grid[x * size + y]
+            else:
+                value = self.UNKNOW_VALUE
+            if value in mask:
+                return (value, Vector(x, y))
+            x += direction.x
+            y += direction.y
 
     def load(self, name):
         """Load a existing world from file."""
         filename = f'{self._directory}/{name}.json'
-        with open(filename, 'r') as file:
-            world = json.load(file)
-
-        self.size = world['size']
-        self._structure = copy.deepcopy(world['data'])
-
-        if 'snake' in world.keys():
-            snake = world['snake']
+        mtime = os.stat(filename).st_mtime_ns
+        parsed = self._parsed_worlds.get(filename)
+        if parsed is None or parsed.mtime != mtime:
+            with open(filename, 'r') as file:
+                parsed = self._parsed_worlds[filename] = ParsedWorld(json.load(file), mtime)
+
+        self.name = name
+        self.size = parsed.size
+        self._parsed = parsed
+        self._structure = parsed.structure
+        self._cells = parsed.cells
+        self._grid = list(parsed.cells)
+        self._free = list(parsed.free)
+        self._slots = list(parsed.slots)
+        self._spans = parsed.derived.get('spans')
+
+        if parsed.snake:
+            snake = parsed.snake
             position = Vector(snake['position'])
             direction = Vector(snake['direction'])
             length = snake['length']
@@ -147,12 +257,7 @@ class World:
 
         self._apple = Apple(self)
 
-        self._create_surfaces()
-        self._build_structure()
-
         self.reset()
-        # After loading we should generate the surfaces, build
-        # the structure surface and reset the world.
 
     def save(self, name):
         """Save the current world to file."""
@@ -0,0 +1,176 @@
+"""Module for the buffered statistics output of the training sessions."""
+import csv
+import http.server
+import os
+import threading
+import numpy as np
+import simplejson as json
+
+HEADERS = ['cycle', 'steps', 'score', 'wins', 'loses', 'starves']
+
+# Per-episode columns and their types, each one stored in a raw file of the episodes directory
+COLUMNS = {
+    'cycle': np.int32,
+    'world': np.int16,
+    'steps': np.int32,
+    'score': np.int32,
+    'outcome': np.int8,
+    'epsilon': np.float32,
+}
+
+
+class StatisticsSink:
+    """Buffer the world and cycle CSV rows and the per-episode columns, writing them in batches.
+
+    World and cycle means go to `<world>.csv` and `results.csv` as before.
+    Every episode is appended to `episodes/<column>.<type>` files that can
+    be read back with `read_episodes`.
+    """
+
+    def __init__(self, directory, rows=64, episodes=65536):
+        self._directory = directory
+        self._max_rows = rows
+        self._max_episodes = episodes
+
+        self._rows = {}
+        self._row_count = 0
+        self._columns = {name: [] for name in COLUMNS}
+        self._episode_count = 0
+        self._worlds = read_worlds(directory)
+
+    def _world_index(self, name):
+        if name not in self._worlds:
+            self._worlds.append(name)
+            with open(os.path.join(self._directory, 'worlds.txt'), 'a') as file:
+                file.write(f'{name}\n')
+        return self._worlds.index(name)
+
+    def _add_row(self, filename, row):
+        self._rows.setdefault(filename, []).append(row)
+        self._row_count += 1
+        if self._row_count >= self._max_rows:
+            self.flush()
+
+    def world(self, cycle, name, results):
+        """Add the results of a world in a cycle."""
+        self._add_row(f'{name}.csv', [
+            cycle,
+            results.steps.mean(),
+            results.scores.mean(),
+            results.wins,
+            results.loses,
+            results.starves
+        ])
+
+        count = results.episodes
+        columns = self._columns
+        columns['cycle'].append(np.full(count, cycle, dtype=COLUMNS['cycle']))
+        columns['world'].append(np.full(count, self._world_index(name), dtype=COLUMNS['world']))
+        columns['steps'].append(results.steps.astype(COLUMNS['steps']))
+        columns['score'].append(results.scores.astype(COLUMNS['score']))
+        columns['outcome'].append(results.outcomes.astype(COLUMNS['outcome']))
+        columns['epsilon'].append(results.epsilons.astype(COLUMNS['epsilon']))
+        self._episode_count += count
+        if self._episode_count >= self._max_episodes:
+            self.flush()
+
+    def cycle(self, cycle, results):
+        """Add the results of all worlds in a cycle."""
+        self._add_row('results.csv', [
+            cycle,
+            np.mean([r.steps.mean() for r in results]),
+            np.mean([r.scores.mean() for r in results]),
+            np.mean([r.wins for r in results]),
+            np.mean([r.loses for r in results]),
+            np.mean([r.starves for r in results])
+        ])
+
+    def flush(self):
+        """Write the buffered rows and episodes."""
+        for filename, rows in self._rows.items():
+            with open(os.path.join(self._directory, filename), 'a', newline='') as file:
+                writer = csv.writer(file, delimiter=';')
+                if file.tell() == 0:
+                    writer.writerow(HEADERS)
+                writer.writerows(rows)
+        self._rows.clear()
+        self._row_count = 0
+
+        if self._episode_count:
+            directory = os.path.join(self._directory, 'episodes')
+            os.makedirs(directory, exist_ok=True)
+            for name, chunks in self._columns.items():
+                with open(os.path.join(directory, f'{name}.{np.dtype(COLUMNS[name]).name}'), 'ab') as file:
+                    file.write(np.concatenate(chunks).tobytes())
+                chunks.clear()
+            self._episode_count = 0
+
+    def close(self):
+        self.flush()
+
+
+def read_worlds(directory):
+    """Return the world names indexed by the world column."""
+    filename = os.path.join(directory, 'worlds.txt')
+    if not os.path.exists(filename):
+        return []
+    with open(filename, 'r') as file:
+        return file.read().splitlines()
+
+
+def read_episodes(directory):
+    """Return the per-episode columns written to a statistics directory as arrays."""
+    columns = {}
+    for name, dtype in COLUMNS.items():
+        filename = os.path.join(directory, 'episodes', f'{name}.{np.dtype(dtype).name}')
+        columns[name] = np.fromfile(filename, dtype=dtype) if os.path.exists(filename) else np.zeros(0, dtype)
+    return columns
+
+
+class ProfileLog:
+    """Append the profiler reports to a file, one JSON object per line."""
+
+    def __init__(self, filename):
+        self._filename = filename
+
+    def write(self, report):
+        with open(self._filename, 'a') as file:
+            file.write(json.dumps(report) + '\n')
+
+    def close(self):
+        pass
+
+
+class MetricsServer:
+    """Serve the latest profiler report as JSON on a local port."""
+
+    def __init__(self, port, hostname='127.0.0.1'):
+        self.report = {}
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(server.report).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer((hostname, port), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def write(self, report):
+        self.report = report
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
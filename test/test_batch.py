@@ -0,0 +1,65 @@
+import random
+import unittest
+import numpy as np
+import learning
+import snake
+from snake.batch import BatchEnvironment, decode_observation, encode_observation
+from snake.environment import Results
+
+ACTIONS = [-1, 0, 1]
+
+
+def create(name, games=8):
+    table = learning.memory.ArrayMemoryTable(ACTIONS)
+    agent = learning.Agent(0.75, 0.9, table)
+    world = snake.World('data/worlds')
+    world.load(name)
+    return agent, world, BatchEnvironment(agent, world, games, seed=0)
+
+
+class TestBatchEnvironment(unittest.TestCase):
+    def test_observation_codes(self):
+        state = ((1, 3), (2, 0), (4, 1), (-135, 2))
+        self.assertEqual(decode_observation(encode_observation(state)), state)
+
+    def test_observe_matches_environment(self):
+        random.seed(0)
+        for name in ('default', 'rooms'):
+            agent, world, batch = create(name, 1)
+            environment = snake.Environment(agent, world)
+            batch.initialize()
+            size = world.size
+
+            environment.reset()
+            for _ in range(300):
+                if environment.is_over():
+                    environment.reset()
+                action = agent.act(environment.observe(), 1)
+                world.snake.turn(action)
+                world.snake.move()
+                environment.update(Results(), False)
+
+                body = list(world.snake._body)
+                batch._grid[0] = world._grid + [world.UNKNOW_VALUE]
+                batch._bodies[0, :len(body)] = body
+                batch._heads[0] = 0
+                batch._directions[0] = world.snake.heading
+                batch._apples[0] = world.apple.position.x * size + world.apple.position.y
+
+                code = batch.observe(np.array([0]))[0]
+                self.assertEqual(decode_observation(code), environment.observe())
+
+    def test_execute_plays_every_episode(self):
+        agent, world, batch = create('default')
+        results = batch.execute(True, 20, 0.1)
+
+        self.assertEqual(results.episodes, 20)
+        self.assertEqual(len(results.scores), 20)
+        self.assertEqual(len(results.steps), 20)
+        self.assertEqual(results.wins + results.loses, 20)
+        self.assertGreater(len(agent.memories.values), 0)
+
+    def test_requires_array_memory_table(self):
+        table = learning.memory.SingleMemoryTable(ACTIONS, learning.memory.DictMemoryStorageAdapter())
+        with self.assertRaises(ValueError):
+            BatchEnvironment(learning.Agent(0.75, 0.9, table), snake.World('data/worlds'))
@@ -0,0 +1,105 @@
+import os
+import tempfile
+import unittest
+import shutil
+from learning.checkpoint import Checkpointer, read_progress, staging_filename, write_progress
+from learning.memory import (ArrayMemoryTable, DictMemoryStorageAdapter, DoubleMemoryTable, SingleMemoryTable,
+                             SQLiteMemoryStorageAdapter)
+
+ACTIONS = [-1, 0, 1]
+STATE = ((1, 0), (1, 2), (2, 3), (45, 1))
+NEXT_STATE = ((1, 1), (4, 2), (1, 3), (0, 1))
+
+
+class TestCheckpointer(unittest.TestCase):
+    def assertCheckpoints(self, create, binary):
+        table = create()
+        table.update(STATE, 1, 5.0, NEXT_STATE, 0.75, 0.9)
+        expected = table.actions(STATE)
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'memory.checkpoint')
+            checkpointer = Checkpointer(table, filename, binary, cycles=2)
+            self.assertFalse(checkpointer.due(1))
+            self.assertTrue(checkpointer.due(2))
+            self.assertIsNone(read_progress(filename))
+
+            checkpointer.save(2)
+            table.update(STATE, 1, 5.0, NEXT_STATE, 0.75, 0.9)
+            checkpointer.wait()
+            self.assertIsNone(checkpointer.error)
+            self.assertFalse(checkpointer.due(3))
+            self.assertEqual(read_progress(filename), 2)
+
+            resumed = create()
+            resumed.load(filename)
+            self.assertEqual(resumed.actions(STATE), expected)
+
+    def test_single_table_checkpoint(self):
+        self.assertCheckpoints(lambda: SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter()), False)
+
+    def test_array_table_binary_checkpoint(self):
+        self.assertCheckpoints(lambda: ArrayMemoryTable(ACTIONS), True)
+
+    def test_sqlite_table_checkpoint(self):
+        with tempfile.TemporaryDirectory() as directory:
+            tables = []
+
+            def create():
+                # The resumed table starts from an empty database of its own
+                filename = os.path.join(directory, f'memory{len(tables)}.sqlite')
+                tables.append(SingleMemoryTable(ACTIONS, SQLiteMemoryStorageAdapter(filename)))
+                return tables[-1]
+            try:
+                self.assertCheckpoints(create, False)
+            finally:
+                for table in tables:
+                    table.adapter.close()
+
+    def test_later_checkpoints_copy_the_changed_states(self):
+        states = [((index % 5, index % 3), (0, 0), (0, 0), (0, 0)) for index in range(40)]
+        for table in (SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter()),
+                      DoubleMemoryTable(ACTIONS, DictMemoryStorageAdapter(), DictMemoryStorageAdapter(), 3, True)):
+            with tempfile.TemporaryDirectory() as directory:
+                filename = os.path.join(directory, 'memory.checkpoint')
+                checkpointer = Checkpointer(table, filename, cycles=1)
+                for cycle, (state, next_state) in enumerate(zip(states, states[1:])):
+                    table.update(state, ACTIONS[cycle % 3], float(cycle), next_state, 0.5, 0.9)
+                    if cycle == 20:
+                        table.merge({f'{states[0]}_0': 2.0})
+                    checkpointer.save(cycle)
+                    checkpointer.wait()
+                    self.assertIsNone(checkpointer.error)
+
+                    resumed = SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter())
+                    resumed.load(filename)
+                    self.assertEqual(resumed.snapshot(), table.snapshot())
+
+    def test_progress_follows_the_checkpoint_it_was_written_for(self):
+        table = SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter())
+        table.update(STATE, 1, 5.0, NEXT_STATE, 0.75, 0.9)
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'memory.checkpoint')
+            checkpointer = Checkpointer(table, filename, cycles=2)
+            checkpointer.save(2)
+            checkpointer.wait()
+
+            # Stopped after staging the next checkpoint, before moving it
+            shutil.copy(filename, staging_filename(filename))
+            write_progress(staging_filename(filename), 4)
+            self.assertEqual(read_progress(filename), 2)
+
+            # Stopped after moving the next checkpoint, before moving its progress
+            os.replace(staging_filename(filename), filename)
+            self.assertEqual(read_progress(filename), 4)
+
+            checkpointer.save(6)
+            checkpointer.wait()
+            self.assertIsNone(checkpointer.error)
+            self.assertEqual(read_progress(filename), 6)
+            self.assertEqual(sorted(os.listdir(directory)), ['memory.checkpoint', 'memory.checkpoint.json'])
+
+    def test_resumed_cycle(self):
+        checkpointer = Checkpointer(ArrayMemoryTable(ACTIONS), 'memory.checkpoint', cycles=2, cycle=4)
+        self.assertFalse(checkpointer.due(5))
+        self.assertTrue(checkpointer.due(6))
@@ -0,0 +1,61 @@
+import random
+import subprocess
+import sys
+import unittest
+import numpy as np
+import learning
+import snake
+from snake import kernel
+from snake.kernel import KernelEnvironment
+from snake.rewards import DefaultReward, DistanceReward
+
+ACTIONS = [-1, 0, 1]
+
+
+def play(environment_class, name, reward):
+    """Return everything a seeded training and run session leaves behind."""
+    random.seed(3)
+    table = learning.memory.ArrayMemoryTable(ACTIONS)
+    world = snake.World('data/worlds')
+    environment = environment_class(learning.Agent(0.75, 0.9, table), world, reward=reward)
+    world.load(name)
+    sessions = [environment.execute(True, 60, epsilon, (), False) for epsilon in (0.1, 0.02)]
+    table.greedy = True
+    sessions.append(environment.execute(False, 10, 0.0, (), False))
+    return (
+        [(r.steps.tolist(), r.scores.tolist(), r.outcomes.tolist(), r.epsilons.tolist()) for r in sessions],
+        table.values.tolist(),
+        [table.states.state(index) for index in range(len(table.states))],
+        (world._grid, world._free, list(world.snake._body), world.apple.position.x, world.apple.position.y),
+        random.random(),
+    )
+
+
+class TestKernel(unittest.TestCase):
+    def test_snake_does_not_import_the_kernel(self):
+        code = 'import sys, snake; print("snake.kernel" in sys.modules, snake.KernelEnvironment.__module__)'
+        output = subprocess.check_output([sys.executable, '-c', code])
+        self.assertEqual(output.strip(), b'False snake.kernel')
+
+    def test_twister_matches_random_module(self):
+        random.seed(7)
+        generator = np.array(random.getstate()[1], dtype=np.int64)
+        expected = [random.random() if index % 2 else random.randrange(index + 1) for index in range(2000)]
+        drawn = [kernel._twister_random(generator) if index % 2 else kernel._twister_randbelow(generator, index + 1)
+                 for index in range(2000)]
+        self.assertEqual(drawn, expected)
+
+    def test_matches_python_step_loop(self):
+        for name in ('default', 'rooms', 'dot'):
+            for reward in (DefaultReward, DistanceReward):
+                self.assertEqual(play(KernelEnvironment, name, reward()), play(snake.Environment, name, reward()),
+                                 f'{name} {reward.__name__}')
+
+    def test_unsupported_agents_use_python_step_loop(self):
+        random.seed(0)
+        world = snake.World('data/worlds')
+        agent = learning.traces.create('q-lambda', 0.75, 0.9, learning.memory.ArrayMemoryTable(ACTIONS))
+        environment = KernelEnvironment(agent, world)
+        world.load('default')
+        self.assertFalse(environment.supported())
+        self.assertEqual(environment.execute(True, 3, 0.1, (), False).episodes, 3)
@@ -0,0 +1,505 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+import numpy as np
+from decimal import Decimal
+import learning
+from learning.memory import (ArrayMemoryTable, BoundedMemoryStorageAdapter, DictMemoryStorageAdapter,
+                             DoubleMemoryTable, RedisHashMemoryStorageAdapter, SingleMemoryTable,
+                             SQLiteMemoryStorageAdapter)
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+ACTIONS = [-1, 0, 1]
+STATE = ((1, 0), (1, 2), (2, 3), (45, 1))
+NEXT_STATE = ((1, 1), (4, 2), (1, 3), (0, 1))
+
+
+class TestMemoryTable(unittest.TestCase):
+    def test_float_backend_is_default(self):
+        table = SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter())
+        table.update(STATE, 1, 5.0, NEXT_STATE, 0.5, 0.5)
+
+        weight = table.adapter.weight(STATE, 1)
+        self.assertIsInstance(weight, float)
+        self.assertAlmostEqual(weight, 0.5 * 1 + 0.5 * (5.0 + 0.5 * 1))
+
+    def test_decimal_backend(self):
+        number = learning.numeric.create('decimal')
+        table = SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter(number), number)
+        table.update(STATE, 1, 5.0, NEXT_STATE, 0.5, 0.5)
+
+        self.assertEqual(table.adapter.weight(STATE, 1), Decimal('3.25'))
+
+    def test_saved_memory_loads_in_both_backends(self):
+        table = SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter())
+        table.update(STATE, 0, -10.0, NEXT_STATE, 0.75, 0.9)
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'memory')
+            table.save(filename)
+            for numeric in ('float', 'decimal'):
+                number = learning.numeric.create(numeric)
+                adapter = DictMemoryStorageAdapter(number)
+                adapter.load(filename)
+                self.assertIsInstance(adapter.weight(STATE, 0), number)
+                self.assertAlmostEqual(float(adapter.weight(STATE, 0)), table.adapter.weight(STATE, 0))
+
+
+class TestArrayMemoryTable(unittest.TestCase):
+    def test_updates_match_single_table(self):
+        single = SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter())
+        array = ArrayMemoryTable(ACTIONS, capacity=1)
+        transitions = [
+            (STATE, 1, 5.0, NEXT_STATE),
+            (NEXT_STATE, -1, -10.0, STATE),
+            (STATE, 0, 0.0, NEXT_STATE),
+            (STATE, 1, 5.0, STATE),
+        ]
+        for state, action, reward, next_state in transitions:
+            single.update(state, action, reward, next_state, 0.75, 0.9)
+            array.update(state, action, reward, next_state, 0.75, 0.9)
+
+        for state in (STATE, NEXT_STATE):
+            self.assertEqual(array.actions(state), single.actions(state))
+            self.assertEqual(array.best(state), single.best(state))
+        self.assertEqual(array.values.shape, (2, len(ACTIONS)))
+        self.assertFalse(array.exists(((0, 0), (0, 0), (0, 0), (0, 0))))
+
+    def test_loads_single_table_memory(self):
+        single = SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter())
+        single.update(STATE, 1, 5.0, NEXT_STATE, 0.75, 0.9)
+        single.update(NEXT_STATE, 0, -10.0, STATE, 0.75, 0.9)
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'memory')
+            single.save(filename)
+            array = ArrayMemoryTable(ACTIONS)
+            array.load(filename)
+            array.save(filename)
+            adapter = DictMemoryStorageAdapter()
+            adapter.load(filename)
+
+        for state in (STATE, NEXT_STATE):
+            self.assertEqual(array.actions(state), single.actions(state))
+        self.assertEqual(sorted(adapter.keys()), sorted(single.adapter.keys()))
+
+    def test_binary_memory_round_trip(self):
+        single = SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter())
+        single.update(STATE, 1, 5.0, NEXT_STATE, 0.75, 0.9)
+        single.update(NEXT_STATE, 0, -10.0, STATE, 0.75, 0.9)
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'memory')
+            single.save(filename, binary=True)
+            array = ArrayMemoryTable(ACTIONS)
+            array.load(filename)
+            self.assertEqual(array.actions(NEXT_STATE), single.actions(NEXT_STATE))
+            array.update(STATE, -1, 1.0, ((0, 0), ), 0.5, 0.5)
+            array.save(filename, binary=True)
+
+            reloaded = SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter())
+            reloaded.load(filename)
+            for state in (STATE, NEXT_STATE, ((0, 0), )):
+                self.assertEqual(reloaded.actions(state), array.actions(state))
+
+    def test_converts_json_memory_to_binary(self):
+        single = SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter())
+        single.update(STATE, 1, 5.0, NEXT_STATE, 0.75, 0.9)
+
+        with tempfile.TemporaryDirectory() as directory:
+            source, binary, json = (os.path.join(directory, name) for name in ('source', 'binary', 'json'))
+            single.save(source)
+            learning.memoryfile.convert(source, binary)
+            learning.memoryfile.convert(binary, json)
+            self.assertTrue(learning.memoryfile.is_binary(binary))
+            self.assertFalse(learning.memoryfile.is_binary(json))
+
+            reloaded = SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter())
+            reloaded.load(json)
+            self.assertEqual(reloaded.actions(STATE), single.actions(STATE))
+
+    def test_repeated_batch_updates_apply_in_order(self):
+        batched = ArrayMemoryTable(ACTIONS)
+        scalar = ArrayMemoryTable(ACTIONS)
+        transitions = [(STATE, 1, 5.0), (NEXT_STATE, 0, 1.0), (STATE, 1, -10.0), (STATE, 1, 2.0)]
+        for table in (batched, scalar):
+            for state in (STATE, NEXT_STATE):
+                table.initialize_state(state)
+        for state, action, reward in transitions:
+            # Next states are unknown, so the batch reads the same next weights
+            scalar.update(state, action, reward, (), 0.5, 0.9)
+
+        rows = np.array([batched.index(state) for state, _, _ in transitions])
+        columns = np.array([batched.column(action) for _, action, _ in transitions])
+        rewards = np.array([reward for _, _, reward in transitions])
+        batched.update_rows(rows, columns, rewards, np.full(len(rows), -1), 0.5, 0.9)
+        np.testing.assert_allclose(batched.values[:2], scalar.values[:2])
+
+    def test_rejects_decimal_backend(self):
+        with self.assertRaises(ValueError):
+            ArrayMemoryTable(ACTIONS, number=Decimal)
+
+
+class TestMemoryFileLoading(unittest.TestCase):
+    def create(self, directory, binary=False):
+        table = SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter())
+        table.update(STATE, 0, -10.0, NEXT_STATE, 0.75, 0.9)
+        table.update(NEXT_STATE, 1, 5.0, STATE, 0.75, 0.9)
+        filename = os.path.join(directory, 'memory')
+        table.save(filename, binary)
+        return table, filename
+
+    def test_streams_json_in_small_chunks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            table, filename = self.create(directory)
+            read = []
+            items = dict(learning.memoryfile.iter_json(filename, lambda done, total: read.append(done), chunk=7))
+
+            self.assertEqual({key: float(weight) for key, weight in items.items()}, table.snapshot())
+            self.assertGreater(len(read), 1)
+            self.assertEqual(read[-1], os.path.getsize(filename))
+
+    def test_streamed_json_replaces_the_file_once_complete(self):
+        def failing():
+            yield 'a_1', 2.5
+            raise OSError('disk full')
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'memory')
+            learning.memoryfile.write_json_items(filename, [('a"b_1', 2.5), ('a_0', Decimal('0.1'))])
+            self.assertEqual(dict(learning.memoryfile.iter_json(filename)), {'a"b_1': '2.5', 'a_0': '0.1'})
+            with self.assertRaises(OSError):
+                learning.memoryfile.write_json_items(filename, failing())
+            self.assertEqual(dict(learning.memoryfile.iter_json(filename)), {'a"b_1': '2.5', 'a_0': '0.1'})
+
+    def test_reports_the_offset_of_a_malformed_entry(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'memory')
+            with open(filename, 'w') as file:
+                file.write('{"a_1": 1.0, "a_0": oops}')
+            with self.assertRaisesRegex(ValueError, 'error at byte 12'):
+                SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter()).load(filename)
+
+    def test_lazy_load_reads_states_when_used(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for binary in (False, True):
+                table, filename = self.create(directory, binary)
+                lazy = SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter())
+                lazy.load(filename, lazy=True)
+
+                self.assertEqual(len(lazy.adapter._data), 0)
+                self.assertEqual(lazy.actions(STATE), table.actions(STATE))
+                self.assertEqual(len(lazy.adapter._data), len(ACTIONS))
+                self.assertFalse(lazy.exists(((0, 0), (0, 0), (0, 0), (0, 0))))
+                lazy.update(STATE, 1, 1.0, STATE, 0.75, 0.9)
+                table.update(STATE, 1, 1.0, STATE, 0.75, 0.9)
+                self.assertEqual(lazy.snapshot(), table.snapshot())
+
+
+class TestDoubleMemoryTable(unittest.TestCase):
+    def test_incremental_refresh_matches_full_refresh(self):
+        states = [((value, 0), (0, 0), (0, 0), (0, 0)) for value in range(6)]
+        full = DoubleMemoryTable(ACTIONS, DictMemoryStorageAdapter(), DictMemoryStorageAdapter(), 4)
+        incremental = DoubleMemoryTable(ACTIONS, DictMemoryStorageAdapter(), DictMemoryStorageAdapter(), 4, True)
+        for step in range(30):
+            for table in (full, incremental):
+                table.update(states[step % 6], ACTIONS[step % 3], float(step % 5), states[(step * 7) % 6], 0.75, 0.9)
+
+        self.assertTrue(incremental._pending)
+        self.assertEqual(incremental.snapshot(), full.snapshot())
+
+    def test_incremental_refresh_publishes_boundary_weights(self):
+        states = [((value, 0), (0, 0), (0, 0), (0, 0)) for value in range(6)]
+        full = DoubleMemoryTable(ACTIONS, DictMemoryStorageAdapter(), DictMemoryStorageAdapter(), 7)
+        incremental = DoubleMemoryTable(ACTIONS, DictMemoryStorageAdapter(), DictMemoryStorageAdapter(), 7, True)
+        current = previous = {}
+        for step in range(60):
+            for table in (full, incremental):
+                table.update(states[step % 6], ACTIONS[step % 3], float(step % 5), states[(step * 7) % 6], 0.75, 0.9)
+            if (step + 1) % 7 == 0:
+                # The queue of the previous boundary is published, the new one starts
+                self.assertEqual(dict(incremental.adapter._data), current)
+                current, previous = dict(full.adapter._data), current
+            for key, weight in incremental.adapter._data.items():
+                self.assertIn(weight, (current.get(key), previous.get(key)))
+
+    def test_snapshot_does_not_publish(self):
+        states = [((value, 0), (0, 0), (0, 0), (0, 0)) for value in range(6)]
+        plain = DoubleMemoryTable(ACTIONS, DictMemoryStorageAdapter(), DictMemoryStorageAdapter(), 7)
+        checkpointed = DoubleMemoryTable(ACTIONS, DictMemoryStorageAdapter(), DictMemoryStorageAdapter(), 7)
+        for step in range(30):
+            for table in (plain, checkpointed):
+                table.update(states[step % 6], ACTIONS[step % 3], float(step % 5), states[(step * 7) % 6], 0.75, 0.9)
+            snapshot = checkpointed.snapshot()
+            self.assertEqual(checkpointed.changes(snapshot), {})
+
+        self.assertEqual(dict(checkpointed.adapter._data), dict(plain.adapter._data))
+        self.assertEqual(snapshot, plain.snapshot())
+
+
+class TestMemoryTableChanges(unittest.TestCase):
+    def assertMerges(self, create, publish=None):
+        master = create()
+        master.update(STATE, 1, 5.0, NEXT_STATE, 0.75, 0.9)
+        worker = create()
+        worker.restore(master.snapshot())
+
+        snapshot = worker.snapshot()
+        worker.update(STATE, 1, -10.0, NEXT_STATE, 0.75, 0.9)
+        worker.update(NEXT_STATE, 0, 5.0, STATE, 0.75, 0.9)
+        master.merge(worker.changes(snapshot))
+        if publish is not None:
+            publish(master)
+            publish(worker)
+
+        for state in (STATE, NEXT_STATE):
+            for (action, weight), (_, expected) in zip(master.actions(state), worker.actions(state)):
+                self.assertAlmostEqual(weight, expected)
+
+    def test_single_table_merges_changes(self):
+        self.assertMerges(lambda: SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter()))
+
+    def test_double_table_merges_changes(self):
+        self.assertMerges(lambda: DoubleMemoryTable(
+            ACTIONS, DictMemoryStorageAdapter(), DictMemoryStorageAdapter(), 100), DoubleMemoryTable._refresh)
+
+    def test_array_table_merges_changes(self):
+        self.assertMerges(lambda: ArrayMemoryTable(ACTIONS))
+
+
+class TestBoundedMemoryStorageAdapter(unittest.TestCase):
+    def fill(self, adapter, count):
+        table = SingleMemoryTable(ACTIONS, adapter)
+        for index in range(count):
+            table.initialize_state(((index, 0), (0, 0), (0, 0), (0, 0)))
+        return table
+
+    def test_keeps_at_most_capacity_states(self):
+        for policy in BoundedMemoryStorageAdapter.POLICIES:
+            adapter = BoundedMemoryStorageAdapter(32, policy)
+            self.fill(adapter, 100)
+            self.assertLessEqual(adapter.resident, 32)
+            self.assertEqual(adapter.evictions, 100 - adapter.resident)
+
+    def test_lru_evicts_the_least_recently_read_state(self):
+        adapter = BoundedMemoryStorageAdapter(2, 'lru')
+        table = self.fill(adapter, 2)
+        first = ((0, 0), (0, 0), (0, 0), (0, 0))
+        table.exists(first)
+        table.initialize_state(STATE)
+        self.assertTrue(table.exists(first))
+        self.assertFalse(table.exists(((1, 0), (0, 0), (0, 0), (0, 0))))
+
+    def test_visits_evict_the_least_read_states(self):
+        adapter = BoundedMemoryStorageAdapter(16, 'visits')
+        table = self.fill(adapter, 16)
+        visited = ((3, 0), (0, 0), (0, 0), (0, 0))
+        for _ in range(5):
+            table.choose(visited)
+        self.fill(adapter, 40)
+        self.assertEqual(adapter.visits(visited), 5)
+        self.assertTrue(table.exists(visited))
+
+    def test_visits_keep_a_fresh_state_for_one_eviction(self):
+        adapter = BoundedMemoryStorageAdapter(4, 'visits')
+        table = self.fill(adapter, 4)
+        for index in range(4):
+            for _ in range(2):
+                table.choose(((index, 0), (0, 0), (0, 0), (0, 0)))
+        table.initialize_state(STATE)
+        table.initialize_state(NEXT_STATE)
+        self.assertTrue(table.exists(STATE))
+        self.assertEqual(adapter.evictions, 2)
+
+    def test_variance_keeps_informative_states(self):
+        adapter = BoundedMemoryStorageAdapter(16, 'variance')
+        table = self.fill(adapter, 16)
+        table.update(STATE, 1, 10.0, NEXT_STATE, 0.75, 0.9)
+        self.fill(adapter, 40)
+        self.assertTrue(table.exists(STATE))
+
+    def test_spilled_states_are_read_back(self):
+        with tempfile.TemporaryDirectory() as directory:
+            single = SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter())
+            bounded = SingleMemoryTable(ACTIONS, BoundedMemoryStorageAdapter(2, spill=os.path.join(directory, 'spill')))
+            for table in (single, bounded):
+                self.fill(table.adapter, 10)
+                table.update(STATE, 1, 5.0, NEXT_STATE, 0.75, 0.9)
+                table.update(NEXT_STATE, -1, -10.0, STATE, 0.75, 0.9)
+            self.assertEqual(bounded.snapshot(), dict(single.snapshot()))
+            self.assertEqual(bounded.adapter.resident + bounded.adapter.spilled, 12)
+
+            filename = os.path.join(directory, 'memory.json')
+            bounded.save(filename)
+            reloaded = SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter())
+            reloaded.load(filename)
+            self.assertEqual(reloaded.snapshot(), single.snapshot())
+            bounded.adapter.close()
+
+
+class TestSQLiteMemoryStorageAdapter(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, 'memory.sqlite')
+        self.adapters = []
+
+    def tearDown(self):
+        for adapter in self.adapters:
+            adapter.close()
+        self.directory.cleanup()
+
+    def create(self, **kwargs):
+        adapter = SQLiteMemoryStorageAdapter(self.filename, **kwargs)
+        self.adapters.append(adapter)
+        return adapter
+
+    def stored(self):
+        with sqlite3.connect(self.filename) as connection:
+            return connection.execute('SELECT COUNT(*) FROM weights').fetchone()[0]
+
+    def test_updates_match_dict_adapter(self):
+        single = SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter())
+        stored = SingleMemoryTable(ACTIONS, self.create(capacity=1))
+        for state, action, reward, next_state in [(STATE, 1, 5.0, NEXT_STATE), (NEXT_STATE, -1, -10.0, STATE)]:
+            single.update(state, action, reward, next_state, 0.75, 0.9)
+            stored.update(state, action, reward, next_state, 0.75, 0.9)
+
+        stored.save(None)
+        reloaded = SingleMemoryTable(ACTIONS, self.create())
+        for state in (STATE, NEXT_STATE):
+            self.assertEqual(stored.actions(state), single.actions(state))
+            self.assertEqual(reloaded.actions(state), single.actions(state))
+        self.assertEqual(sorted(stored.adapter.keys()), sorted(single.adapter.keys()))
+
+    def test_prefetch_larger_than_capacity(self):
+        for capacity in (0, 1):
+            table = SingleMemoryTable(ACTIONS, self.create(capacity=capacity))
+            table.adapter.clear()
+            states = [((index, 0), (0, 0), (0, 0), (0, 0)) for index in range(3)]
+            for state in states:
+                table.update(state, 1, 5.0, STATE, 0.75, 0.9)
+            table.adapter.prefetch(states, ACTIONS)
+            self.assertAlmostEqual(table.actions(states[0])[2][1], 4.675)
+
+    def test_writes_are_batched(self):
+        adapter = self.create(batch=2)
+        adapter.weight(STATE, 1, 2.5)
+        self.assertEqual(adapter.weight(STATE, 1), 2.5)
+        self.assertEqual(self.stored(), 0)
+
+        adapter.weight(NEXT_STATE, 1, 1.5)
+        self.assertEqual(self.stored(), 2)
+
+    def test_snapshot_reads_the_database_once(self):
+        table = SingleMemoryTable(ACTIONS, self.create(capacity=2, batch=8))
+        states = [((index, 0), (0, 0), (0, 0), (0, 0)) for index in range(10)]
+        for state in states:
+            table.update(state, 1, 5.0, STATE, 0.75, 0.9)
+        misses, resident = table.adapter.misses, table.adapter.resident
+
+        snapshot = table.snapshot()
+        self.assertEqual((table.adapter.misses, table.adapter.resident), (misses, resident))
+        self.assertEqual(len(snapshot), 30)
+        self.assertEqual(snapshot[f'{states[0]}_1'], table.adapter.get(f'{states[0]}_1'))
+
+    def test_backup_copies_the_database_when_called(self):
+        adapter = self.create()
+        adapter.weight(STATE, 1, 2.5)
+        copy = adapter.backup()
+        adapter.weight(STATE, 1, 3.5)
+        adapter.weight(NEXT_STATE, 1, 1.5)
+
+        filename = os.path.join(self.directory.name, 'memory.checkpoint')
+        copy(filename)
+        restored = SingleMemoryTable(ACTIONS, SQLiteMemoryStorageAdapter(os.path.join(self.directory.name, 'other.sqlite')))
+        self.adapters.append(restored.adapter)
+        self.assertTrue(restored.adapter.is_backup(filename))
+        restored.load(filename)
+        self.assertEqual(restored.adapter.weight(STATE, 1), 2.5)
+        self.assertIsNone(restored.adapter.weight(NEXT_STATE, 1))
+
+    def test_size_counts_cached_weights(self):
+        table = SingleMemoryTable(ACTIONS, self.create(batch=8))
+        table.update(STATE, 1, 5.0, NEXT_STATE, 0.75, 0.9)
+        self.assertEqual(table.size(), 3)
+
+        table.adapter.remove(f'{STATE}_1')
+        self.assertEqual(table.size(), 2)
+
+    def test_decimal_weights_are_exact(self):
+        number = learning.numeric.create('decimal')
+        adapter = self.create(number=number)
+        adapter.weight(STATE, 1, Decimal('0.1'))
+        adapter.persist(None)
+
+        self.assertEqual(self.create(number=number).weight(STATE, 1), Decimal('0.1'))
+
+
+@unittest.skipIf(fakeredis is None, 'fakeredis is not installed')
+class TestRedisHashMemoryStorageAdapter(unittest.TestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+
+    def create(self, **kwargs):
+        return RedisHashMemoryStorageAdapter(client=self.redis, **kwargs)
+
+    def test_updates_match_dict_adapter(self):
+        single = SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter())
+        hashed = SingleMemoryTable(ACTIONS, self.create(capacity=1))
+        for state, action, reward, next_state in [(STATE, 1, 5.0, NEXT_STATE), (NEXT_STATE, -1, -10.0, STATE)]:
+            single.update(state, action, reward, next_state, 0.75, 0.9)
+            hashed.update(state, action, reward, next_state, 0.75, 0.9)
+
+        reloaded = SingleMemoryTable(ACTIONS, self.create())
+        for state in (STATE, NEXT_STATE):
+            self.assertEqual(hashed.actions(state), single.actions(state))
+            self.assertEqual(reloaded.actions(state), single.actions(state))
+        self.assertEqual(sorted(hashed.adapter.keys()), sorted(single.adapter.keys()))
+
+    def test_prefetch_larger_than_capacity(self):
+        for capacity in (0, 1):
+            table = SingleMemoryTable(ACTIONS, self.create(capacity=capacity))
+            table.adapter.clear()
+            states = [((index, 0), (0, 0), (0, 0), (0, 0)) for index in range(3)]
+            for state in states:
+                table.update(state, 1, 5.0, STATE, 0.75, 0.9)
+            table.adapter.prefetch(states, ACTIONS)
+            self.assertAlmostEqual(table.actions(states[0])[2][1], 4.675)
+
+    def test_size_is_counted_by_writes(self):
+        table = SingleMemoryTable(ACTIONS, self.create(interval=3600))
+        table.adapter.clear()
+        table.update(STATE, 1, 5.0, NEXT_STATE, 0.75, 0.9)
+        table.update(STATE, 1, 5.0, NEXT_STATE, 0.75, 0.9)
+        self.assertEqual(table.size(), 3)
+
+        table.adapter.remove(f'{STATE}_1')
+        self.assertEqual(table.size(), 2)
+        self.assertEqual(SingleMemoryTable(ACTIONS, self.create()).size(), 2)
+
+        # A table stored before the counter existed is counted once
+        self.redis.delete('memory#count')
+        self.assertEqual(SingleMemoryTable(ACTIONS, self.create()).size(), 2)
+
+    def test_writes_are_cached_until_flushed(self):
+        adapter = self.create(interval=3600)
+        adapter.weight(STATE, 1, 2.5)
+        self.assertEqual(adapter.weight(STATE, 1), 2.5)
+        self.assertEqual(self.redis.hgetall(f'memory:{STATE}'), {})
+
+        adapter.flush()
+        self.assertEqual(self.redis.hgetall(f'memory:{STATE}'), {b'1': b'2.5'})
+
+    def test_clear_only_removes_its_prefix(self):
+        self.redis.set('other', 1)
+        adapter = self.create(prefix='table', interval=0)
+        adapter.weight(STATE, 1, 2.5)
+        adapter.clear()
+
+        self.assertIsNone(adapter.weight(STATE, 1))
+        self.assertEqual(self.redis.keys(), [b'other'])
@@ -0,0 +1,46 @@
+import contextlib
+import io
+import unittest
+import app
+import cli
+import parallel
+from learning.memory import DictMemoryStorageAdapter, SingleMemoryTable
+
+
+class TestTrainer(unittest.TestCase):
+    def test_average_and_correction(self):
+        changes = [{'a': 1.0, 'b': 2.0}, {'a': 3.0}]
+        average = parallel.Trainer._average(changes)
+        self.assertEqual(average, {'a': 2.0, 'b': 2.0})
+        self.assertEqual(parallel.Trainer._correct(average, changes, 0), {'a': 1.0, 'b': 0.0})
+        self.assertEqual(parallel.Trainer._correct(average, changes, 1), {'a': -1.0, 'b': 2.0})
+        self.assertEqual(parallel.Trainer._correct(average, changes, 2), average)
+
+    def test_workers_use_private_adapters(self):
+        arguments = cli.parser.parse_args(
+            ['train', '--no-stats', '--workers', '2', '--config', 'samples/single_sqlite.json'])
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, _, environment, _ = app._setup_config(arguments, private=True)
+        self.assertIsInstance(environment.agent.memories.adapter, DictMemoryStorageAdapter)
+
+    def test_workers_play_every_episode(self):
+        arguments = cli.parser.parse_args(['train', '--no-stats', '--workers', '2'])
+        memories = SingleMemoryTable([-1, 0, 1], DictMemoryStorageAdapter())
+        trainer = parallel.Trainer(arguments, memories, 2, episodes=3)
+        try:
+            results = trainer.execute('tiny', True, 10, 0.1, [0, 1])
+        finally:
+            trainer.close()
+
+        self.assertEqual(len(results.scores), 10)
+        self.assertEqual(results.wins + results.loses, 10)
+        self.assertGreater(len(memories.adapter.keys()), 0)
+
+    def test_close_survives_dead_workers(self):
+        arguments = cli.parser.parse_args(['train', '--no-stats', '--workers', '2'])
+        trainer = parallel.Trainer(arguments, SingleMemoryTable([-1, 0, 1], DictMemoryStorageAdapter()), 2)
+        for process in trainer._processes:
+            process.kill()
+            process.join()
+        trainer.close()
+        self.assertFalse(any(process.is_alive() for process in trainer._processes))
@@ -0,0 +1,48 @@
+import random
+import unittest
+import urllib.request
+import simplejson as json
+import learning
+import snake
+import stats
+from learning.memory import DictMemoryStorageAdapter, SingleMemoryTable
+from learning.profiler import Profiler
+
+ACTIONS = [-1, 0, 1]
+
+
+def execute(profiler=None):
+    random.seed(0)
+    agent = learning.Agent(0.75, 0.9, SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter()))
+    world = snake.World('data/worlds')
+    environment = snake.Environment(agent, world)
+    if profiler:
+        profiler.attach(agent)
+        environment.profiler = profiler
+    world.load('tiny')
+    return environment.execute(True, 5, 0.05, (), False), agent
+
+
+class TestProfiler(unittest.TestCase):
+    def test_profiling_times_phases_without_changing_results(self):
+        profiler = Profiler()
+        profiled, agent = execute(profiler)
+        results, _ = execute()
+        self.assertEqual(profiled.steps.tolist(), results.steps.tolist())
+
+        steps = int(profiled.steps.sum())
+        report = profiler.report(1.0, steps, profiled.episodes, agent.memories.size())
+        self.assertEqual(set(report['phases']), {'observe', 'act', 'simulate', 'reward', 'remember'})
+        self.assertEqual(report['counts']['table.update'], steps)
+        self.assertGreater(report['counts']['adapter.weights'], 0)
+        self.assertEqual(report['steps_per_second'], steps)
+        self.assertEqual(profiler.report(1.0, 0, 0, 0)['counts'], {})
+
+    def test_metrics_server_serves_latest_report(self):
+        server = stats.MetricsServer(0)
+        try:
+            server.write({'cycle': 3})
+            with urllib.request.urlopen(f'http://127.0.0.1:{server.port}/') as response:
+                self.assertEqual(json.loads(response.read()), {'cycle': 3})
+        finally:
+            server.close()
@@ -1,25 +1,29 @@
 import unittest
-from core.environment import Action
-from core.agent import QTable, Memory
+from learning.memory import DictMemoryStorageAdapter, SingleMemoryTable
+
+ACTIONS = [10, 20, 30]
 
-class TestQTable(unittest.TestCase):
-    def test_something(self):
 
-        learning_rate = 0.5
-        discount_factor = 0
+class TestQTable(unittest.TestCase):
+    def test_update_applies_q_learning_formula(self):
+        table = SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter())
+        table.update(2, 20, 100, 3, 0.5, 0)
+        table.update(1, 10, 50, 2, 0.5, 0)
 
-        actions = [
-            Action(10, 'Action A'),
-            Action(20, 'Action B'),
-            Action(30, 'Action C')
-        ]
+        self.assertEqual(table.adapter.weight(2, 20), 0.5 * 1 + 0.5 * 100)
+        self.assertEqual(table.adapter.weight(1, 10), 0.5 * 1 + 0.5 * 50)
+        self.assertEqual(table.adapter.weight(1, 20), 1)
 
-        table = QTable(actions)
-        print('')
-        table.update(Memory(2, actions[1], 100, 3), learning_rate, discount_factor)
-        table.update(Memory(1, actions[0], 50, 2), learning_rate, discount_factor)
+    def test_update_discounts_best_next_weight(self):
+        table = SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter())
+        table.update(2, 20, 100, 3, 0.5, 0)
+        table.update(1, 10, 50, 2, 0.5, 0.5)
 
-        # memory = Memory((0, 1), actions[0], 100, (0, 2))
-        # table.update(memory, learning_rate, discount_factor)
+        self.assertEqual(table.best(2), [20, 50.5])
+        self.assertEqual(table.adapter.weight(1, 10), 0.5 * 1 + 0.5 * (50 + 0.5 * 50.5))
 
-        print(f'Q is: {table.get_q(1, actions[0])}' )        
\ No newline at end of file
+    def test_unknown_state_has_no_weights(self):
+        table = SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter())
+        self.assertFalse(table.exists(1))
+        self.assertEqual(table.best(1), [None, 1])
+        self.assertIn(table.choose(1), ACTIONS)
@@ -0,0 +1,80 @@
+import random
+import unittest
+import numpy as np
+import learning
+import snake
+from learning.memory import ArrayMemoryTable, DictMemoryStorageAdapter, SingleMemoryTable
+from learning.replay import ReplayBuffer
+from snake.batch import BatchEnvironment
+
+ACTIONS = [-1, 0, 1]
+
+
+class TestReplayBuffer(unittest.TestCase):
+    def test_ring_overwrites_the_oldest_transitions(self):
+        replay = ReplayBuffer(4, seed=0)
+        for row in range(6):
+            replay.add(row, 0, 0.0, row, False)
+        replay.add_many(np.array([6]), np.array([0]), np.array([0.0]), np.array([6]), np.array([False]))
+        self.assertEqual(len(replay), 4)
+        self.assertEqual(set(replay._rows[replay.sample(100)].tolist()), {3, 4, 5, 6})
+
+    def test_prioritized_sampling_follows_errors(self):
+        replay = ReplayBuffer(2, prioritized=True, alpha=1.0, seed=0)
+        replay.add(0, 0, 0.0, 0, True)
+        replay.add(1, 0, 0.0, 1, True)
+        replay._priorities[:2] = [1.0, 9.0]
+        self.assertAlmostEqual((replay.sample(10000) == 1).mean(), 0.9, delta=0.02)
+
+    def test_rows_update_matches_sequential_updates(self):
+        table = ArrayMemoryTable(ACTIONS)
+        states = [((index, 0), (0, 0), (0, 0), (0, 0)) for index in range(4)]
+        rows = np.array([table.initialize_state(state) for state in states])
+        table.values[:] = np.arange(12).reshape(4, 3)
+        expected = table.values.copy()
+        for row, column, reward, next_row, done in [(0, 1, 5.0, 1, False), (2, 0, -10.0, 3, True)]:
+            next_weight = 0.0 if done else expected[next_row].max()
+            expected[row, column] += 0.5 * (reward + 0.9 * next_weight - expected[row, column])
+
+        table.update_rows(rows[[0, 2]], np.array([1, 0]), np.array([5.0, -10.0]), rows[[1, 3]], 0.5, 0.9,
+                          np.array([False, True]))
+        np.testing.assert_allclose(table.values, expected)
+
+    def test_replay_follows_the_online_update(self):
+        states = [((index, 0), (0, 0), (0, 0), (0, 0)) for index in range(2)]
+        for terminal in (False, True):
+            online, replayed = ArrayMemoryTable(ACTIONS), ArrayMemoryTable(ACTIONS)
+            rows = np.array([replayed.initialize_state(state) for state in states])
+            for state in states:
+                online.initialize_state(state)
+            online.values[1], replayed.values[1] = 4.0, 4.0
+            learning.Agent(0.5, 0.9, online).remember(states[0], 0, -10.0, states[1], True)
+            replay = ReplayBuffer(1, batch_size=1, terminal=terminal)
+            replay.add(rows[0], 1, -10.0, rows[1], True)
+            replay.replay(replayed, 0.5, 0.9)
+
+            expected = online.values[0, 1] - (0.5 * 0.9 * 4.0 if terminal else 0.0)
+            self.assertEqual(replayed.values[0, 1], expected)
+
+    def test_replay_requires_array_table(self):
+        with self.assertRaises(ValueError):
+            learning.Agent(0.75, 0.9, SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter()), ReplayBuffer(8))
+
+    def test_environments_replay_transitions(self):
+        random.seed(0)
+        for prioritized in (False, True):
+            world = snake.World('data/worlds')
+            replay = ReplayBuffer(64, batch_size=8, ratio=2, prioritized=prioritized, seed=0)
+            environment = snake.Environment(learning.Agent(0.75, 0.9, ArrayMemoryTable(ACTIONS), replay), world)
+            world.load('default')
+            environment.execute(True, 3, 0.1, (), False)
+            self.assertEqual(len(replay), 64)
+            self.assertLess(replay._credit, 8)
+
+            world = snake.World('data/worlds')
+            replay = ReplayBuffer(64, batch_size=8, ratio=2, prioritized=prioritized, seed=0)
+            environment = BatchEnvironment(learning.Agent(0.75, 0.9, ArrayMemoryTable(ACTIONS), replay), world, 4, seed=0)
+            world.load('default')
+            environment.execute(True, 8, 0.1)
+            self.assertEqual(len(replay), 64)
+            self.assertLess(replay._credit, 8)
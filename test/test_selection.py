@@ -0,0 +1,53 @@
+import collections
+import contextlib
+import io
+import random
+import unittest
+from decimal import Decimal
+import numpy as np
+import cli
+from learning import selection
+from learning.memory import ArrayMemoryTable, DictMemoryStorageAdapter, SingleMemoryTable
+
+ACTIONS = [-1, 0, 1]
+STATE = ((1, 0), (1, 2), (2, 3), (45, 1))
+
+
+class TestSelection(unittest.TestCase):
+    def test_large_weights_do_not_overflow(self):
+        random.seed(0)
+        counts = collections.Counter(selection.choose(ACTIONS, [1000.0, 999.0, -1000.0]) for _ in range(2000))
+        self.assertEqual(counts[1], 0)
+        self.assertGreater(counts[-1], counts[0])
+
+    def test_decimal_weights(self):
+        self.assertEqual(selection.choose(ACTIONS, [Decimal(1), Decimal(5000), Decimal(2)], greedy=True), 0)
+        self.assertIn(selection.choose(ACTIONS, [Decimal(1), Decimal(5000), Decimal(2)]), ACTIONS)
+
+    def test_rejects_non_positive_temperature(self):
+        self.assertEqual(cli.parser.parse_args(['train', '--temperature', '0.5']).temperature, 0.5)
+        for value in ('0', '-1', 'nan'):
+            with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+                cli.parser.parse_args(['train', '--temperature', value])
+
+    def test_temperature(self):
+        random.seed(0)
+        cold = collections.Counter(selection.choose(ACTIONS, [1.0, 0.0, 0.0], 0.01) for _ in range(1000))
+        hot = collections.Counter(selection.choose(ACTIONS, [1.0, 0.0, 0.0], 100.0) for _ in range(1000))
+        self.assertEqual(cold[-1], 1000)
+        self.assertGreater(hot[0] + hot[1], 500)
+
+    def test_rows_match_softmax(self):
+        generator = np.random.default_rng(0)
+        weights = np.array([[1000.0, 1001.0, 0.0]] * 20000)
+        columns = selection.choose_rows(weights, generator)
+        expected = np.exp([-1.0, 0.0]) / np.exp([-1.0, 0.0]).sum()
+        self.assertAlmostEqual((columns == 0).mean(), expected[0], delta=0.02)
+        self.assertAlmostEqual((columns == 1).mean(), expected[1], delta=0.02)
+        self.assertEqual(selection.choose_rows(weights[:2], generator, greedy=True).tolist(), [1, 1])
+
+    def test_greedy_tables_choose_the_best_action(self):
+        for table in (SingleMemoryTable(ACTIONS, DictMemoryStorageAdapter()), ArrayMemoryTable(ACTIONS)):
+            table.update(STATE, 0, 10.0, STATE, 0.75, 0.9)
+            table.greedy = True
+            self.assertEqual({table.choose(STATE) for _ in range(50)}, {0})
@@ -0,0 +1,135 @@
+import json
+import math
+import os
+import random
+import tempfile
+import unittest
+import learning
+import snake
+from snake.math import Vector
+from snake.world import World
+
+ACTIONS = [-1, 0, 1]
+
+
+class ReferenceSnake:
+    """Snake as it was simulated before integer headings: a rotated direction vector and a list body."""
+
+    def __init__(self, world):
+        self.world = world
+        self.reset()
+
+    def reset(self):
+        start = self.world.snake
+        self.body = [Vector(start._start_position)]
+        self.direction = Vector(start._start_direction)
+        self.grow = start._start_length - 1
+        self.colliding = False
+
+    def step(self, action):
+        self.direction.rotate(math.radians(90 * action))
+        head = self.body[0] + self.direction
+        if self.grow:
+            self.grow -= 1
+        else:
+            self.body.pop()
+        self.body.insert(0, head)
+        self.colliding = self.check(head, exclude_snake=True) in (World.WALL_VALUE, World.UNKNOW_VALUE) or \
+            head in self.body[1:]
+
+    def check(self, position, exclude_snake=False):
+        size = self.world.size
+        if not exclude_snake and position in self.body:
+            return snake.Snake.VALUE
+        if position == self.world.apple.position:
+            return snake.Apple.VALUE
+        if 0 <= position.x < size and 0 <= position.y < size:
+            return self.world._cells[position.x * size + position.y]
+        return World.UNKNOW_VALUE
+
+    def raycast(self, position, direction):
+        position = position + direction
+        mask = (snake.Apple.VALUE, snake.Snake.VALUE, World.WALL_VALUE, World.UNKNOW_VALUE)
+        while self.check(position) not in mask:
+            position = position + direction
+        return self.check(position), position
+
+    def observe(self):
+        def distance(x): return min(math.floor(round(x) / 2), 3)
+
+        state = []
+        head = self.body[0]
+        direction = self.direction.inverted()
+        for _ in range(3):
+            direction.rotate(math.radians(90))
+            value, position = self.raycast(head, direction)
+            state.append((value, distance(head.distance(position))))
+
+        apple = self.world.apple.position
+        delta = math.degrees(Vector.difference(self.direction.angle, (head.inverted() + apple).angle))
+        state.append((round(delta / 45) * 45, distance(head.distance(apple))))
+        return tuple(state)
+
+
+class TestSnake(unittest.TestCase):
+    def load(self, name):
+        world = World('data/worlds')
+        world.load(name)
+        return world
+
+    def test_turning_matches_rotated_direction(self):
+        world = self.load('default')
+        direction = Vector(world.snake.direction)
+        for action in [1, 1, 0, -1, 1, 1, 1, -1, -1]:
+            world.snake.turn(action)
+            direction.rotate(math.radians(90 * action))
+            self.assertEqual(world.snake.direction, direction)
+
+    def test_moving_into_the_tail_cell(self):
+        for grow, colliding in ((0, False), (1, True)):
+            world = self.load('default')
+            world.snake._grow = 3
+            for _ in range(4):
+                world.snake.move()
+            for action in (1, 1, 1):
+                world.snake._grow = grow
+                world.snake.turn(action)
+                world.snake.move()
+            # The head takes the cell the tail leaves in the same move, unless the snake grows
+            self.assertEqual(world.snake.position, Vector(10, 7))
+            self.assertEqual(world.snake.is_colliding(), colliding)
+
+    def test_leaving_the_world_collides(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'open.json'), 'w') as file:
+                json.dump({'snake': {'position': [4, 2], 'direction': [1, 0], 'length': 3},
+                           'size': 5, 'data': [[0] * 5 for _ in range(5)]}, file)
+            world = World(directory)
+            world.load('open')
+            world.snake.move()
+            self.assertTrue(world.snake.is_colliding())
+
+    def test_matches_reference_simulation(self):
+        random.seed(0)
+        environment = snake.Environment(
+            learning.Agent(0.75, 0.9, learning.memory.ArrayMemoryTable(ACTIONS)), World('data/worlds'))
+        for name in ('default', 'rooms', 'times'):
+            world = environment.world
+            world.load(name)
+            reference = ReferenceSnake(world)
+            for _ in range(1500):
+                self.assertEqual(environment.observe(), reference.observe())
+                action = random.choice(ACTIONS)
+                world.snake.turn(action)
+                world.snake.move()
+                reference.step(action)
+                self.assertEqual(world.snake.is_colliding(), reference.colliding)
+                if reference.colliding:
+                    world.reset()
+                    reference.reset()
+                    continue
+                self.assertEqual(world.snake.body, reference.body)
+                if world.snake.position == world.apple.position:
+                    world.snake._grow += 1
+                    reference.grow += 1
+                    world.apple.random()
@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+import stats
+from snake.environment import Results
+
+
+def create_results(count, offset=0):
+    results = Results(1)
+    for episode in range(count):
+        results.record(episode + offset, episode, Results.LOSE | Results.STARVE if episode % 2 else Results.WIN, 0.1)
+    return results
+
+
+class TestResults(unittest.TestCase):
+    def test_arrays_grow_and_count_outcomes(self):
+        results = create_results(5)
+        results.extend(create_results(2))
+
+        self.assertEqual(results.episodes, 7)
+        self.assertEqual(results.steps.tolist(), [0, 1, 2, 3, 4, 0, 1])
+        self.assertEqual((results.wins, results.loses, results.starves), (4, 3, 3))
+
+
+class TestStatisticsSink(unittest.TestCase):
+    def test_buffers_rows_and_episodes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            sink = stats.StatisticsSink(directory)
+            sink.world(0, 'default', create_results(3))
+            sink.world(0, 'rooms', create_results(2, 10))
+            sink.cycle(0, [create_results(3), create_results(2, 10)])
+            self.assertEqual(os.listdir(directory), ['worlds.txt'])
+
+            sink.close()
+            with open(os.path.join(directory, 'default.csv')) as file:
+                self.assertEqual(file.read().splitlines(), ['cycle;steps;score;wins;loses;starves', '0;1.0;1.0;2;1;1'])
+            episodes = stats.read_episodes(directory)
+            self.assertEqual(episodes['steps'].tolist(), [0, 1, 2, 10, 11])
+            self.assertEqual(episodes['world'].tolist(), [0, 0, 0, 1, 1])
+            self.assertEqual(stats.read_worlds(directory), ['default', 'rooms'])
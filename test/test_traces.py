@@ -0,0 +1,64 @@
+import random
+import unittest
+import numpy as np
+import learning
+import snake
+from learning.memory import ArrayMemoryTable
+from learning.traces import TraceAgent, create
+from snake.batch import BatchEnvironment
+
+ACTIONS = [-1, 0, 1]
+STATES = [((index, 0), (0, 0), (0, 0), (0, 0)) for index in range(6)]
+
+
+class TestTraceAgent(unittest.TestCase):
+    def test_without_decay_matches_one_step_learner(self):
+        single, traced = ArrayMemoryTable(ACTIONS), ArrayMemoryTable(ACTIONS)
+        agent = TraceAgent(0.75, 0.9, traced, trace_decay=0)
+        random.seed(0)
+        for _ in range(200):
+            state, action, reward, next_state = random.choice(STATES), random.choice(ACTIONS), \
+                random.choice((-10.0, 0.0, 5.0)), random.choice(STATES)
+            single.update(state, action, reward, next_state, 0.75, 0.9)
+            agent.remember(state, action, reward, next_state)
+            self.assertEqual(agent.active, 0)
+        for state in STATES:
+            np.testing.assert_allclose(traced.values[traced.index(state)], single.values[single.index(state)])
+
+    def test_reward_reaches_earlier_pairs(self):
+        for learner in ('q-lambda', 'sarsa-lambda'):
+            table = ArrayMemoryTable(ACTIONS)
+            agent = create(learner, 0.5, 0.9, table, trace_decay=0.9)
+            for state, next_state in zip(STATES[:3], STATES[1:4]):
+                agent.remember(state, 0, 0.0, next_state)
+            agent.remember(STATES[3], 0, 10.0, STATES[4], True)
+            self.assertGreater(table.values[table.index(STATES[0]), 1], 1.0, learner)
+            self.assertEqual(agent.active, 0)
+
+    def test_exploratory_action_cuts_traces(self):
+        table = ArrayMemoryTable(ACTIONS)
+        agent = TraceAgent(0.5, 0.9, table, trace_decay=0.9)
+        agent.remember(STATES[0], 0, 5.0, STATES[1])
+        self.assertEqual(agent.active, 1)
+        agent.remember(STATES[0], -1, 0.0, STATES[2])
+        self.assertEqual(agent.active, 1)
+
+    def test_traces_are_pruned(self):
+        agent = TraceAgent(0.5, 0.9, ArrayMemoryTable(ACTIONS), trace_decay=0.5, threshold=0.1)
+        for state, next_state in zip(STATES, STATES[1:]):
+            agent.remember(state, 0, 0.0, next_state)
+        # Traces decay by 0.45 per step, the third one falls below the threshold
+        self.assertEqual(agent.active, 2)
+
+    def test_environment_trains_and_resets(self):
+        random.seed(0)
+        world = snake.World('data/worlds')
+        agent = create('sarsa-lambda', 0.75, 0.9, ArrayMemoryTable(ACTIONS))
+        environment = snake.Environment(agent, world)
+        world.load('default')
+        environment.execute(True, 5, 0.1, (), False)
+        self.assertGreater(len(agent.memories.states), 0)
+        with self.assertRaises(ValueError):
+            BatchEnvironment(agent, world, 4)
+        with self.assertRaises(ValueError):
+            create('q-lambda', 0.75, 0.9, learning.SingleMemoryTable(ACTIONS, learning.memory.DictMemoryStorageAdapter()))
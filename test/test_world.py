@@ -1,4 +1,10 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
 import unittest
+from snake.math import Vector
 from snake.world import World
 
 
@@ -6,3 +12,84 @@ class TestWorld(unittest.TestCase):
     def test_unit_to_pixel_convertion_default(self):
         world = World('data/worlds')
         self.assertEqual(world.to_px(16), 256)
+
+    def test_check_structure_and_entities(self):
+        world = World('data/worlds')
+        world.load('default')
+        self.assertEqual(world.check(Vector(0, 0)), World.WALL_VALUE)
+        self.assertEqual(world.check(world.snake.position), world.snake.VALUE)
+        self.assertEqual(world.check(world.apple.position), world.apple.VALUE)
+        self.assertEqual(world.check(Vector(world.size, 0)), World.UNKNOW_VALUE)
+        self.assertEqual(world.check(world.snake.position, exclude=(world.snake.VALUE, )), World.EMPTY_VALUE)
+
+    def test_occupancy_follows_snake(self):
+        world = World('data/worlds')
+        world.load('default')
+        for _ in range(5):
+            world.snake.move()
+
+        for part in world.snake.body:
+            self.assertEqual(world.check(part), world.snake.VALUE)
+        self.assertEqual(world.check(Vector(7, 7)), World.EMPTY_VALUE)
+
+        world.reset()
+        self.assertEqual(sum(value == world.snake.VALUE for value in world._grid), 1)
+
+    def test_free_cells_follow_occupancy(self):
+        world = World('data/worlds')
+        world.load('rooms')
+        for _ in range(40):
+            world.snake.move()
+            if world.snake.is_colliding():
+                world.reset()
+            world.apple.random()
+            empty = [index for index, value in enumerate(world._grid) if value == World.EMPTY_VALUE]
+            self.assertEqual(sorted(world._free), empty)
+            for slot, index in enumerate(world._free):
+                self.assertEqual(world._slots[index], slot)
+            self.assertEqual(world.check(world.apple.position), world.apple.VALUE)
+
+    def test_parsed_worlds_are_cached_until_modified(self):
+        with tempfile.TemporaryDirectory() as directory:
+            shutil.copy('data/worlds/default.json', directory)
+            world = World(directory)
+            world.load('default')
+            parsed = world._parsed
+            world.snake.move()
+
+            other = World(directory)
+            other.load('default')
+            self.assertIs(other._parsed, parsed)
+            self.assertEqual(world.empty_cells, world._cells.count(World.EMPTY_VALUE))
+            self.assertEqual(other.check(world.snake.position), World.EMPTY_VALUE)
+
+            filename = os.path.join(directory, 'default.json')
+            os.utime(filename, ns=(0, os.stat(filename).st_mtime_ns + 1))
+            other.load('default')
+            self.assertIsNot(other._parsed, parsed)
+
+    def test_raycast_hits_wall(self):
+        world = World('data/worlds')
+        world.load('default')
+        value, position = world.raycast(Vector(7, 7), Vector(0, -1), (World.WALL_VALUE, ))
+        self.assertEqual(value, World.WALL_VALUE)
+        self.assertEqual(position, Vector(7, 0))
+
+    def test_simulation_does_not_import_pygame(self):
+        code = 'import sys, snake; snake.World("data/worlds").load("default"); print("pygame" in sys.modules)'
+        output = subprocess.check_output([sys.executable, '-c', code])
+        self.assertEqual(output.strip(), b'False')
+
+    def test_look_matches_raycast(self):
+        world = World('data/worlds')
+        for name in ('rooms', 'cross'):
+            world.load(name)
+            for _ in range(4):
+                world.snake.move()
+            mask = (world.snake.VALUE, world.apple.VALUE, World.WALL_VALUE)
+            for x in range(world.size):
+                for y in range(world.size):
+                    for heading, direction in enumerate(World.DIRECTIONS):
+                        position = Vector(x, y)
+                        value, hit = world.raycast(position, Vector(direction), mask)
+                        self.assertEqual(world.look(position, heading), (value, position.distance(hit)))